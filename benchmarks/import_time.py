@@ -0,0 +1,95 @@
+"""
+Import-time benchmark based on `python -X importtime`.
+
+Imports each target module in a fresh interpreter, reports the cumulative
+import time and the slowest transitive imports, and fails when a target
+pulls in one of the heavy optional dependencies or exceeds the time budget.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py agent.parser --budget-ms 800 --top 15
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+DEFAULT_TARGETS = [
+    "agent.parser",
+    "agent.state",
+    "agent.base_agent",
+    "agent.interaction.output.controller.llm_chat_outputs_controller",
+]
+
+# Only needed once a request is sent, a vector is compared or a TUI is started
+HEAVY_MODULES = ("openai", "httpx", "numpy", "textual")
+
+
+def measure_import(module: str, runs: int = 3) -> tuple[float, list[tuple[str, float, float]]]:
+    """
+    Import a module in fresh interpreters and parse the -X importtime report.
+
+    Args:
+        module: Dotted module name to import
+        runs: Number of interpreters; the median cumulative time is reported
+
+    Returns:
+        (median cumulative milliseconds, [(imported module, self ms, cumulative ms)] of the last run)
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(SRC_DIR), os.environ.get("PYTHONPATH")]))}
+    totals: list[float] = []
+    rows: list[tuple[str, float, float]] = []
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, env=env,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{result.stderr}")
+
+        rows = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+        totals.append(next(cumulative for name, _, cumulative in rows if name == module))
+
+    return statistics.median(totals), rows
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("modules", nargs="*", default=DEFAULT_TARGETS)
+    arg_parser.add_argument("--runs", type=int, default=3)
+    arg_parser.add_argument("--top", type=int, default=10, help="Slowest imports listed per module")
+    arg_parser.add_argument("--budget-ms", type=float, help="Fail when a module's cumulative import exceeds this")
+    args = arg_parser.parse_args()
+
+    failures: list[str] = []
+    for module in args.modules:
+        total_ms, rows = measure_import(module, runs=args.runs)
+        loaded = {name.split(".")[0] for name, _, _ in rows}
+        heavy = sorted(loaded.intersection(HEAVY_MODULES))
+
+        print(f"{module}: {total_ms:.1f} ms")
+        for name, self_ms, cumulative_ms in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+            print(f"    {self_ms:8.1f} ms self {cumulative_ms:8.1f} ms cumulative  {name}")
+
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)}")
+        if args.budget_ms is not None and total_ms > args.budget_ms:
+            failures.append(f"{module} took {total_ms:.1f} ms (budget {args.budget_ms:.1f} ms)")
+
+    if failures:
+        print("\n".join(["", "FAILED:", *failures]), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
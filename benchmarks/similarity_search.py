@@ -0,0 +1,63 @@
+"""
+Latency of InMemoryStateStorage.get_similar over random embeddings.
+
+    python benchmarks/similarity_search.py
+    python benchmarks/similarity_search.py --entities 100000 --dim 384 --queries 50
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from agent.misc.embedding_service import DefaultEmbeddingService  # noqa: E402
+from agent.misc.in_memory_storage import InMemoryStateStorage  # noqa: E402
+from examples.knowledge_base.state_entities import Task  # noqa: E402
+
+
+def build_storage(vectors: np.ndarray) -> InMemoryStateStorage:
+    storage = InMemoryStateStorage(DefaultEmbeddingService())
+    storage.add_entities([
+        Task(task_summary=f"task {i}", embedding=vector.tolist()) for i, vector in enumerate(vectors)
+    ])
+    return storage
+
+
+def time_queries(storage: InMemoryStateStorage, queries: np.ndarray, **kwargs) -> list[float]:
+    latencies = []
+    for query in queries:
+        probe = Task(task_summary="probe", embedding=query.tolist())
+        start = time.perf_counter()
+        storage.get_similar(probe, **kwargs)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.entities, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    start = time.perf_counter()
+    storage = build_storage(vectors)
+    print(f"{args.entities} entities x {args.dim} dims, built in {time.perf_counter() - start:.1f}s")
+
+    for order_by in ("similarity", "chronological"):
+        latencies = time_queries(storage, queries, threshold=0.0, limit=10, order_by=order_by)
+        print(f"  {order_by:<13} p50 {statistics.median(latencies) * 1000:7.2f} ms"
+              f"  max {max(latencies) * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Save/load time and size of an InMemoryStateStorage: to_json written with
+json.dump versus the binary snapshot format (save_snapshot/load_snapshot).
+
+    python benchmarks/snapshot_io.py
+    python benchmarks/snapshot_io.py --entities 1000000 --dim 384
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from agent.misc.embedding_service import DefaultEmbeddingService  # noqa: E402
+from agent.misc.in_memory_storage import InMemoryStateStorage  # noqa: E402
+from examples.knowledge_base.state_entities import Task  # noqa: E402
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def size_of(path: Path) -> int:
+    return path.stat().st_size if path.is_file() else sum(p.stat().st_size for p in path.iterdir())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    vectors = np.random.default_rng(0).normal(size=(args.entities, args.dim)).astype(np.float32)
+    service = DefaultEmbeddingService()
+    storage = InMemoryStateStorage(service)
+    storage.add_entities([
+        Task(task_summary=f"Review the billing API for account #{i}", assignees=["Ada"], embedding=vector)
+        for i, vector in enumerate(vectors)
+    ])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, snapshot_path = Path(tmp) / "storage.json", Path(tmp) / "snapshot"
+
+        def save_json():
+            with open(json_path, "w") as f:
+                json.dump(storage.to_json(), f)
+
+        def load_json():
+            with open(json_path) as f:
+                return InMemoryStateStorage.from_json(json.load(f), service)
+
+        _, json_save_s = timed(save_json)
+        _, json_load_s = timed(load_json)
+        _, snapshot_save_s = timed(lambda: storage.save_snapshot(snapshot_path))
+        _, snapshot_load_s = timed(lambda: InMemoryStateStorage.load_snapshot(snapshot_path, service))
+        json_bytes, snapshot_bytes = size_of(json_path), size_of(snapshot_path)
+
+    print(f"{args.entities} entities, {args.dim}-d embeddings")
+    print(f"  json     : save {json_save_s:7.2f}s  load {json_load_s:7.2f}s  {json_bytes / 2**20:9.1f} MiB")
+    print(f"  snapshot : save {snapshot_save_s:7.2f}s  load {snapshot_load_s:7.2f}s  {snapshot_bytes / 2**20:9.1f} MiB")
+    print(f"  speedup  : save {json_save_s / snapshot_save_s:6.1f}x  load {json_load_s / snapshot_load_s:6.1f}x"
+          f"  size {json_bytes / snapshot_bytes:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
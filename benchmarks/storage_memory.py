@@ -0,0 +1,75 @@
+"""
+Memory per entity: pydantic entities kept in a dict (as InMemoryStateStorage
+does) versus ColumnarStateStorage, measured with tracemalloc.
+
+    python benchmarks/storage_memory.py
+    python benchmarks/storage_memory.py --entities 200000
+"""
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from agent.misc.columnar_storage import ColumnarStateStorage  # noqa: E402
+from examples.knowledge_base.state_entities import Decision, Task  # noqa: E402
+
+NAMES = ["Omar", "Lena", "Priya", "Jonas", "Mei", "Carlos", "Ada", "Tomasz", "Nia", "Kenji"]
+VERBS = ["Migrate", "Draft", "Review", "Send", "Schedule", "Audit", "Refactor", "Document"]
+OBJECTS = ["the billing API", "vendor training doc", "release email", "fraud model", "Q3 roadmap"]
+
+
+def make_entities(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    entities = []
+    for i in range(n):
+        summary = f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} for account #{i}"
+        people = rng.sample(NAMES, rng.randint(1, 3))
+        if i % 4:
+            entities.append(Task(task_summary=summary, assignees=people))
+        else:
+            entities.append(Decision(decision_summary=summary, participants=people))
+    return entities
+
+
+def measure(build) -> tuple[int, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entities", type=int, default=50_000)
+    args = parser.parse_args()
+    n = args.entities
+
+    def build_dict():
+        return {str(i): entity for i, entity in enumerate(make_entities(n))}
+
+    def build_columnar():
+        storage = ColumnarStateStorage()
+        for i in range(0, n, 1000):
+            storage.add_entities(make_entities(min(1000, n - i), seed=i))
+        return storage
+
+    dict_bytes, dict_s = measure(build_dict)
+    columnar_bytes, columnar_s = measure(build_columnar)
+
+    print(f"{n} entities")
+    print(f"  pydantic dict : {dict_bytes / n:8.1f} B/entity  build {dict_s:6.2f}s")
+    print(f"  columnar      : {columnar_bytes / n:8.1f} B/entity  build {columnar_s:6.2f}s")
+    print(f"  reduction     : {dict_bytes / columnar_bytes:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
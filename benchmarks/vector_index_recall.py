@@ -0,0 +1,79 @@
+"""
+Recall vs latency of IvfVectorIndex against ExactVectorIndex.
+
+Vectors are drawn around random cluster centres, queries are perturbed
+stored vectors. Recall@k is the share of the exact top-k the IVF index
+returns, for each n_probe setting.
+
+    python benchmarks/vector_index_recall.py
+    python benchmarks/vector_index_recall.py --vectors 1000000 --dim 384 --lists 1024 --probes 4 16 64
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from agent.misc.vector_index import ExactVectorIndex, IvfVectorIndex  # noqa: E402
+
+
+def clustered_vectors(rng: np.random.Generator, n: int, dim: int, clusters: int) -> np.ndarray:
+    centres = rng.normal(size=(clusters, dim))
+    return (centres[rng.integers(clusters, size=n)] + rng.normal(scale=0.5, size=(n, dim))).astype(np.float32)
+
+
+def timed_search(index, queries: np.ndarray, k: int) -> tuple[list[np.ndarray], float]:
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows, _ = index.search(query, k=k)
+        latencies.append(time.perf_counter() - start)
+        results.append(rows)
+    return results, statistics.median(latencies) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--lists", type=int, default=512)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(rng, args.vectors, args.dim, args.clusters)
+    queries = vectors[rng.choice(len(vectors), args.queries)] + rng.normal(scale=0.1, size=(args.queries, args.dim))
+
+    exact = ExactVectorIndex()
+    ivf = IvfVectorIndex(n_lists=args.lists, n_probe=1, train_size=min(len(vectors), 64 * args.lists))
+    start = time.perf_counter()
+    for vector in vectors:
+        exact.add(vector)
+    exact_build = time.perf_counter() - start
+    start = time.perf_counter()
+    for vector in vectors:
+        ivf.add(vector)
+    ivf_build = time.perf_counter() - start
+
+    truth, exact_ms = timed_search(exact, queries, args.k)
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.lists} lists")
+    print(f"  build: exact {exact_build:.1f}s, ivf {ivf_build:.1f}s (incl. training)")
+    print(f"  exact           p50 {exact_ms:7.2f} ms  recall@{args.k} 1.000")
+
+    for n_probe in args.probes:
+        ivf.n_probe = min(n_probe, ivf.n_lists)
+        found, ivf_ms = timed_search(ivf, queries, args.k)
+        recall = np.mean([len(set(f.tolist()) & set(t.tolist())) / len(t) for f, t in zip(found, truth)])
+        print(f"  ivf n_probe={ivf.n_probe:<4} p50 {ivf_ms:7.2f} ms  recall@{args.k} {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
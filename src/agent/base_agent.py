@@ -1,7 +1,10 @@
+import asyncio
+
 from agent.interaction.input.base_input import BaseInput
 from agent.interaction.output.base_output import BaseOutput
 from agent.interaction.channel.channel import BaseChannel
 from agent.interaction.output.controller.base_outputs_controller import BaseOutputsController
+from agent.llm.request_executor import deadline
 from agent.state.controller.base_state_controller import BaseStateController
 from agent.parser.state_diff import StateDiff
 
@@ -10,9 +13,19 @@ class BaseAgent:
 
     def __init__(self,
                  state_controller: BaseStateController,
-                 output_controllers: list[BaseOutputsController] | tuple[BaseOutputsController, ...]):
+                 output_controllers: list[BaseOutputsController] | tuple[BaseOutputsController, ...],
+                 cycle_budget_seconds: float | None = None):
+        """
+        Args:
+            state_controller: Controller parsing inputs into state
+            output_controllers: Controllers producing and emitting outputs
+            cycle_budget_seconds: Latency budget shared by all LLM requests of one
+                                  run_cycle; requests still pending when it runs out
+                                  raise DeadlineExceeded. None means unbounded.
+        """
         self.state_controller = state_controller
         self.output_controllers = list(output_controllers)
+        self.cycle_budget_seconds = cycle_budget_seconds
 
     def consume_inputs(self, inputs: list[BaseInput]) -> list[BaseOutput]:
         filtered_inputs: list[BaseInput] = []
@@ -28,6 +41,18 @@ class BaseAgent:
 
         return outputs
 
+    async def consume_inputs_async(self, inputs: list[BaseInput]) -> list[BaseOutput]:
+        for input_obj in inputs:
+            self.state_controller.record_input(input_obj)
+
+        changes: list[StateDiff] = await self.state_controller.update_state_async(list(inputs))
+
+        outputs: list[BaseOutput] = []
+        for output_controller in self.output_controllers:
+            outputs.extend(await asyncio.to_thread(output_controller.generate_outputs, changes))
+
+        return outputs
+
     def dispatch_outputs(self, outputs: list[BaseOutput]) -> None:
         channel_to_outputs: dict[BaseChannel, list[BaseOutput]] = {}
 
@@ -44,7 +69,14 @@ class BaseAgent:
                 )
 
     def run_cycle(self, inputs: list[BaseInput]) -> bool:
-        outputs: list[BaseOutput] = self.consume_inputs(inputs)
+        with deadline(self.cycle_budget_seconds):
+            outputs: list[BaseOutput] = self.consume_inputs(inputs)
+        self.dispatch_outputs(outputs)
+        return self.state_controller.is_state_completed()
+
+    async def run_cycle_async(self, inputs: list[BaseInput]) -> bool:
+        with deadline(self.cycle_budget_seconds):
+            outputs: list[BaseOutput] = await self.consume_inputs_async(inputs)
         self.dispatch_outputs(outputs)
         return self.state_controller.is_state_completed()
 
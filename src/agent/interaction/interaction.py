@@ -1,3 +1,4 @@
+import json
 from typing import ClassVar
 
 from pydantic import BaseModel, Field
@@ -12,3 +13,20 @@ class Interaction(BaseModel):
 
     def get_channel(self) -> BaseChannel:
         return self.__class__.channel
+
+    def to_llm_message(self) -> dict[str, str] | None:
+        """Render this interaction as a chat message, or None when it carries no content."""
+        content = getattr(self, "input_value", None)
+        if content is None:
+            return None
+        if isinstance(content, BaseModel):
+            content = content.model_dump_json()
+        elif isinstance(content, (list, dict)):
+            try:
+                content = json.dumps(content)
+            except Exception:
+                content = str(content)
+        else:
+            content = str(content)
+        role = "assistant" if isinstance(self.actor, DefaultActor) else "user"
+        return {"role": role, "content": content}
@@ -1,15 +1,22 @@
-import json
+from __future__ import annotations
+
 import shutil
 import textwrap
+from typing import TYPE_CHECKING
 
 from agent.interaction import BaseOutput
 from agent.interaction.channel.channel import BaseChannel
 from agent.interaction.output.llm_output import ChatOutput
 from agent.interaction.output.controller.base_outputs_controller import BaseOutputsController
+from agent.llm.client_provider import get_default_client_provider
+from agent.llm.request_executor import RequestExecutor, get_default_executor
 from agent.state.controller.base_state_controller import BaseStateController
 from agent.state.entity.state_entity import BaseStateEntity
+from agent.parser.schema_renderer import render_schema
 from agent.parser.state_diff import StateDiff
-from openai import OpenAI
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 
 class LlmChatOutputsController(BaseOutputsController):
@@ -20,26 +27,36 @@ class LlmChatOutputsController(BaseOutputsController):
         client: OpenAI | None = None,
         output_channel: BaseChannel | None = None,
         wrap_width: int | None = None,
+        executor: RequestExecutor | None = None,
     ):
         self.state_controller: BaseStateController = state_controller
         self.outputs: list[ChatOutput] = []
-        self.client: OpenAI = client or OpenAI()
+        self._client = client
         self.wrap_width = wrap_width
+        self.executor = executor
 
         if output_channel is None:
             raise ValueError("An output channel must be provided to initialize the controller")
 
         super().__init__(output_channel=output_channel)
 
+    @property
+    def client(self) -> OpenAI:
+        if self._client is None:
+            return get_default_client_provider().client()
+        return self._client
+
+    @client.setter
+    def client(self, client: OpenAI) -> None:
+        self._client = client
+
     def get_state_controller(self):
         return self.state_controller
 
     def generate_outputs(self, state_diffs: list[StateDiff], max_outputs: int | None = 1) -> list[ChatOutput]:
-        entities: list[BaseStateEntity] = self.get_state_controller().storage.get_all()
-
-        incomplete_entities = [
-            entity for entity in entities
-            if entity.is_completable() and not entity.is_completed()
+        incomplete_entities: list[BaseStateEntity] = [
+            entity for entity in self.get_state_controller().storage.get_incomplete_entities()
+            if entity.is_completable()
         ]
 
         if not incomplete_entities:
@@ -59,7 +76,8 @@ class LlmChatOutputsController(BaseOutputsController):
 
     def generate_output(self, entity: BaseStateEntity, state_diff: StateDiff | None) -> ChatOutput:
         entity_json = entity.domain_dump_json(indent=2, exclude_none=True)
-        entity_schema = json.dumps(entity.domain_json_schema(), indent=2)
+        # Only what is left to ask for; collected values are shown separately below
+        entity_schema = render_schema(type(entity), entity.get_missing_fields() or None)
 
         if state_diff:
             diff_json = state_diff.model_dump_json(indent=2, exclude_none=True)
@@ -92,9 +110,10 @@ class LlmChatOutputsController(BaseOutputsController):
         let them know that they need to check facts on their own.
         """)
 
-        completion = self.client.chat.completions.parse(
-            model="gpt-4o",
-            messages=[{"role": "system", "content": prompt}] + [i.to_llm_message() for i in self.outputs]
+        messages = [{"role": "system", "content": prompt}] + [i.to_llm_message() for i in self.outputs]
+        completion = (self.executor or get_default_executor()).call(
+            lambda: self.client.chat.completions.parse(model="gpt-4o", messages=messages),
+            key="chat",
         )
 
         content = completion.choices[0].message.content
@@ -0,0 +1,52 @@
+from agent.llm.client_provider import (
+    LlmClientProvider,
+    PoolConfig,
+    PoolMetrics,
+    get_default_client_provider,
+    set_default_client_provider,
+)
+from agent.llm.fake_client import FakeAsyncLlmClient, FakeLlmClient
+from agent.llm.single_flight import SingleFlight, get_default_single_flight
+from agent.llm.response_cache import (
+    BaseResponseCache,
+    CacheStats,
+    InMemoryResponseCache,
+    SqliteResponseCache,
+    TieredResponseCache,
+    create_tiered_cache,
+    make_cache_key,
+)
+from agent.llm.model_routing import ModelRoutingPolicy, ModelTier
+from agent.llm.request_executor import (
+    DeadlineExceeded,
+    RequestExecutor,
+    deadline,
+    get_default_executor,
+    set_default_executor,
+)
+
+__all__ = [
+    "LlmClientProvider",
+    "PoolConfig",
+    "PoolMetrics",
+    "get_default_client_provider",
+    "set_default_client_provider",
+    "FakeLlmClient",
+    "FakeAsyncLlmClient",
+    "BaseResponseCache",
+    "CacheStats",
+    "InMemoryResponseCache",
+    "SqliteResponseCache",
+    "TieredResponseCache",
+    "create_tiered_cache",
+    "make_cache_key",
+    "SingleFlight",
+    "get_default_single_flight",
+    "ModelRoutingPolicy",
+    "ModelTier",
+    "RequestExecutor",
+    "DeadlineExceeded",
+    "deadline",
+    "get_default_executor",
+    "set_default_executor",
+]
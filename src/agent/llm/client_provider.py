@@ -0,0 +1,294 @@
+"""
+Process-wide OpenAI clients sharing one pooled, keep-alive HTTP connection pool.
+
+Parsers and output controllers that are not given a client borrow one from
+the default provider instead of building their own, so a process hosting
+many sessions reuses warm connections instead of paying a TLS handshake per
+component. openai is imported when the first client is built; the pools are
+built on the HTTP library its default clients derive from (httpx, or httpx2
+in newer releases).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import threading
+import weakref
+from types import ModuleType
+from typing import TYPE_CHECKING, Any
+
+from pydantic import BaseModel, Field
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
+
+
+def _http_library() -> ModuleType:
+    """The HTTP library openai's own clients are built on."""
+    from openai import DefaultHttpxClient
+
+    # DefaultHttpxClient subclasses the library's Client directly
+    return importlib.import_module(DefaultHttpxClient.__mro__[1].__module__.partition(".")[0])
+
+
+def _close_async_client(client: AsyncOpenAI, loop: asyncio.AbstractEventLoop | None) -> None:
+    """Release an async client's connections from outside its event loop."""
+    if loop is None or not loop.is_running():
+        if loop is not None and loop.is_closed():
+            # Nothing can await on a closed loop; its sockets went down with it
+            return
+        if loop is not None:
+            loop.run_until_complete(client.close())
+            return
+        runner = asyncio.new_event_loop()
+        try:
+            runner.run_until_complete(client.close())
+        except RuntimeError:
+            # Its connections belong to a loop that has since been closed
+            pass
+        finally:
+            runner.close()
+    else:
+        asyncio.run_coroutine_threadsafe(client.close(), loop)
+
+
+class PoolConfig(BaseModel):
+    max_connections: int = Field(default=100, ge=1, description="Connections open at once, idle or busy")
+    max_keepalive_connections: int = Field(default=20, ge=0, description="Idle connections kept for reuse")
+    keepalive_expiry: float = Field(default=30.0, description="Seconds an idle connection is kept")
+    connect_timeout: float = Field(default=5.0, description="Seconds to establish a connection")
+    pool_timeout: float = Field(default=10.0, description="Seconds to wait for a free connection")
+    timeout: float = Field(default=60.0, description="Read/write timeout in seconds")
+
+
+class PoolMetrics:
+    """
+    Request-level view of pool pressure.
+
+    A request counts as in flight from the moment it asks the pool for a
+    connection until its response headers arrive (or it fails). Requests
+    started while max_connections were already in flight had to queue for a
+    connection and are counted as saturated.
+    """
+
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests_started = 0
+        self.requests_completed = 0
+        self.requests_failed = 0
+        self.saturated_requests = 0
+        self._lock = threading.Lock()
+
+    def request_started(self) -> None:
+        with self._lock:
+            if self.in_flight >= self.max_connections:
+                self.saturated_requests += 1
+            self.in_flight += 1
+            self.requests_started += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def request_finished(self, failed: bool = False) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.requests_failed += 1
+            else:
+                self.requests_completed += 1
+
+    @property
+    def utilization(self) -> float:
+        return self.in_flight / self.max_connections
+
+    @property
+    def saturation_rate(self) -> float:
+        return self.saturated_requests / self.requests_started if self.requests_started else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "max_connections": self.max_connections,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "requests_started": self.requests_started,
+            "requests_completed": self.requests_completed,
+            "requests_failed": self.requests_failed,
+            "saturated_requests": self.saturated_requests,
+            "saturation_rate": round(self.saturation_rate, 4),
+        }
+
+
+class _MeteredTransport:
+    """Wraps an httpx(2) transport to feed PoolMetrics."""
+
+    def __init__(self, transport: httpx.BaseTransport, metrics: PoolMetrics):
+        self._transport = transport
+        self._metrics = metrics
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._metrics.request_started()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self._metrics.request_finished(failed=True)
+            raise
+        self._metrics.request_finished()
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+    def __enter__(self) -> _MeteredTransport:
+        self._transport.__enter__()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._transport.__exit__(*exc_info)
+
+
+class _MeteredAsyncTransport:
+    def __init__(self, transport: httpx.AsyncBaseTransport, metrics: PoolMetrics):
+        self._transport = transport
+        self._metrics = metrics
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._metrics.request_started()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._metrics.request_finished(failed=True)
+            raise
+        self._metrics.request_finished()
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+    async def __aenter__(self) -> _MeteredAsyncTransport:
+        await self._transport.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self._transport.__aexit__(*exc_info)
+
+
+class LlmClientProvider:
+    def __init__(self, pool: PoolConfig | None = None, **client_kwargs: Any):
+        """
+        Args:
+            pool: Connection pool limits and timeouts
+            **client_kwargs: Passed to OpenAI/AsyncOpenAI (api_key, base_url, ...). max_retries
+                             defaults to 0: the RequestExecutor retries within the cycle's
+                             deadline, and SDK retries on top would multiply the attempts
+        """
+        self.pool = pool or PoolConfig()
+        self.client_kwargs = {"max_retries": 0, **client_kwargs}
+        self.metrics = PoolMetrics(self.pool.max_connections)
+        self._http_client: httpx.Client | None = None
+        self._client: OpenAI | None = None
+        # Async connections belong to the event loop that opened them
+        self._async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI] = (
+            weakref.WeakKeyDictionary()
+        )
+        # Handed to callers outside of any event loop; it binds to the first loop that uses it
+        self._unbound_async_client: AsyncOpenAI | None = None
+        self._lock = threading.Lock()
+
+    def _limits_and_timeout(self, http: ModuleType) -> tuple[httpx.Limits, httpx.Timeout]:
+        limits = http.Limits(
+            max_connections=self.pool.max_connections,
+            max_keepalive_connections=self.pool.max_keepalive_connections,
+            keepalive_expiry=self.pool.keepalive_expiry,
+        )
+        timeout = http.Timeout(self.pool.timeout, connect=self.pool.connect_timeout, pool=self.pool.pool_timeout)
+        return limits, timeout
+
+    def http_client(self) -> httpx.Client:
+        """The shared blocking HTTP client; every OpenAI client of this provider sends through it."""
+        if self._http_client is None:
+            with self._lock:
+                if self._http_client is None:
+                    from openai import DefaultHttpxClient
+
+                    http = _http_library()
+                    limits, timeout = self._limits_and_timeout(http)
+                    transport = _MeteredTransport(http.HTTPTransport(limits=limits), self.metrics)
+                    self._http_client = DefaultHttpxClient(transport=transport, timeout=timeout)
+        return self._http_client
+
+    def client(self) -> OpenAI:
+        if self._client is None:
+            http_client = self.http_client()
+            with self._lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(http_client=http_client, **self.client_kwargs)
+        return self._client
+
+    def _new_async_client(self) -> AsyncOpenAI:
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        http = _http_library()
+        limits, timeout = self._limits_and_timeout(http)
+        transport = _MeteredAsyncTransport(http.AsyncHTTPTransport(limits=limits), self.metrics)
+        return AsyncOpenAI(
+            http_client=DefaultAsyncHttpxClient(transport=transport, timeout=timeout),
+            **self.client_kwargs,
+        )
+
+    def async_client(self) -> AsyncOpenAI:
+        """The AsyncOpenAI client of the running event loop (or the one shared by loop-less callers)."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        with self._lock:
+            if loop is None:
+                if self._unbound_async_client is None:
+                    self._unbound_async_client = self._new_async_client()
+                return self._unbound_async_client
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._async_clients[loop] = self._new_async_client()
+        return client
+
+    def close(self) -> None:
+        """
+        Close every client of this provider.
+
+        Async clients are closed on their own event loop: awaited there if it
+        is idle, scheduled on it if it is running in another thread.
+        """
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            async_clients: list[tuple[AsyncOpenAI, asyncio.AbstractEventLoop | None]] = [
+                (client, loop) for loop, client in self._async_clients.items()
+            ]
+            if self._unbound_async_client is not None:
+                async_clients.append((self._unbound_async_client, None))
+            self._http_client = None
+            self._client = None
+            self._unbound_async_client = None
+            self._async_clients.clear()
+
+        for client, loop in async_clients:
+            _close_async_client(client, loop)
+
+
+_default_provider: LlmClientProvider | None = None
+
+
+def get_default_client_provider() -> LlmClientProvider:
+    global _default_provider
+    if _default_provider is None:
+        _default_provider = LlmClientProvider()
+    return _default_provider
+
+
+def set_default_client_provider(provider: LlmClientProvider) -> None:
+    global _default_provider
+    _default_provider = provider
@@ -0,0 +1,163 @@
+"""Offline stand-ins for the OpenAI clients, for tests and dry runs."""
+
+import asyncio
+import threading
+import time
+from collections.abc import Callable
+from types import SimpleNamespace
+from typing import Any
+
+from pydantic import BaseModel
+
+Responder = Callable[[list[dict[str, Any]], type[BaseModel] | None], BaseModel | str]
+
+
+def _empty_responder(messages: list[dict[str, Any]], response_format: type[BaseModel] | None) -> BaseModel | str:
+    return response_format() if response_format is not None else ""
+
+
+def _build_message(result: BaseModel | str) -> SimpleNamespace:
+    if isinstance(result, BaseModel):
+        return SimpleNamespace(parsed=result, content=result.model_dump_json(), refusal=None)
+    return SimpleNamespace(parsed=None, content=result, refusal=None)
+
+
+def _build_completion(*results: BaseModel | str) -> SimpleNamespace:
+    return SimpleNamespace(choices=[
+        SimpleNamespace(index=index, message=_build_message(result), finish_reason="stop")
+        for index, result in enumerate(results)
+    ])
+
+
+class _FakeChatStream:
+    """Mimics ChatCompletionStreamManager/ChatCompletionStream: content.delta events, then content.done."""
+
+    def __init__(self, result: BaseModel | str, chunk_size: int, latency_seconds: float):
+        self._completion = _build_completion(result)
+        content = self._completion.choices[0].message.content
+        self._chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)] or [""]
+        self._chunk_latency = latency_seconds / len(self._chunks)
+        self.closed = False
+
+    def __enter__(self) -> "_FakeChatStream":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.closed = True
+
+    def __iter__(self):
+        snapshot = ""
+        for chunk in self._chunks:
+            if self.closed:
+                return
+            if self._chunk_latency:
+                time.sleep(self._chunk_latency)
+            snapshot += chunk
+            yield SimpleNamespace(type="content.delta", delta=chunk, snapshot=snapshot, parsed=None)
+        message = self._completion.choices[0].message
+        yield SimpleNamespace(type="content.done", content=message.content, parsed=message.parsed)
+
+    def get_final_completion(self) -> SimpleNamespace:
+        return self._completion
+
+
+class _FakeCompletions:
+    def __init__(self, owner: "FakeLlmClient"):
+        self._owner = owner
+
+    def parse(self, *, model: str, messages: list[dict[str, Any]], response_format: type[BaseModel] | None = None,
+              **kwargs: Any) -> SimpleNamespace:
+        return self._owner._complete(model, messages, response_format, kwargs.get("n") or 1)
+
+    def create(self, *, model: str, messages: list[dict[str, Any]], **kwargs: Any) -> SimpleNamespace:
+        return self._owner._complete(model, messages, None)
+
+    def stream(self, *, model: str, messages: list[dict[str, Any]],
+               response_format: type[BaseModel] | None = None, **kwargs: Any) -> _FakeChatStream:
+        return self._owner._stream(model, messages, response_format)
+
+
+class _FakeAsyncCompletions:
+    def __init__(self, owner: "FakeAsyncLlmClient"):
+        self._owner = owner
+
+    async def parse(self, *, model: str, messages: list[dict[str, Any]],
+                    response_format: type[BaseModel] | None = None, **kwargs: Any) -> SimpleNamespace:
+        return await self._owner._complete(model, messages, response_format, kwargs.get("n") or 1)
+
+    async def create(self, *, model: str, messages: list[dict[str, Any]], **kwargs: Any) -> SimpleNamespace:
+        return await self._owner._complete(model, messages, None)
+
+
+class FakeLlmClient:
+    """
+    Drop-in for OpenAI exposing chat.completions.parse/create/stream.
+
+    Every request is answered by a responder callable that receives the
+    messages and the requested response_format, and returns either a parsed
+    pydantic object or plain text content; it is called once per requested
+    choice (n). Streams deliver the serialized
+    response in fixed-size content deltas. Requests are recorded for
+    inspection.
+    """
+
+    def __init__(self, responder: Responder | None = None, latency_seconds: float = 0.0,
+                 stream_chunk_size: int = 16):
+        """
+        Args:
+            responder: Produces the response for a request
+                       (defaults to an empty instance of response_format)
+            latency_seconds: Simulated round-trip time per request; streams spread it over their chunks
+            stream_chunk_size: Characters per streamed content delta
+        """
+        self.responder = responder or _empty_responder
+        self.latency_seconds = latency_seconds
+        self.stream_chunk_size = stream_chunk_size
+        self.requests: list[dict[str, Any]] = []
+        self.streams: list[_FakeChatStream] = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+
+    @property
+    def calls(self) -> int:
+        return len(self.requests)
+
+    def _complete(self, model: str, messages: list[dict[str, Any]],
+                  response_format: type[BaseModel] | None, n: int = 1) -> SimpleNamespace:
+        with self._lock:
+            self.requests.append({"model": model, "messages": messages, "response_format": response_format})
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return _build_completion(*(self.responder(messages, response_format) for _ in range(n)))
+
+    def _stream(self, model: str, messages: list[dict[str, Any]],
+                response_format: type[BaseModel] | None) -> _FakeChatStream:
+        with self._lock:
+            self.requests.append({"model": model, "messages": messages, "response_format": response_format})
+        stream = _FakeChatStream(self.responder(messages, response_format), self.stream_chunk_size, self.latency_seconds)
+        self.streams.append(stream)
+        return stream
+
+
+class FakeAsyncLlmClient:
+    """Drop-in for AsyncOpenAI; see FakeLlmClient."""
+
+    def __init__(self, responder: Responder | None = None, latency_seconds: float = 0.0):
+        self.responder = responder or _empty_responder
+        self.latency_seconds = latency_seconds
+        self.requests: list[dict[str, Any]] = []
+        self.chat = SimpleNamespace(completions=_FakeAsyncCompletions(self))
+
+    @property
+    def calls(self) -> int:
+        return len(self.requests)
+
+    async def _complete(self, model: str, messages: list[dict[str, Any]],
+                        response_format: type[BaseModel] | None, n: int = 1) -> SimpleNamespace:
+        self.requests.append({"model": model, "messages": messages, "response_format": response_format})
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        return _build_completion(*(self.responder(messages, response_format) for _ in range(n)))
@@ -0,0 +1,86 @@
+"""Incremental extraction of array items from a streamed JSON object."""
+
+
+class JsonArrayItemScanner:
+    """
+    Returns the raw JSON text of each object in one top-level array as soon as it closes.
+
+    Structured-output responses arrive as content deltas of a single object
+    such as {"diffs": [{...}, {...}]}. Feeding the deltas in order returns
+    every object (or nested array) in the array under array_key once its
+    closing brace or bracket has been seen, so callers can validate and act on
+    it before the rest of the response is generated. Only string/escape state and nesting
+    depth are tracked; the items themselves are parsed by the caller.
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self._buffer: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        # Position of the string currently being read at the top level (candidate key)
+        self._string_start: int | None = None
+        self._last_key: str | None = None
+        self._in_array = False
+        self._item_start: int | None = None
+        self._position = 0
+
+    def feed(self, chunk: str) -> list[str]:
+        """
+        Consume the next content delta.
+
+        Args:
+            chunk: Next piece of the streamed JSON text
+
+        Returns:
+            Raw JSON text of every array item completed by this chunk
+        """
+        completed: list[str] = []
+        self._buffer.append(chunk)
+        text = "".join(self._buffer)
+        self._buffer = [text]
+
+        for index in range(self._position, len(text)):
+            char = text[index]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._string_start is not None:
+                        self._last_key = text[self._string_start + 1:index]
+                        self._string_start = None
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._string_start = index
+                continue
+
+            if char in "{[":
+                if self._in_array and self._depth == 2 and self._item_start is None:
+                    self._item_start = index
+                self._depth += 1
+                if char == "[" and self._depth == 2 and self._last_key == self.array_key:
+                    self._in_array = True
+            elif char in "}]":
+                self._depth -= 1
+                if self._in_array and self._depth == 1:
+                    # The array itself closed
+                    self._in_array = False
+                    self._last_key = None
+                elif self._in_array and self._depth == 2 and self._item_start is not None:
+                    completed.append(text[self._item_start:index + 1])
+                    self._item_start = None
+
+        self._position = len(text)
+        # Drop what can no longer be part of an item to keep the buffer small
+        if self._item_start is None and self._string_start is None:
+            self._buffer = [""]
+            self._position = 0
+        return completed
@@ -0,0 +1,89 @@
+"""Tiered model selection: try cheap models first, escalate on specific failures."""
+
+import threading
+from collections import Counter
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from agent.llm.request_executor import LatencyTracker
+
+# Reasons a tier's answer is rejected and the next tier is asked
+SCHEMA_PARSE_FAILURE = "schema_parse_failure"
+UNKNOWN_ENTITY_CLASS = "unknown_entity_class"
+VALIDATION_ERROR = "validation_error"
+LOW_AGREEMENT = "low_agreement"
+
+
+class ModelTier(BaseModel):
+    model: str = Field(description="Model name sent to the provider")
+    samples: int = Field(default=1, ge=1, description="Completions requested to measure agreement")
+    sampling_temperature: float = Field(default=0.7, description="Temperature used when samples > 1")
+    min_agreement: float = Field(default=1.0, ge=0.0, le=1.0,
+                                 description="Share of samples that must match the majority answer")
+
+
+class TierStats:
+    def __init__(self):
+        self.requests = 0
+        self.escalations = 0
+        self.latencies = LatencyTracker()
+
+    @property
+    def escalation_rate(self) -> float:
+        return self.escalations / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        p50 = self.latencies.percentile(0.5)
+        p95 = self.latencies.percentile(0.95)
+        return {
+            "requests": self.requests,
+            "escalations": self.escalations,
+            "escalation_rate": round(self.escalation_rate, 4),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class ModelRoutingPolicy:
+    """
+    Ordered model tiers for one kind of request.
+
+    Every request starts at the first tier. A tier's answer is accepted unless
+    the caller reports an escalation reason, in which case the next tier is
+    asked; the last tier's answer is always accepted. A single-tier policy
+    behaves exactly like calling that model directly.
+    """
+
+    def __init__(self, tiers: list[ModelTier | str]):
+        if not tiers:
+            raise ValueError("ModelRoutingPolicy requires at least one tier")
+        self.tiers: list[ModelTier] = [
+            tier if isinstance(tier, ModelTier) else ModelTier(model=tier) for tier in tiers
+        ]
+        self.stats: dict[str, TierStats] = {tier.model: TierStats() for tier in self.tiers}
+        self.escalation_reasons: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def cache_namespace(self) -> str:
+        """Identifies the policy in cache keys; a single tier keeps its model name."""
+        return "|".join(tier.model for tier in self.tiers)
+
+    def is_last(self, tier: ModelTier) -> bool:
+        return tier is self.tiers[-1]
+
+    def record(self, tier: ModelTier, latency_seconds: float, escalation_reason: str | None = None) -> None:
+        stats = self.stats[tier.model]
+        with self._lock:
+            stats.requests += 1
+            if escalation_reason is not None:
+                stats.escalations += 1
+                self.escalation_reasons[escalation_reason] += 1
+        stats.latencies.record(latency_seconds)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "tiers": {model: stats.as_dict() for model, stats in self.stats.items()},
+            "escalation_reasons": dict(self.escalation_reasons),
+        }
@@ -0,0 +1,366 @@
+"""
+Tail-latency control for provider calls: deadlines, hedged requests and jittered retries.
+
+A RequestExecutor wraps a zero-argument callable that performs one request.
+Once enough latencies have been observed for a request kind, a call still
+running after the observed p95 gets a duplicate (hedged) request and the
+first successful response wins. Async losers are cancelled; a blocking loser
+cannot be interrupted once its thread runs, so it finishes in the pool and
+its result is handed to the caller's discard callback (e.g. to close a
+response). Requests should therefore bound their own duration, for example
+with a timeout taken from get_remaining_budget(). Transient failures are
+retried with full-jitter exponential backoff. Every wait is bounded by the
+deadline of the current cycle, if one is set with `deadline()`.
+"""
+
+import asyncio
+import contextvars
+import math
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import TypeVar
+
+T = TypeVar("T")
+
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("llm_request_deadline", default=None)
+
+# Error types the OpenAI SDK raises for failures worth retrying; matched by
+# name so this module does not import openai
+_TRANSIENT_ERROR_NAMES = frozenset({
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+})
+
+
+class DeadlineExceeded(TimeoutError):
+    """The latency budget of the current cycle ran out before a response arrived."""
+
+
+@contextmanager
+def deadline(seconds: float | None) -> Iterator[None]:
+    """
+    Bound every executor call made inside the block (including in tasks and
+    threads started with a copied context) to a shared latency budget.
+
+    Nested deadlines can only tighten the budget. None leaves it unchanged.
+    """
+    if seconds is None:
+        yield
+        return
+
+    expires_at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires_at if current is None else min(current, expires_at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_remaining_budget() -> float | None:
+    """Seconds left until the current deadline; None without one."""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return max(expires_at - time.monotonic(), 0.0)
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    if type(exc).__name__ in _TRANSIENT_ERROR_NAMES or isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    status_code = getattr(exc, "status_code", None)
+    return isinstance(status_code, int) and (status_code == 429 or status_code >= 500)
+
+
+def _discard_when_done(futures: set[Future], discard: Callable[[T], None] | None) -> None:
+    """Hand the results of abandoned, still running requests to discard once they arrive."""
+    if discard is None:
+        return
+
+    def release(future: Future) -> None:
+        if not future.cancelled() and future.exception() is None:
+            discard(future.result())
+
+    for future in futures:
+        future.add_done_callback(release)
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies."""
+
+    def __init__(self, window: int = 256):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, quantile: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(math.ceil(quantile * len(samples)) - 1, len(samples) - 1)
+        return samples[max(index, 0)]
+
+
+class ExecutorStats:
+    def __init__(self):
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+        self.deadlines_exceeded = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retries": self.retries,
+            "deadlines_exceeded": self.deadlines_exceeded,
+        }
+
+
+class RequestExecutor:
+    def __init__(
+        self,
+        hedge_quantile: float = 0.95,
+        min_samples: int = 20,
+        min_hedge_delay: float = 0.05,
+        max_attempts: int = 3,
+        base_backoff: float = 0.25,
+        max_backoff: float = 4.0,
+        max_workers: int = 32,
+        window: int = 256,
+    ):
+        """
+        Args:
+            hedge_quantile: Latency quantile after which a hedged request is sent
+            min_samples: Latencies of a request kind observed before it is hedged
+            min_hedge_delay: Lower bound of the hedge delay in seconds
+            max_attempts: Attempts per call, counting the first; retries only
+                          follow transient errors
+            base_backoff: Backoff cap of the first retry in seconds (doubles per retry)
+            max_backoff: Upper bound of the backoff in seconds
+            max_workers: Threads available to blocking calls
+            window: Latencies kept per request kind
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if not 0 < hedge_quantile <= 1:
+            raise ValueError("hedge_quantile must be in (0, 1]")
+
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.min_hedge_delay = min_hedge_delay
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_workers = max_workers
+        self.window = window
+        self.stats = ExecutorStats()
+        self._trackers: dict[str, LatencyTracker] = {}
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def tracker(self, key: str) -> LatencyTracker:
+        with self._lock:
+            tracker = self._trackers.get(key)
+            if tracker is None:
+                tracker = self._trackers[key] = LatencyTracker(self.window)
+            return tracker
+
+    def hedge_delay(self, key: str) -> float | None:
+        """Seconds after which a call of this kind is hedged; None while too few latencies are known."""
+        tracker = self.tracker(key)
+        if len(tracker) < self.min_samples:
+            return None
+        return max(tracker.percentile(self.hedge_quantile), self.min_hedge_delay)
+
+    def call(self, fn: Callable[[], T], key: str = "default", discard: Callable[[T], None] | None = None) -> T:
+        """
+        Run a blocking request with hedging, retries and the current deadline.
+
+        Threads cannot be interrupted, so a losing or timed-out request keeps
+        running in the pool until it returns (requests not started yet are
+        cancelled). Its result is then passed to discard.
+
+        Args:
+            fn: Performs one request; must be safe to run twice concurrently
+            key: Request kind whose latencies drive the hedge delay
+            discard: Releases the result of a request that lost or ran past
+                     the deadline, e.g. by closing an open stream
+
+        Returns:
+            The first successful result
+        """
+        self.stats.calls += 1
+        for attempt in range(self.max_attempts):
+            try:
+                return self._attempt(fn, key, discard)
+            except Exception as exc:
+                if not self._should_retry(exc, attempt):
+                    raise
+            time.sleep(self._backoff_seconds(attempt))
+        raise AssertionError("unreachable")
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]], key: str = "default") -> T:
+        """Awaitable counterpart of call; losing requests are cancelled."""
+        self.stats.calls += 1
+        for attempt in range(self.max_attempts):
+            try:
+                return await self._attempt_async(fn, key)
+            except Exception as exc:
+                if not self._should_retry(exc, attempt):
+                    raise
+            await asyncio.sleep(self._backoff_seconds(attempt))
+        raise AssertionError("unreachable")
+
+    def _attempt(self, fn: Callable[[], T], key: str, discard: Callable[[T], None] | None) -> T:
+        pool = self._get_pool()
+        started: dict[Future, float] = {}
+
+        def submit() -> None:
+            context = contextvars.copy_context()
+            started[pool.submit(context.run, fn)] = time.monotonic()
+
+        submit()
+        primary = next(iter(started))
+        hedge_delay = self.hedge_delay(key)
+        pending: set[Future] = set(started)
+        error: BaseException | None = None
+
+        while pending:
+            remaining = get_remaining_budget()
+            timeout = remaining
+            can_hedge = hedge_delay is not None and len(started) == 1
+            if can_hedge:
+                until_hedge = max(hedge_delay - (time.monotonic() - started[primary]), 0.0)
+                timeout = until_hedge if remaining is None else min(until_hedge, remaining)
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    _discard_when_done(pending, discard)
+                    self._finish(key, future is not primary, time.monotonic() - started[future], pending)
+                    return future.result()
+                error = future.exception()
+
+            if not done:
+                if remaining is not None and get_remaining_budget() <= 0:
+                    _discard_when_done(pending, discard)
+                    self._expire(pending)
+                if can_hedge:
+                    self.stats.hedges += 1
+                    submit()
+                    pending = {f for f in started if not f.done()}
+
+        raise error
+
+    async def _attempt_async(self, fn: Callable[[], Awaitable[T]], key: str) -> T:
+        tasks: dict[asyncio.Task, float] = {}
+
+        def submit() -> None:
+            tasks[asyncio.ensure_future(fn())] = time.monotonic()
+
+        submit()
+        primary = next(iter(tasks))
+        hedge_delay = self.hedge_delay(key)
+        pending: set[asyncio.Task] = set(tasks)
+        error: BaseException | None = None
+
+        try:
+            while pending:
+                remaining = get_remaining_budget()
+                timeout = remaining
+                can_hedge = hedge_delay is not None and len(tasks) == 1
+                if can_hedge:
+                    until_hedge = max(hedge_delay - (time.monotonic() - tasks[primary]), 0.0)
+                    timeout = until_hedge if remaining is None else min(until_hedge, remaining)
+
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._finish(key, task is not primary, time.monotonic() - tasks[task], pending)
+                        return task.result()
+                    error = task.exception()
+
+                if not done:
+                    if remaining is not None and get_remaining_budget() <= 0:
+                        self._expire(pending)
+                    if can_hedge:
+                        self.stats.hedges += 1
+                        submit()
+                        pending = {t for t in tasks if not t.done()}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        raise error
+
+    def _finish(self, key: str, hedge_won: bool, latency: float, losers: set[Future] | set[asyncio.Task]) -> None:
+        self.tracker(key).record(latency)
+        if hedge_won:
+            self.stats.hedge_wins += 1
+        for loser in losers:
+            loser.cancel()
+
+    def _expire(self, pending: set[Future] | set[asyncio.Task]) -> None:
+        for future in pending:
+            future.cancel()
+        self.stats.deadlines_exceeded += 1
+        raise DeadlineExceeded("LLM request did not complete within the cycle's latency budget")
+
+    def _should_retry(self, exc: Exception, attempt: int) -> bool:
+        if attempt + 1 >= self.max_attempts or not is_transient_error(exc):
+            return False
+        remaining = get_remaining_budget()
+        if remaining is not None and remaining <= 0:
+            return False
+        self.stats.retries += 1
+        return True
+
+    def _backoff_seconds(self, attempt: int) -> float:
+        # Full jitter: spreads retries of concurrent callers instead of synchronizing them
+        backoff = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        remaining = get_remaining_budget()
+        return backoff if remaining is None else min(backoff, remaining)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="llm-request")
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_default_executor: RequestExecutor | None = None
+
+
+def get_default_executor() -> RequestExecutor:
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = RequestExecutor()
+    return _default_executor
+
+
+def set_default_executor(executor: RequestExecutor) -> None:
+    global _default_executor
+    _default_executor = executor
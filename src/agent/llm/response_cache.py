@@ -0,0 +1,297 @@
+"""Response caches for deterministic (temperature=0) structured LLM calls."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+
+
+@lru_cache(maxsize=None)
+def _schema_fingerprint(response_format: type[BaseModel]) -> str:
+    return json.dumps(response_format.model_json_schema(), sort_keys=True, separators=(",", ":"))
+
+
+def make_cache_key(model: str, messages: list[dict[str, Any]], response_format: type[BaseModel]) -> str:
+    """
+    Build a stable cache key for a structured completion request.
+
+    Args:
+        model: Model name the request is sent to
+        messages: Chat messages of the request
+        response_format: Pydantic model used as the structured response schema
+
+    Returns:
+        Hex-encoded SHA-256 digest of the request
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "response_schema": _schema_fingerprint(response_format),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    """Hit/miss counters shared by all cache implementations."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class BaseResponseCache(ABC):
+    """Abstract key/value cache of serialized LLM responses."""
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @abstractmethod
+    def get(self, key: str) -> str | None:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Cache key produced by make_cache_key
+
+        Returns:
+            Serialized response, or None on a miss or an expired entry
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a serialized response, evicting old entries if needed.
+
+        Args:
+            key: Cache key produced by make_cache_key
+            value: Serialized response
+        """
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+
+class InMemoryResponseCache(BaseResponseCache):
+    """Process-local LRU cache with optional TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float | None = None):
+        """
+        Args:
+            max_entries: Entries kept before the least recently used one is evicted
+            ttl_seconds: Lifetime of an entry; None keeps entries until evicted
+        """
+        super().__init__()
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            created_at, value = entry
+            if self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds:
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteResponseCache(BaseResponseCache):
+    """On-disk cache that survives process restarts, evicting least recently used rows."""
+
+    def __init__(self, path: str | Path, max_entries: int = 100_000, ttl_seconds: float | None = None):
+        """
+        Args:
+            path: SQLite database file, created if missing
+            max_entries: Rows kept before least recently used ones are evicted
+            ttl_seconds: Lifetime of an entry; None keeps entries until evicted
+        """
+        super().__init__()
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_response_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_response_cache_last_access ON llm_response_cache (last_access)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_response_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+
+            self._conn.execute("UPDATE llm_response_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_response_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_response_cache").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_response_cache WHERE key IN ("
+                    " SELECT key FROM llm_response_cache ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.stats.evictions += overflow
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_response_cache")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredResponseCache(BaseResponseCache):
+    """
+    Chains caches from fastest to slowest.
+
+    A hit in a lower tier is copied into every tier above it, and writes go to
+    all tiers.
+    """
+
+    def __init__(self, tiers: list[BaseResponseCache]):
+        super().__init__()
+        if not tiers:
+            raise ValueError("TieredResponseCache requires at least one tier")
+        self.tiers = list(tiers)
+
+    def get(self, key: str) -> str | None:
+        for depth, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for upper_tier in self.tiers[:depth]:
+                    upper_tier.set(key, value)
+                self.stats.hits += 1
+                return value
+
+        self.stats.misses += 1
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def clear(self) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+
+def create_tiered_cache(
+    path: str | Path,
+    max_memory_entries: int = 1024,
+    max_disk_entries: int = 100_000,
+    ttl_seconds: float | None = None,
+) -> TieredResponseCache:
+    """
+    Build the usual in-memory LRU in front of an on-disk SQLite cache.
+
+    Args:
+        path: SQLite database file for the disk tier
+        max_memory_entries: LRU capacity of the memory tier
+        max_disk_entries: Row capacity of the disk tier
+        ttl_seconds: Lifetime applied to both tiers
+
+    Returns:
+        Two-tier cache
+    """
+    return TieredResponseCache([
+        InMemoryResponseCache(max_entries=max_memory_entries, ttl_seconds=ttl_seconds),
+        SqliteResponseCache(path, max_entries=max_disk_entries, ttl_seconds=ttl_seconds),
+    ])
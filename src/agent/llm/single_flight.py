@@ -0,0 +1,121 @@
+"""Coalescing of identical in-flight requests into a single upstream call."""
+
+import asyncio
+import copy
+import threading
+import weakref
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Lets concurrent callers with the same key share one execution.
+
+    The first caller for a key (the leader) runs the request; callers arriving
+    while it is in flight wait for it and receive a deep copy of its result,
+    or the same exception. The shared result is copied before anyone can
+    change it, so no caller sees another's mutations. Nothing is remembered once the call completes, so
+    this complements rather than replaces a response cache. Thread and asyncio
+    callers are tracked separately; asyncio calls are shared per event loop.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, _InFlightCall] = {}
+        self._tasks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Task]] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """
+        Run fn, or wait for the identical call already in flight.
+
+        Args:
+            key: Stable hash of everything that determines the result
+            fn: Performs the request
+
+        Returns:
+            The result; followers get deep copies of a snapshot taken before
+            the leader returns
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _InFlightCall()
+                self.upstream_calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            result = fn()
+            # Published as a private copy: the leader may mutate what it returns
+            call.result = copy.deepcopy(result)
+            return result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Awaitable counterpart of do.
+
+        The shared request runs as its own task, so a cancelled caller does
+        not cancel it for the others. Every caller, the leader included,
+        gets its own deep copy of the task's result.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.calls += 1
+            tasks = self._tasks.setdefault(loop, {})
+            task = tasks.get(key)
+            leader = task is None
+            if leader:
+                task = tasks[key] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda _: tasks.pop(key, None))
+                self.upstream_calls += 1
+            else:
+                self.coalesced += 1
+
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            "calls": self.calls,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+        }
+
+
+_default_single_flight: SingleFlight | None = None
+
+
+def get_default_single_flight() -> SingleFlight:
+    global _default_single_flight
+    if _default_single_flight is None:
+        _default_single_flight = SingleFlight()
+    return _default_single_flight
@@ -0,0 +1,475 @@
+"""Columnar state storage: entity fields kept as typed NumPy columns, materialized on access."""
+
+import copy
+import json
+from datetime import datetime, timezone
+from typing import Any, Literal, Union, get_args, get_origin
+
+import numpy as np
+from pydantic_core import PydanticUndefined
+
+from agent.parser.state_diff import StateDiff
+from agent.state.entity.actor.base_actor import BaseActor
+from agent.state.entity.state_entity import BaseStateEntity, ValidationErrorHandlingMode
+from agent.state.entity.types import FieldDiff
+from agent.state.storage.base_state_storage import BaseStateStorage
+from agent.state.storage.snapshot import qualified_name, resolve_class
+
+# Per-row state of a column cell
+_UNSET, _NULL, _VALUE = 0, 1, 2
+
+_INITIAL_CAPACITY = 64
+# Short values (names, statuses, literals) repeat a lot and are stored once;
+# longer ones such as summaries rarely do and skip the intern table
+_MAX_INTERNED_LENGTH = 24
+
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _column_kind(annotation: Any) -> str:
+    origin = get_origin(annotation)
+    if origin is Union or (origin is not None and type(None) in get_args(annotation)):
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        if len(args) != 1:
+            return "object"
+        annotation = args[0]
+        origin = get_origin(annotation)
+
+    if annotation is bool:
+        return "bool"
+    if annotation is int:
+        return "int"
+    if annotation is float:
+        return "float"
+    if annotation is str or (origin is Literal and all(isinstance(a, str) for a in get_args(annotation))):
+        return "str"
+    if origin is list and get_args(annotation) == (str,):
+        return "str_list"
+    return "object"
+
+
+class _StringTable:
+    """UTF-8 blob with an offset array; one shared table per storage."""
+
+    def __init__(self):
+        self._data = bytearray()
+        self._offsets = np.zeros(_INITIAL_CAPACITY + 1, dtype=np.int64)
+        self._count = 0
+        self._interned: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, value: str) -> int:
+        interned = len(value) <= _MAX_INTERNED_LENGTH
+        if interned:
+            code = self._interned.get(value)
+            if code is not None:
+                return code
+
+        self._data += value.encode()
+        self._offsets = _grow(self._offsets, self._count + 2)
+        self._offsets[self._count + 1] = len(self._data)
+        code = self._count
+        self._count += 1
+        if interned:
+            self._interned[value] = code
+        return code
+
+    def get(self, code: int) -> str:
+        return self._data[self._offsets[code]:self._offsets[code + 1]].decode()
+
+    def find(self, value: str) -> np.ndarray:
+        """Codes holding value (several for repeated long strings)."""
+        if len(value) <= _MAX_INTERNED_LENGTH:
+            code = self._interned.get(value)
+            return np.array([] if code is None else [code], dtype=np.int32)
+
+        encoded = value.encode()
+        offsets = self._offsets[:self._count + 1]
+        candidates = np.flatnonzero(np.diff(offsets) == len(encoded))
+        return np.array(
+            [c for c in candidates if self._data[offsets[c]:offsets[c + 1]] == encoded], dtype=np.int32
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._data) + self._offsets.nbytes
+
+
+class _Column:
+    """One domain field of one entity class."""
+
+    _DTYPES = {"bool": np.bool_, "int": np.int64, "float": np.float64, "str": np.int32}
+
+    def __init__(self, kind: str, default: Any, strings: _StringTable):
+        self.kind = kind
+        self.default = default
+        self.strings = strings
+        self.state = np.zeros(_INITIAL_CAPACITY, dtype=np.int8)
+        if kind in self._DTYPES:
+            self.values: Any = np.zeros(_INITIAL_CAPACITY, dtype=self._DTYPES[kind])
+        elif kind == "str_list":
+            # CSR layout: row i owns list_codes[offsets[i]:offsets[i + 1]]
+            self.offsets = np.zeros(_INITIAL_CAPACITY + 1, dtype=np.int64)
+            self.list_codes = np.zeros(_INITIAL_CAPACITY, dtype=np.int32)
+        else:
+            self.values = []
+
+    def append(self, row: int, state: int, value: Any) -> None:
+        self.state = _grow(self.state, row + 1)
+        self.state[row] = state
+
+        if self.kind == "object":
+            self.values.append(value if state == _VALUE else None)
+        elif self.kind == "str_list":
+            start = self.offsets[row]
+            items = value if state == _VALUE else ()
+            self.offsets = _grow(self.offsets, row + 2)
+            self.offsets[row + 1] = start + len(items)
+            self.list_codes = _grow(self.list_codes, start + len(items))
+            for i, item in enumerate(items):
+                self.list_codes[start + i] = self.strings.add(item)
+        else:
+            self.values = _grow(self.values, row + 1)
+            if state == _VALUE:
+                self.values[row] = self.strings.add(value) if self.kind == "str" else value
+
+    def get(self, row: int) -> Any:
+        """Python value of a _VALUE cell."""
+        if self.kind == "str":
+            return self.strings.get(self.values[row])
+        if self.kind == "str_list":
+            codes = self.list_codes[self.offsets[row]:self.offsets[row + 1]]
+            return [self.strings.get(code) for code in codes]
+        if self.kind == "object":
+            return copy.deepcopy(self.values[row])
+        return self.values[row].item()
+
+    def matches(self, value: Any, count: int) -> np.ndarray:
+        """Rows whose value equals value; for list[str] columns a str matches rows containing it."""
+        state = self.state[:count]
+        mask = np.zeros(count, dtype=bool)
+        if value is None:
+            mask |= state == _NULL
+        elif self.kind == "str_list" and isinstance(value, str):
+            hits = np.flatnonzero(np.isin(self.list_codes[:self.offsets[count]], self.strings.find(value)))
+            mask[np.searchsorted(self.offsets[:count + 1], hits, side="right") - 1] = True
+        elif self.kind == "str":
+            mask |= (state == _VALUE) & np.isin(self.values[:count], self.strings.find(value))
+        elif self.kind in self._DTYPES:
+            mask |= (state == _VALUE) & (self.values[:count] == value)
+        else:
+            rows = np.flatnonzero(state == _VALUE)
+            mask[[row for row in rows if self.get(row) == value]] = True
+
+        if self.default is not PydanticUndefined and self.default == value:
+            mask |= state == _UNSET
+        return mask
+
+    @property
+    def nbytes(self) -> int:
+        if self.kind == "str_list":
+            return self.state.nbytes + self.offsets.nbytes + self.list_codes.nbytes
+        if self.kind == "object":
+            return self.state.nbytes + 8 * len(self.values)
+        return self.state.nbytes + self.values.nbytes
+
+
+class _ClassTable:
+    """Rows of one entity class, one column per domain field."""
+
+    def __init__(self, entity_class: type[BaseStateEntity], index: int, strings: _StringTable):
+        self.entity_class = entity_class
+        self.index = index
+        self.count = 0
+        self.columns = {
+            name: _Column(
+                _column_kind(info.annotation),
+                info.default if info.default_factory is None else PydanticUndefined,
+                strings,
+            )
+            for name, info in entity_class.get_domain_fields().items()
+        }
+        self.created = np.zeros(_INITIAL_CAPACITY, dtype=np.float64)
+        self.versions = np.zeros(_INITIAL_CAPACITY, dtype=np.int64)
+        self.ordinals = np.zeros(_INITIAL_CAPACITY, dtype=np.int64)
+        self.completed = np.zeros(_INITIAL_CAPACITY, dtype=bool)
+        # Metadata most rows do not have
+        self.actors: dict[int, list[BaseActor]] = {}
+        self.embeddings: dict[int, list[float]] = {}
+
+    def append(self, entity: BaseStateEntity, ordinal: int, version: int) -> int:
+        row = self.count
+        fields_set = entity.model_fields_set
+        for name, column in self.columns.items():
+            if name not in fields_set:
+                column.append(row, _UNSET, None)
+            else:
+                value = getattr(entity, name)
+                column.append(row, _NULL if value is None else _VALUE, value)
+
+        size = row + 1
+        self.created = _grow(self.created, size)
+        self.versions = _grow(self.versions, size)
+        self.ordinals = _grow(self.ordinals, size)
+        self.completed = _grow(self.completed, size)
+        self.created[row] = entity.date_created_utc.timestamp()
+        self.versions[row] = version
+        self.ordinals[row] = ordinal
+        # Rows are never modified after insert, so completion is decided once
+        self.completed[row] = entity.is_completed()
+        if entity.actors:
+            self.actors[row] = list(entity.actors)
+        if entity.embedding is not None:
+            self.embeddings[row] = list(entity.embedding)
+
+        self.count = size
+        return row
+
+    def materialize(self, row: int) -> BaseStateEntity:
+        values: dict[str, Any] = {}
+        for name, column in self.columns.items():
+            state = column.state[row]
+            if state != _UNSET:
+                values[name] = column.get(row) if state == _VALUE else None
+
+        values["date_created_utc"] = datetime.fromtimestamp(self.created[row], timezone.utc)
+        if row in self.actors:
+            values["actors"] = self.actors[row]
+        if row in self.embeddings:
+            values["embedding"] = self.embeddings[row]
+        return self.entity_class.model_validate(values)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values()) + sum(
+            array.nbytes for array in (self.created, self.versions, self.ordinals, self.completed)
+        )
+
+
+class ColumnarStateStorage(BaseStateStorage):
+    """
+    Append-only storage keeping each entity class as typed columns.
+
+    str and Literal fields are codes into a shared string table, list[str]
+    fields are CSR code lists, int/float/bool fields are NumPy arrays and
+    anything else falls back to a Python object column. Pydantic entities
+    are only built when read (get_all, filter, ...); they are detached
+    copies, so changes to them are not stored. Like InMemoryStateStorage,
+    every applied diff adds a new entity.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.strings = _StringTable()
+        self.tables: dict[type[BaseStateEntity], _ClassTable] = {}
+        self._table_list: list[_ClassTable] = []
+        # Insertion order across classes: table index and row of every entity
+        self._order_table = np.zeros(_INITIAL_CAPACITY, dtype=np.int32)
+        self._order_row = np.zeros(_INITIAL_CAPACITY, dtype=np.int64)
+        # Non-decreasing, so the entities of any version range are a contiguous slice
+        self._order_version = np.zeros(_INITIAL_CAPACITY, dtype=np.int64)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _table(self, entity_class: type[BaseStateEntity]) -> _ClassTable:
+        table = self.tables.get(entity_class)
+        if table is None:
+            table = self.tables[entity_class] = _ClassTable(entity_class, len(self._table_list), self.strings)
+            self._table_list.append(table)
+        return table
+
+    def _add_single(self, entity: BaseStateEntity, version: int) -> None:
+        table = self._table(type(entity))
+        row = table.append(entity, self._size, version)
+
+        self._order_table = _grow(self._order_table, self._size + 1)
+        self._order_row = _grow(self._order_row, self._size + 1)
+        self._order_version = _grow(self._order_version, self._size + 1)
+        self._order_table[self._size] = table.index
+        self._order_row[self._size] = row
+        self._order_version[self._size] = version
+        self._size += 1
+
+    def apply_state_diffs(self, state_diffs: list[StateDiff]) -> list[StateDiff]:
+        """
+        Store every diff as a new entity.
+
+        Args:
+            state_diffs: List of state diffs to apply
+
+        Returns:
+            List of applied StateDiff objects
+
+        Raises:
+            EntityMergeValidationError: A diff does not describe a valid entity
+        """
+        version = self.increment_version()
+        applied_diffs: list[StateDiff] = []
+
+        for state_diff in state_diffs:
+            entity, applied_diff = state_diff.entity_class.merge(
+                None, state_diff, on_validation_error=ValidationErrorHandlingMode.raise_exception
+            )
+            self._add_single(entity, version)
+            applied_diffs.append(applied_diff)
+
+        return applied_diffs
+
+    def add_entities(self, entities: list[BaseStateEntity]) -> list[StateDiff]:
+        """
+        Add multiple entities in a single state update.
+
+        Args:
+            entities: List of state entities to add
+
+        Returns:
+            List of StateDiff objects representing changes made
+        """
+        version = self.increment_version()
+        state_diffs: list[StateDiff] = []
+
+        for entity in entities:
+            content_dict = entity.domain_dump(exclude_unset=True, exclude_defaults=True)
+            state_diffs.append(StateDiff(
+                entity_class=type(entity),
+                diffs=[FieldDiff(field_name=k, new_value=v) for k, v in content_dict.items()],
+            ))
+            self._add_single(entity, version)
+
+        return state_diffs
+
+    def get_all(self, chronological: bool = True, as_of_version: int | None = None) -> list[BaseStateEntity]:
+        if as_of_version is not None:
+            return self._materialize_range(0, self._position_after(as_of_version))
+        if not chronological:
+            return [table.materialize(row) for table in self._table_list for row in range(table.count)]
+        return self._materialize_range(0, self._size)
+
+    def _position_after(self, version: int) -> int:
+        return int(np.searchsorted(self._order_version[:self._size], version, side="right"))
+
+    def _materialize_range(self, start: int, end: int) -> list[BaseStateEntity]:
+        return [
+            self._table_list[t].materialize(row)
+            for t, row in zip(self._order_table[start:end].tolist(), self._order_row[start:end].tolist())
+        ]
+
+    def diff_versions(self, from_version: int, to_version: int) -> list[StateDiff]:
+        """Entities added after from_version up to to_version, one StateDiff each."""
+        if to_version < from_version:
+            raise ValueError("to_version must not be older than from_version")
+
+        start, end = self._position_after(from_version), self._position_after(to_version)
+        return [
+            StateDiff(
+                entity_class=type(entity),
+                entity_ref=str(position),
+                diffs=[
+                    FieldDiff(field_name=k, new_value=v)
+                    for k, v in entity.domain_dump(mode='json', exclude_unset=True).items()
+                ],
+            )
+            for position, entity in enumerate(self._materialize_range(start, end), start)
+        ]
+
+    def count(self, entity_class: type[BaseStateEntity], **conditions: Any) -> int:
+        """Number of entity_class entities matching all field == value conditions."""
+        return int(np.count_nonzero(self._match(entity_class, conditions)))
+
+    def filter(self, entity_class: type[BaseStateEntity], **conditions: Any) -> list[BaseStateEntity]:
+        """
+        Entities of entity_class whose fields equal the given values, in insertion order.
+
+        Conditions are evaluated on the columns; only matching rows are
+        materialized. For list[str] fields, a str value matches lists
+        containing it.
+
+        Args:
+            entity_class: Class to search
+            **conditions: field name -> value
+
+        Returns:
+            Matching entities
+
+        Raises:
+            ValueError: A condition names a field entity_class does not have
+        """
+        table = self.tables.get(entity_class)
+        if table is None:
+            return []
+        return [table.materialize(row) for row in np.flatnonzero(self._match(entity_class, conditions)).tolist()]
+
+    def _match(self, entity_class: type[BaseStateEntity], conditions: dict[str, Any]) -> np.ndarray:
+        table = self.tables.get(entity_class)
+        if table is None:
+            return np.zeros(0, dtype=bool)
+
+        mask = np.ones(table.count, dtype=bool)
+        for field_name, value in conditions.items():
+            column = table.columns.get(field_name)
+            if column is None:
+                raise ValueError(f"{entity_class.__name__} has no field {field_name!r}")
+            mask &= column.matches(value, table.count)
+        return mask
+
+    def get_incomplete_entities(self) -> list[BaseStateEntity]:
+        incomplete: list[tuple[int, _ClassTable, int]] = []
+        for table in self._table_list:
+            rows = np.flatnonzero(~table.completed[:table.count])
+            incomplete.extend(zip(table.ordinals[rows].tolist(), [table] * len(rows), rows.tolist()))
+        incomplete.sort(key=lambda item: item[0])
+        return [table.materialize(row) for _, table, row in incomplete]
+
+    def is_state_completed(self) -> bool:
+        return self._size > 0 and all(table.completed[:table.count].all() for table in self._table_list)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of the column data, string table included."""
+        return (
+            sum(table.nbytes for table in self._table_list)
+            + self.strings.nbytes + self._order_table.nbytes + self._order_row.nbytes
+        )
+
+    def to_json(self) -> str:
+        entities = []
+        for t, row in zip(self._order_table[:self._size].tolist(), self._order_row[:self._size].tolist()):
+            table = self._table_list[t]
+            entity = table.materialize(row)
+            entities.append({
+                "entity_class": qualified_name(table.entity_class),
+                "entity": {
+                    **entity.domain_dump(mode='json', exclude_unset=True),
+                    "date_created_utc": entity.date_created_utc.isoformat(),
+                    "actors": [actor.model_dump(mode='json') for actor in entity.actors],
+                    "embedding": entity.embedding,
+                },
+                "entity_version": int(table.versions[row]),
+            })
+        return json.dumps({"version": self.version, "entities": entities})
+
+    @classmethod
+    def from_json(cls, data: str) -> 'ColumnarStateStorage':
+        parsed = json.loads(data)
+        storage = cls()
+        storage.version = parsed.get("version", 0)
+
+        entity_classes: dict[str, type[BaseStateEntity]] = {}
+        for item in parsed.get("entities", []):
+            name = item["entity_class"]
+            if name not in entity_classes:
+                entity_classes[name] = resolve_class(name)
+            entity = entity_classes[name].model_validate(item["entity"])
+            storage._add_single(entity, item.get("entity_version", 0))
+
+        return storage
@@ -1,15 +1,19 @@
 """In-memory state storage implementation for semantic search and chronological tracking."""
 
+import os
 import uuid
+from bisect import bisect_right
 from collections.abc import Callable
 from datetime import datetime, timezone
 
 import numpy as np
 
 from agent.state.storage.base_state_storage import BaseStateStorage
+from agent.state.storage.snapshot import SnapshotReader, SnapshotWriter, qualified_name, resolve_class
 from agent.misc.embedding_service import EmbeddingService
 from agent.misc.similarity_metrics import cosine_similarity
-from agent.state.entity.state_entity import BaseStateEntity
+from agent.misc.vector_index import BaseVectorIndex, ExactVectorIndex
+from agent.state.entity.state_entity import BaseStateEntity, ValidationErrorHandlingMode
 from agent.parser.state_diff import StateDiff
 from agent.state.entity.types import FieldDiff
 
@@ -24,7 +28,8 @@ class InMemoryStateStorage(BaseStateStorage):
     def __init__(
         self,
         embedding_service: EmbeddingService,
-        similarity_metric: Callable[[np.ndarray, np.ndarray], float] | None = None
+        similarity_metric: Callable[[np.ndarray, np.ndarray], float] | None = None,
+        vector_index: BaseVectorIndex | None = None
     ):
         """
         Initialize the in-memory storage.
@@ -33,9 +38,27 @@ class InMemoryStateStorage(BaseStateStorage):
             embedding_service: Service for generating embeddings
             similarity_metric: Function to calculate similarity between vectors
                               (defaults to cosine_similarity)
+            vector_index: Empty index answering get_similar (defaults to an
+                          exact index over similarity_metric); an IvfVectorIndex
+                          trades recall for latency on large stores, and a
+                          MmapEmbeddingStore keeps the vectors on disk
+
+        Raises:
+            ValueError: vector_index is not empty; its rows must line up with
+                        the entities stored from here on (use from_vector_index
+                        or load_snapshot to attach an index that already has rows)
         """
+        if vector_index is not None and len(vector_index):
+            raise ValueError("vector_index must be empty")
+
         self.entities: dict[str, BaseStateEntity] = {}
-        self.embedding_index: dict[str, np.ndarray] = {}
+
+        # Index rows are added in insertion order, so chronological_ids doubles
+        # as the row -> ID array and a row number is a chronological index
+        self.embedding_rows: dict[str, int] = {}
+        # Stored entities drop their embedding list once it is indexed; their
+        # rows are found by object identity (stored entities are never released)
+        self._object_rows: dict[int, int] = {}
 
         # Chronological ordering: list of entity IDs in insertion order
         self.chronological_ids: list[str] = []
@@ -45,8 +68,68 @@ class InMemoryStateStorage(BaseStateStorage):
         self.version_timestamps: dict[int, datetime] = {}
         self.entity_versions: dict[str, int] = {}  # Maps entity_id -> version
 
+        # Incomplete entity IDs in insertion order (dict used as an ordered set)
+        self.incomplete_ids: dict[str, None] = {}
+
         self.embedding_service = embedding_service
         self.similarity_metric = similarity_metric or cosine_similarity
+        self.vector_index = vector_index if vector_index is not None else ExactVectorIndex(self.similarity_metric)
+
+    @classmethod
+    def from_vector_index(
+        cls,
+        vector_index: BaseVectorIndex,
+        entities: dict[str, BaseStateEntity],
+        embedding_service: EmbeddingService,
+        similarity_metric: Callable[[np.ndarray, np.ndarray], float] | None = None,
+        entity_ids: list[str] | None = None,
+        entity_versions: dict[str, int] | None = None,
+    ) -> 'InMemoryStateStorage':
+        """
+        Build a storage over an index that already holds the entities' embeddings.
+
+        A worker can open the writer's MmapEmbeddingStore read_only and search
+        it in place: the store's id table gives the chronological order, and
+        nothing is re-embedded or copied.
+
+        Args:
+            vector_index: Populated index; row n holds the embedding of entity_ids[n]
+            entities: Stored entities by ID
+            embedding_service: Embedding service for queries and later adds
+            similarity_metric: Function to calculate similarity between vectors
+            entity_ids: ID of every index row in row order (defaults to the
+                        index's own id table, e.g. MmapEmbeddingStore.keys)
+            entity_versions: Version each entity was stored at (defaults to 0)
+
+        Returns:
+            Storage whose entities are looked up in vector_index
+
+        Raises:
+            ValueError: The rows and the entities do not match one to one
+        """
+        storage = cls(embedding_service, similarity_metric)
+        storage._attach_index(vector_index, list(entity_ids if entity_ids is not None else vector_index.keys))
+        if set(entities) != set(storage.chronological_ids):
+            raise ValueError("vector_index rows must match the given entities one to one")
+
+        entity_versions = entity_versions or {}
+        for entity_id in storage.chronological_ids:
+            entity = entities[entity_id]
+            entity.embedding = None
+            storage.entities[entity_id] = entity
+            storage.entity_versions[entity_id] = entity_versions.get(entity_id, 0)
+            storage._object_rows[id(entity)] = storage.embedding_rows[entity_id]
+            storage._track_completion(entity_id)
+        storage.current_version = max(storage.entity_versions.values(), default=0)
+        return storage
+
+    def _attach_index(self, vector_index: BaseVectorIndex, entity_ids: list[str]) -> None:
+        """Adopt a populated index whose row n belongs to entity_ids[n]."""
+        if len(entity_ids) != len(vector_index) or len(set(entity_ids)) != len(entity_ids):
+            raise ValueError("entity_ids must name each vector_index row exactly once")
+        self.vector_index = vector_index
+        self.chronological_ids = entity_ids
+        self.embedding_rows = {entity_id: row for row, entity_id in enumerate(entity_ids)}
 
     def get_current_version(self) -> int:
         """
@@ -95,22 +178,52 @@ class InMemoryStateStorage(BaseStateStorage):
     def apply_state_diffs(self, state_diffs: list[StateDiff]) -> list[StateDiff]:
         """
         Apply state diffs to storage.
-        For InMemoryStateStorage, stores diffs as dict-based entities.
+        For InMemoryStateStorage, every diff becomes a new entity.
 
         Args:
             state_diffs: List of state diffs to apply
 
+        Returns:
+            List of applied StateDiff objects, with entity_ref set to the new entity's ID
+
+        Raises:
+            EntityMergeValidationError: A diff does not describe a valid entity
+        """
+        return self._add_state_diffs(state_diffs)
+
+    def replay_state_diffs(
+        self, state_diffs: list[StateDiff], embeddings: dict[str, list[float]] | None = None
+    ) -> list[StateDiff]:
+        """
+        Apply logged diffs, keeping the logged entity IDs and embeddings.
+
+        Args:
+            state_diffs: Diffs as apply_state_diffs returned them, entity_ref included
+            embeddings: Logged embedding per entity ID; entities without one are embedded again
+
         Returns:
             List of applied StateDiff objects
+
+        Raises:
+            ValueError: A logged entity ID is already stored
         """
+        return self._add_state_diffs(state_diffs, embeddings or {}, keep_ids=True)
+
+    def _add_state_diffs(
+        self, state_diffs: list[StateDiff], embeddings: dict[str, list[float]] | None = None, keep_ids: bool = False
+    ) -> list[StateDiff]:
         version = self.increment_version()
         applied_diffs: list[StateDiff] = []
 
         for state_diff in state_diffs:
-            update_dict = {diff.field_name: diff.new_value for diff in state_diff.diffs}
-            entity = state_diff.entity_class(**update_dict)
-            self._add_single(entity, version)
-            applied_diffs.append(state_diff)
+            entity, applied_diff = state_diff.entity_class.merge(
+                None, state_diff, on_validation_error=ValidationErrorHandlingMode.raise_exception
+            )
+            entity_id = state_diff.entity_ref if keep_ids else None
+            if embeddings and entity_id in embeddings:
+                entity.embedding = list(embeddings[entity_id])
+            entity_id = self._add_single(entity, version, entity_id)
+            applied_diffs.append(applied_diff.model_copy(update={"entity_ref": entity_id}))
 
         return applied_diffs
 
@@ -142,36 +255,85 @@ class InMemoryStateStorage(BaseStateStorage):
 
         return state_diffs
 
-    def _add_single(self, entity: BaseStateEntity, version: int) -> str:
+    def _add_single(self, entity: BaseStateEntity, version: int, entity_id: str | None = None) -> str:
         """
         Internal method to add a single entity with a specific version.
 
         Args:
             entity: The state entity to add
             version: The state version this entity belongs to
+            entity_id: ID to store the entity under (defaults to a new UUID)
 
         Returns:
             Unique identifier for the stored entity
+
+        Raises:
+            ValueError: entity_id is already stored
         """
-        # Generate ID
-        entity_id = str(uuid.uuid4())
+        if entity_id is None:
+            entity_id = str(uuid.uuid4())
+        elif entity_id in self.entities:
+            raise ValueError(f"Entity {entity_id!r} is already stored")
 
         # Generate embedding if not present
         if entity.embedding is None:
             entity.embedding = self.embedding_service.embed(entity)
 
-        # Store entity and its embedding
+        # Store embedding first: it is the step that can reject the entity
+        self._append_embedding(entity_id, entity)
         self.entities[entity_id] = entity
-        self.embedding_index[entity_id] = np.array(entity.embedding)
 
         # Track version for this entity
         self.entity_versions[entity_id] = version
 
         # Track chronological order
         self.chronological_ids.append(entity_id)
+        self._track_completion(entity_id)
 
         return entity_id
 
+    def _append_embedding(
+        self, entity_id: str, entity: BaseStateEntity, embedding: list[float] | None = None
+    ) -> None:
+        row = self.vector_index.add(embedding if embedding is not None else entity.embedding, key=entity_id)
+        self.embedding_rows[entity_id] = row
+        self._object_rows[id(entity)] = row
+        # The index holds the only copy of the vector from here on
+        entity.embedding = None
+
+    def get_embedding(self, entity_id: str) -> np.ndarray | None:
+        """
+        Get the stored embedding of an entity.
+
+        Args:
+            entity_id: The unique identifier of the entity
+
+        Returns:
+            Read-only view of its row in the embedding matrix, or None if entity doesn't exist
+        """
+        row = self.embedding_rows.get(entity_id)
+        if row is None:
+            return None
+        return self.vector_index.vector(row)
+
+    def _track_completion(self, entity_id: str) -> None:
+        if self.entities[entity_id].is_completed():
+            self.incomplete_ids.pop(entity_id, None)
+        else:
+            self.incomplete_ids[entity_id] = None
+
+    def get_incomplete_entities(self) -> list[BaseStateEntity]:
+        """
+        Get entities that are not completed yet, without scanning the rest.
+
+        Returns:
+            Incomplete entities in chronological order
+        """
+        return [self.entities[entity_id] for entity_id in self.incomplete_ids]
+
+    def is_state_completed(self) -> bool:
+        return bool(self.entities) and not self.incomplete_ids
+
     def get_similar(
         self,
         entity: BaseStateEntity,
@@ -192,37 +354,30 @@ class InMemoryStateStorage(BaseStateStorage):
         Returns:
             List of (entity, similarity_score) tuples
         """
-        # Generate embedding for query entity
-        if entity.embedding is None:
-            entity.embedding = self.embedding_service.embed(entity)
-
-        query_embedding = np.array(entity.embedding)
-
-        # Calculate similarities and track insertion order
-        similarities: list[tuple[str, float, int]] = []
-        for entity_id, stored_embedding in self.embedding_index.items():
-            similarity = self.similarity_metric(query_embedding, stored_embedding)
-            if similarity >= threshold:
-                # Get chronological index for this entity
-                chrono_index = self.chronological_ids.index(entity_id)
-                similarities.append((entity_id, similarity, chrono_index))
+        if limit <= 0:
+            return []
 
-        # Sort based on requested order
+        row = self._object_rows.get(id(entity))
+        if row is not None and self.entities.get(self.chronological_ids[row]) is entity:
+            query_embedding = np.array(self.vector_index.vector(row))
+        else:
+            # Generate embedding for query entity
+            if entity.embedding is None:
+                entity.embedding = self.embedding_service.embed(entity)
+            query_embedding = np.asarray(entity.embedding, dtype=np.float32)
         if order_by == "chronological":
-            # Sort by chronological index (oldest first)
-            similarities.sort(key=lambda x: x[2])
+            rows, scores = self.vector_index.search(query_embedding, threshold=threshold)
+            # Rows are in insertion order, so the oldest hits have the lowest rows
+            oldest = np.argsort(rows, kind="stable")[:limit]
+            rows, scores = rows[oldest], scores[oldest]
         else:  # "similarity" or default
-            # Sort by similarity (highest first)
-            similarities.sort(key=lambda x: x[1], reverse=True)
+            rows, scores = self.vector_index.search(query_embedding, k=limit, threshold=threshold)
 
-        # Return top results with entities
-        results = [
-            (self.entities[entity_id], score)
-            for entity_id, score, _ in similarities[:limit]
+        return [
+            (self.entities[self.chronological_ids[row]], score)
+            for row, score in zip(rows.tolist(), scores.tolist())
         ]
 
-        return results
-
     def get_by_id(self, entity_id: str) -> BaseStateEntity | None:
         """
         Get entity by ID.
@@ -235,21 +390,60 @@ class InMemoryStateStorage(BaseStateStorage):
         """
         return self.entities.get(entity_id)
 
-    def get_all(self, chronological: bool = True) -> list[BaseStateEntity]:
+    def get_all(self, chronological: bool = True, as_of_version: int | None = None) -> list[BaseStateEntity]:
         """
         Get all entities, optionally in chronological order.
 
+        Stored entities are never modified by the storage, so the state as
+        of a version is the prefix of entities inserted up to it.
+
         Args:
             chronological: If True, return in insertion order
+            as_of_version: Only entities that existed right after this version
 
         Returns:
             List of all entities
         """
+        if as_of_version is not None:
+            return [self.entities[entity_id] for entity_id in self._ids_up_to(as_of_version)]
         if chronological:
             return [self.entities[entity_id] for entity_id in self.chronological_ids]
         else:
             return list(self.entities.values())
 
+    def _ids_up_to(self, version: int, start_version: int | None = None) -> list[str]:
+        # Insertion order is version order, so both ends are found by bisection
+        start = 0 if start_version is None else bisect_right(
+            self.chronological_ids, start_version, key=self.entity_versions.__getitem__
+        )
+        end = bisect_right(self.chronological_ids, version, key=self.entity_versions.__getitem__)
+        return self.chronological_ids[start:end]
+
+    def diff_versions(self, from_version: int, to_version: int) -> list[StateDiff]:
+        """
+        Entities added after from_version up to to_version, as diffs.
+
+        Args:
+            from_version: Older version
+            to_version: Newer version
+
+        Returns:
+            One StateDiff per added entity, with entity_ref set to its ID
+        """
+        if to_version < from_version:
+            raise ValueError("to_version must not be older than from_version")
+
+        state_diffs: list[StateDiff] = []
+        for entity_id in self._ids_up_to(to_version, start_version=from_version):
+            entity = self.entities[entity_id]
+            content_dict = entity.domain_dump(mode='json', exclude_unset=True, exclude_defaults=True)
+            state_diffs.append(StateDiff(
+                entity_class=type(entity),
+                entity_ref=entity_id,
+                diffs=[FieldDiff(field_name=k, new_value=v) for k, v in content_dict.items()],
+            ))
+        return state_diffs
+
     def get_chronological_range(
         self,
         start_index: int = 0,
@@ -291,11 +485,12 @@ class InMemoryStateStorage(BaseStateStorage):
             "entities": [
                 {
                     "id": entity_id,
+                    "entity_class": qualified_name(type(self.entities[entity_id])),
                     "entity": self.entities[entity_id].model_dump(mode='json'),
-                    "embedding": self.embedding_index[entity_id].tolist(),
+                    "embedding": self.vector_index.vector(row).tolist(),
                     "version": self.entity_versions[entity_id]
                 }
-                for entity_id in self.chronological_ids  # Iterate in insertion order
+                for row, entity_id in enumerate(self.chronological_ids)  # Iterate in insertion order
             ]
         }
 
@@ -330,21 +525,94 @@ class InMemoryStateStorage(BaseStateStorage):
             # Reconstruct entity from its data
             entity_data = item["entity"]
 
-            # Dynamically reconstruct the entity
-            # Since we don't know the exact type, we'll use BaseStateEntity
-            # In practice, you might want to store type information
-            entity = BaseStateEntity.model_validate(entity_data)
-
-            # Restore embedding
-            embedding = np.array(item["embedding"])
+            # Older dumps carry no class name; those entities come back as BaseStateEntity
+            entity_class = resolve_class(item["entity_class"]) if "entity_class" in item else BaseStateEntity
+            entity = entity_class.model_validate(entity_data)
 
             # Restore version
             entity_version = item.get("version", 0)
 
             # Manually restore to preserve original IDs and avoid incrementing version
+            storage._append_embedding(entity_id, entity, item["embedding"])
             storage.entities[entity_id] = entity
-            storage.embedding_index[entity_id] = embedding
             storage.entity_versions[entity_id] = entity_version
             storage.chronological_ids.append(entity_id)
+            storage._track_completion(entity_id)
+
+        return storage
 
+    def save_snapshot(self, path: str | os.PathLike, row_format: str | None = None) -> None:
+        """
+        Write the storage as a binary snapshot (see SnapshotWriter), streaming entity by entity.
+
+        Args:
+            path: Snapshot directory
+            row_format: "msgpack" or "jsonl"; defaults to msgpack when it is installed
+        """
+        metadata = {
+            "current_version": self.current_version,
+            "version_timestamps": {str(ver): ts.isoformat() for ver, ts in self.version_timestamps.items()},
+        }
+        with SnapshotWriter(path, row_format, metadata) as writer:
+            for row, entity_id in enumerate(self.chronological_ids):
+                writer.write(
+                    self.entities[entity_id], entity_id, self.entity_versions[entity_id], self.vector_index.vector(row)
+                )
+
+    @classmethod
+    def load_snapshot(
+        cls,
+        path: str | os.PathLike,
+        embedding_service: EmbeddingService,
+        similarity_metric: Callable[[np.ndarray, np.ndarray], float] | None = None,
+        vector_index: BaseVectorIndex | None = None,
+    ) -> 'InMemoryStateStorage':
+        """
+        Rebuild a storage from save_snapshot output, with entities of their original classes.
+
+        The embedding block is handed to the vector index as a memory-mapped
+        matrix; the default exact index searches it in place until the next add.
+        A vector_index that already holds the snapshot's rows (such as the
+        writer's MmapEmbeddingStore opened read_only) is reused as is.
+
+        Args:
+            path: Snapshot directory
+            embedding_service: Embedding service to use for the storage
+            similarity_metric: Function to calculate similarity between vectors
+            vector_index: Empty index to load the embeddings into, or an index
+                          whose id table lists the snapshot's entities in order
+
+        Returns:
+            Reconstructed InMemoryStateStorage instance
+
+        Raises:
+            ValueError: vector_index has rows that do not match the snapshot
+        """
+        reader = SnapshotReader(path)
+        storage = cls(embedding_service, similarity_metric)
+        storage.current_version = reader.metadata.get("current_version", 0)
+        storage.version_timestamps = {
+            int(ver): datetime.fromisoformat(ts)
+            for ver, ts in reader.metadata.get("version_timestamps", {}).items()
+        }
+
+        for row in reader:
+            storage.entities[row.entity_id] = row.entity
+            storage.entity_versions[row.entity_id] = row.version
+            storage.chronological_ids.append(row.entity_id)
+            storage._track_completion(row.entity_id)
+
+        if vector_index is not None and len(vector_index):
+            if list(getattr(vector_index, "keys", [])) != storage.chronological_ids:
+                raise ValueError("vector_index rows do not match the snapshot's entities")
+            storage._attach_index(vector_index, storage.chronological_ids)
+        else:
+            if vector_index is not None:
+                storage.vector_index = vector_index
+            if reader.embeddings is not None:
+                # Every stored entity has an embedding, so embedding rows follow chronological order
+                rows = storage.vector_index.add_batch(reader.embeddings, keys=storage.chronological_ids)
+                storage.embedding_rows = dict(zip(storage.chronological_ids, rows.tolist()))
+        for entity_id, row in storage.embedding_rows.items():
+            storage._object_rows[id(storage.entities[entity_id])] = row
         return storage
@@ -0,0 +1,219 @@
+"""Append-only on-disk embedding store searched through a memory map."""
+
+import json
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+
+from agent.misc.similarity_metrics import batch_metric_for, cosine_similarity
+from agent.misc.vector_index import BaseVectorIndex, ExactVectorIndex, _grow_rows, _row_norms
+
+_FORMAT_VERSION = 1
+# Rows scored per block, bounding the float32 temporaries of one search
+_SEARCH_BLOCK_ROWS = 65536
+
+
+class MmapEmbeddingStore(BaseVectorIndex):
+    """
+    Exact vector index whose vectors live in a float32 file instead of RAM.
+
+    Three files share the given path:
+        <path>       raw float32 rows; row n starts at byte n * dimension * 4
+        <path>.ids   sidecar table, one JSON-encoded key per row
+        <path>.json  header with the format version and dimension
+
+    Vectors are only ever appended. Searches score the memory-mapped file
+    in blocks, so the index can outgrow RAM and the OS page cache is shared
+    by every process mapping the same file. Only the per-row norms are held
+    in memory. Open the file read_only in worker processes and call refresh
+    to pick up rows appended by the writer since.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        metric: Callable[[np.ndarray, np.ndarray], float] = cosine_similarity,
+        read_only: bool = False,
+    ):
+        """
+        Args:
+            path: Data file; created with its sidecars if missing
+            metric: Pairwise similarity; the built-in metrics run vectorized
+            read_only: Map an existing store without appending to it
+
+        Raises:
+            FileNotFoundError: read_only is set and the store does not exist
+        """
+        self.path = Path(path)
+        self.ids_path = self.path.with_name(self.path.name + ".ids")
+        self.header_path = self.path.with_name(self.path.name + ".json")
+        self.metric = metric
+        self.read_only = read_only
+        self._batch_metric = batch_metric_for(metric)
+
+        self.dimension: int | None = None
+        self.keys: list[str | None] = []
+        self.rows: dict[str, int] = {}
+        self.norms = np.zeros(0, dtype=np.float32)
+        self._size = 0
+        self._map: np.memmap | None = None
+        self._data_file = None
+        self._ids_file = None
+
+        if read_only and not self.header_path.exists():
+            raise FileNotFoundError(self.header_path)
+        if self.header_path.exists():
+            self._load()
+        if not read_only:
+            self._data_file = open(self.path, "ab")
+            self._ids_file = open(self.ids_path, "a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _load(self) -> None:
+        header = json.loads(self.header_path.read_text())
+        if header.get("format_version") != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding store format: {header.get('format_version')}")
+        self.dimension = header["dimension"]
+        self._sync_rows()
+        if not self.read_only:
+            # Drop a half-written trailing row so that new appends stay aligned
+            row_bytes = self.dimension * 4
+            if self.path.stat().st_size != self._size * row_bytes:
+                os.truncate(self.path, self._size * row_bytes)
+            with open(self.ids_path, "w", encoding="utf-8") as ids_file:
+                ids_file.writelines(json.dumps(key) + "\n" for key in self.keys)
+
+    def _sync_rows(self) -> None:
+        with open(self.ids_path, encoding="utf-8") as ids_file:
+            keys = [json.loads(line) for line in ids_file if line.endswith("\n")]
+        data_rows = self.path.stat().st_size // (self.dimension * 4)
+        # A crash between the two appends leaves one file a row ahead; trust the shorter
+        size = min(len(keys), data_rows)
+        if size == self._size:
+            return
+
+        start = self._size
+        for row in range(start, size):
+            self.keys.append(keys[row])
+            if keys[row] is not None:
+                self.rows[keys[row]] = row
+        self._size = size
+        self._map = None
+        matrix = self._matrix()
+        self.norms = np.concatenate([self.norms[:start], _row_norms(matrix[start:size])])
+
+    def refresh(self) -> int:
+        """
+        Pick up rows another process appended since this store was opened.
+
+        Returns:
+            Number of rows now visible
+        """
+        if self.header_path.exists():
+            if self.dimension is None:
+                self._load()
+            else:
+                self._sync_rows()
+        return self._size
+
+    def add(self, vector: np.ndarray | list[float], key: str | None = None) -> int:
+        if self.read_only:
+            raise ValueError(f"Embedding store {self.path} is read-only")
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = len(vector)
+            self.header_path.write_text(json.dumps({"format_version": _FORMAT_VERSION, "dimension": self.dimension}))
+        elif len(vector) != self.dimension:
+            raise ValueError(f"Vector has {len(vector)} dimensions, store holds {self.dimension}")
+
+        row = self._size
+        self._data_file.write(vector.tobytes())
+        self._ids_file.write(json.dumps(key) + "\n")
+        self.keys.append(key)
+        if key is not None:
+            self.rows[key] = row
+        self.norms = _grow_rows(self.norms, row + 1)
+        self.norms[row] = np.linalg.norm(vector)
+        self._size = row + 1
+        return row
+
+    def add_batch(self, vectors: np.ndarray, keys: list[str] | None = None) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) == 0:
+            return np.zeros(0, dtype=np.int64)
+        # The first row goes through add, which validates the dimension and writes the header
+        first = self.add(vectors[0], keys[0] if keys is not None else None)
+        rest = vectors[1:]
+
+        start, count = first + 1, len(rest)
+        rest_keys = keys[1:] if keys is not None else [None] * count
+        for block in range(0, count, _SEARCH_BLOCK_ROWS):
+            self._data_file.write(rest[block:block + _SEARCH_BLOCK_ROWS].tobytes())
+        self._ids_file.writelines(json.dumps(key) + "\n" for key in rest_keys)
+        self.keys.extend(rest_keys)
+        self.rows.update((key, start + i) for i, key in enumerate(rest_keys) if key is not None)
+        self.norms = _grow_rows(self.norms, start + count)
+        self.norms[start:start + count] = _row_norms(rest)
+        self._size = start + count
+        return np.arange(first, start + count)
+
+    def flush(self, sync: bool = False) -> None:
+        """
+        Write buffered rows to the files.
+
+        Args:
+            sync: Also fsync them, making the rows durable
+        """
+        for file in (self._data_file, self._ids_file):
+            if file is not None:
+                file.flush()
+                if sync:
+                    os.fsync(file.fileno())
+
+    def _matrix(self) -> np.ndarray:
+        if self._size == 0:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        if self._map is None or len(self._map) < self._size:
+            # Appends go through the file, so the map is rebuilt lazily on the next read
+            self.flush()
+            self._map = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self._size, self.dimension))
+        return self._map[:self._size]
+
+    def vector(self, row: int) -> np.ndarray:
+        if not 0 <= row < self._size:
+            raise IndexError(row)
+        return self._matrix()[row]
+
+    def search(
+        self, query: np.ndarray, k: int | None = None, threshold: float = -np.inf
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if self._size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        matrix = self._matrix()
+
+        best_rows: list[np.ndarray] = []
+        best_scores: list[np.ndarray] = []
+        for start in range(0, self._size, _SEARCH_BLOCK_ROWS):
+            end = min(start + _SEARCH_BLOCK_ROWS, self._size)
+            scores = self._batch_metric(query, matrix[start:end], self.norms[start:end])
+            # Keep at most k hits per block so memory stays bounded by k * blocks
+            rows, scores = ExactVectorIndex._top(np.arange(start, end), scores, k, threshold)
+            best_rows.append(rows)
+            best_scores.append(scores)
+        return ExactVectorIndex._top(np.concatenate(best_rows), np.concatenate(best_scores), k, threshold)
+
+    def close(self) -> None:
+        """Flush and close the files; the store is read-only afterwards."""
+        self.flush()
+        for file in (self._data_file, self._ids_file):
+            if file is not None:
+                file.close()
+        self._data_file = self._ids_file = None
+        self._map = None
+        self.read_only = True
+
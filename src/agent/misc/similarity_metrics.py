@@ -1,5 +1,7 @@
 """Similarity metrics for comparing embedding vectors."""
 
+from collections.abc import Callable
+
 import numpy as np
 
 
@@ -48,3 +50,61 @@ def dot_product_similarity(v1: np.ndarray, v2: np.ndarray) -> float:
         Dot product similarity score
     """
     return float(np.dot(v1, v2))
+
+
+def cosine_similarities(query: np.ndarray, matrix: np.ndarray, norms: np.ndarray | None = None) -> np.ndarray:
+    """
+    Cosine similarity of a query against every row of a matrix, in one product.
+
+    Args:
+        query: Query vector
+        matrix: One vector per row
+        norms: Precomputed row norms of matrix, if available
+
+    Returns:
+        One score per row; rows or queries with zero norm score 0
+    """
+    if norms is None:
+        norms = np.linalg.norm(matrix, axis=1)
+    denominator = norms * np.linalg.norm(query)
+    scores = matrix @ query
+    return np.divide(scores, denominator, out=np.zeros_like(scores), where=denominator > 0)
+
+
+def euclidean_similarities(query: np.ndarray, matrix: np.ndarray, norms: np.ndarray | None = None) -> np.ndarray:
+    """Batch counterpart of euclidean_similarity, using |m - q|² = |m|² - 2m·q + |q|²."""
+    if norms is None:
+        norms = np.linalg.norm(matrix, axis=1)
+    squared = norms ** 2 - 2 * (matrix @ query) + np.dot(query, query)
+    return np.exp(-np.sqrt(np.maximum(squared, 0)))
+
+
+def dot_product_similarities(query: np.ndarray, matrix: np.ndarray, norms: np.ndarray | None = None) -> np.ndarray:
+    """Batch counterpart of dot_product_similarity."""
+    return matrix @ query
+
+
+_BATCH_METRICS = {
+    cosine_similarity: cosine_similarities,
+    euclidean_similarity: euclidean_similarities,
+    dot_product_similarity: dot_product_similarities,
+}
+
+
+def batch_metric_for(
+    metric: Callable[[np.ndarray, np.ndarray], float]
+) -> Callable[[np.ndarray, np.ndarray, np.ndarray | None], np.ndarray]:
+    """
+    Vectorized form of a pairwise metric.
+
+    The built-in metrics map to their matrix versions; any other metric is
+    applied row by row, which is correct but not fast.
+    """
+    batch_metric = _BATCH_METRICS.get(metric)
+    if batch_metric is not None:
+        return batch_metric
+
+    def row_by_row(query: np.ndarray, matrix: np.ndarray, norms: np.ndarray | None = None) -> np.ndarray:
+        return np.fromiter((metric(query, row) for row in matrix), dtype=np.float64, count=len(matrix))
+
+    return row_by_row
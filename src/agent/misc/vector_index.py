@@ -0,0 +1,308 @@
+"""Vector indexes behind InMemoryStateStorage.get_similar."""
+
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+
+import numpy as np
+
+from agent.misc.similarity_metrics import batch_metric_for, cosine_similarity
+
+_INITIAL_ROWS = 64
+# Rows per block when assigning vectors to centroids, bounding the rows x lists score matrix
+_ASSIGN_BLOCK_ROWS = 65536
+
+
+def _grow_rows(array: np.ndarray, size: int) -> np.ndarray:
+    if size <= len(array):
+        return array
+    grown = np.zeros((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _row_norms(vectors: np.ndarray) -> np.ndarray:
+    # einsum avoids materializing the squared matrix
+    return np.sqrt(np.einsum("ij,ij->i", vectors, vectors)).astype(np.float32)
+
+
+class BaseVectorIndex(ABC):
+    """
+    Stores vectors under consecutive row numbers and finds the best-scoring rows for a query.
+
+    Row numbers are assigned by add in insertion order, starting at 0.
+    """
+
+    @abstractmethod
+    def add(self, vector: np.ndarray | list[float], key: str | None = None) -> int:
+        """
+        Add a vector.
+
+        Args:
+            vector: Vector to index; all vectors must have the same dimension
+            key: Identifier of the vector's owner, kept by persistent indexes
+
+        Returns:
+            Row number of the vector
+
+        Raises:
+            ValueError: The dimension differs from the vectors already indexed
+        """
+        pass
+
+    def add_batch(self, vectors: np.ndarray, keys: list[str] | None = None) -> np.ndarray:
+        """
+        Add the rows of a matrix, as repeated add calls would.
+
+        Args:
+            vectors: (n, dimension) matrix; indexes may keep a reference to it
+                     instead of copying, so it must not be modified afterwards
+            keys: Identifier per row
+
+        Returns:
+            Row numbers of the vectors
+        """
+        return np.array(
+            [self.add(vector, keys[i] if keys is not None else None) for i, vector in enumerate(vectors)],
+            dtype=np.int64,
+        )
+
+    @abstractmethod
+    def search(
+        self, query: np.ndarray, k: int | None = None, threshold: float = -np.inf
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find rows scoring at least threshold against query.
+
+        Args:
+            query: Query vector
+            k: Return at most the k best rows; None returns every hit
+            threshold: Minimum score
+
+        Returns:
+            (rows, scores), best score first
+        """
+        pass
+
+    @abstractmethod
+    def vector(self, row: int) -> np.ndarray:
+        """Read-only view of an indexed vector."""
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+
+class ExactVectorIndex(BaseVectorIndex):
+    """Brute force over one preallocated float32 matrix; one matrix-vector product per search."""
+
+    def __init__(self, metric: Callable[[np.ndarray, np.ndarray], float] = cosine_similarity):
+        """
+        Args:
+            metric: Pairwise similarity; the built-in metrics run vectorized
+        """
+        self.metric = metric
+        self._batch_metric = batch_metric_for(metric)
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dimension(self) -> int | None:
+        return self.matrix.shape[1] if self._size else None
+
+    def add(self, vector: np.ndarray | list[float], key: str | None = None) -> int:
+        vector = np.asarray(vector, dtype=np.float32)
+        row = self._size
+        if row == 0:
+            self.matrix = np.zeros((_INITIAL_ROWS, len(vector)), dtype=np.float32)
+            self.norms = np.zeros(_INITIAL_ROWS, dtype=np.float32)
+        elif len(vector) != self.matrix.shape[1]:
+            raise ValueError(f"Vector has {len(vector)} dimensions, index holds {self.matrix.shape[1]}")
+
+        # Amortized O(1) appends: capacity doubles when full
+        self.matrix = _grow_rows(self.matrix, row + 1)
+        self.norms = _grow_rows(self.norms, row + 1)
+        self.matrix[row] = vector
+        self.norms[row] = np.linalg.norm(vector)
+        self._size = row + 1
+        return row
+
+    def add_batch(self, vectors: np.ndarray, keys: list[str] | None = None) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        start, count = self._size, len(vectors)
+        if count == 0:
+            return np.zeros(0, dtype=np.int64)
+        if start and vectors.shape[1] != self.matrix.shape[1]:
+            raise ValueError(f"Vectors have {vectors.shape[1]} dimensions, index holds {self.matrix.shape[1]}")
+
+        if start == 0:
+            # Adopt the matrix as is (e.g. a memory-mapped snapshot); the
+            # next add copies it into a growable buffer
+            self.matrix = vectors
+            self.norms = _row_norms(vectors)
+        else:
+            self.matrix = _grow_rows(self.matrix, start + count)
+            self.norms = _grow_rows(self.norms, start + count)
+            self.matrix[start:start + count] = vectors
+            self.norms[start:start + count] = _row_norms(vectors)
+        self._size = start + count
+        return np.arange(start, start + count)
+
+    def vector(self, row: int) -> np.ndarray:
+        view = self.matrix[row]
+        view.flags.writeable = False
+        return view
+
+    def search(
+        self, query: np.ndarray, k: int | None = None, threshold: float = -np.inf
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if self._size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        scores = self._batch_metric(query, self.matrix[:self._size], self.norms[:self._size])
+        return self._top(np.arange(self._size), scores, k, threshold)
+
+    def _score_rows(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        return self._batch_metric(query, self.matrix[rows], self.norms[rows])
+
+    @staticmethod
+    def _top(
+        rows: np.ndarray, scores: np.ndarray, k: int | None, threshold: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        hits = np.flatnonzero(scores >= threshold)
+        if k is not None and len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]] if k > 0 else hits[:0]
+        # Best first; ties keep row (insertion) order
+        hits = hits[np.lexsort((rows[hits], -scores[hits]))]
+        return rows[hits], scores[hits]
+
+
+class IvfVectorIndex(ExactVectorIndex):
+    """
+    Inverted-file index: vectors are bucketed by their nearest of n_lists
+    k-means centroids, and a search only scores the buckets of the n_probe
+    centroids closest to the query.
+
+    Until train_size vectors have been added it searches exactly; the
+    centroids are then trained once on the vectors seen so far, and later
+    inserts go straight into their bucket. Raising n_probe trades latency
+    for recall (n_probe == n_lists is exact). For cosine similarity the
+    clustering runs on normalized vectors.
+    """
+
+    def __init__(
+        self,
+        metric: Callable[[np.ndarray, np.ndarray], float] = cosine_similarity,
+        n_lists: int = 256,
+        n_probe: int = 8,
+        train_size: int | None = None,
+        kmeans_iterations: int = 10,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            metric: Pairwise similarity used to score candidates
+            n_lists: Number of centroids (buckets)
+            n_probe: Buckets scanned per search
+            train_size: Vectors to collect before training; defaults to 32 per list
+            kmeans_iterations: Lloyd iterations when training
+            seed: Seed for centroid initialization
+        """
+        if not 1 <= n_probe <= n_lists:
+            raise ValueError("n_probe must be between 1 and n_lists")
+        super().__init__(metric)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_size = train_size if train_size is not None else 32 * n_lists
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.centroids: np.ndarray | None = None
+        self._lists: list[np.ndarray] = []
+        self._list_sizes = np.zeros(n_lists, dtype=np.int64)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def add(self, vector: np.ndarray | list[float], key: str | None = None) -> int:
+        row = super().add(vector, key)
+        if self.is_trained:
+            self._append_to_lists(np.array([row]))
+        elif self._size >= self.train_size:
+            self.train()
+        return row
+
+    def add_batch(self, vectors: np.ndarray, keys: list[str] | None = None) -> np.ndarray:
+        rows = super().add_batch(vectors, keys)
+        if self.is_trained:
+            self._append_to_lists(rows)
+        elif self._size >= self.train_size:
+            self.train()
+        return rows
+
+    def _coarse(self, vectors: np.ndarray, norms: np.ndarray) -> np.ndarray:
+        if self.metric is cosine_similarity:
+            safe_norms = np.where(norms > 0, norms, 1)
+            return vectors / safe_norms[:, None]
+        return vectors
+
+    def _nearest_centroids(self, points: np.ndarray, count: int = 1) -> np.ndarray:
+        # argmin |p - c|² == argmax (2 p·c - |c|²)
+        affinity = 2 * points @ self.centroids.T - np.einsum("ij,ij->i", self.centroids, self.centroids)
+        if count == 1:
+            return affinity.argmax(axis=1)[:, None]
+        return np.argpartition(-affinity, count - 1, axis=1)[:, :count]
+
+    def train(self) -> None:
+        """Fit the centroids on the vectors added so far and bucket all of them."""
+        points = self._coarse(self.matrix[:self._size], self.norms[:self._size])
+        n_lists = min(self.n_lists, len(points))
+        rng = np.random.default_rng(self.seed)
+        self.centroids = points[rng.choice(len(points), n_lists, replace=False)].copy()
+
+        for _ in range(self.kmeans_iterations):
+            assignment = self._assign(points)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignment, points)
+            counts = np.bincount(assignment, minlength=n_lists)
+            filled = counts > 0
+            self.centroids[filled] = sums[filled] / counts[filled, None]
+
+        self.n_lists = n_lists
+        self.n_probe = min(self.n_probe, n_lists)
+        self._lists = [np.zeros(_INITIAL_ROWS, dtype=np.int64) for _ in range(n_lists)]
+        self._list_sizes = np.zeros(n_lists, dtype=np.int64)
+        self._append_to_lists(np.arange(self._size))
+
+    def _assign(self, points: np.ndarray) -> np.ndarray:
+        return np.concatenate([
+            self._nearest_centroids(points[start:start + _ASSIGN_BLOCK_ROWS])[:, 0]
+            for start in range(0, len(points), _ASSIGN_BLOCK_ROWS)
+        ])
+
+    def _append_to_lists(self, rows: np.ndarray) -> None:
+        assignment = self._assign(self._coarse(self.matrix[rows], self.norms[rows]))
+        for list_id in np.unique(assignment):
+            members = rows[assignment == list_id]
+            size = self._list_sizes[list_id]
+            self._lists[list_id] = _grow_rows(self._lists[list_id], size + len(members))
+            self._lists[list_id][size:size + len(members)] = members
+            self._list_sizes[list_id] = size + len(members)
+
+    def search(
+        self, query: np.ndarray, k: int | None = None, threshold: float = -np.inf
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if not self.is_trained:
+            return super().search(query, k, threshold)
+
+        query = np.asarray(query, dtype=np.float32)
+        probe = self._nearest_centroids(
+            self._coarse(query[None, :], np.linalg.norm(query)[None]), self.n_probe
+        )[0]
+        rows = np.concatenate([self._lists[list_id][:self._list_sizes[list_id]] for list_id in probe])
+        rows.sort()
+        return self._top(rows, self._score_rows(query, rows), k, threshold)
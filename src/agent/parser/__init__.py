@@ -1,4 +1,4 @@
-from agent.parser.base_parser import BaseParser
+from agent.parser.base_parser import AsyncBaseParser, BaseParser
 from agent.parser.entity_context import EntityContext
 from agent.parser.state_diff import StateDiff, LlmStateDiff, LlmStateDiffs
 from agent.parser.parser_registry import (
@@ -7,16 +7,19 @@ from agent.parser.parser_registry import (
     register_parser,
     get_parser_for_entity,
 )
+from agent.parser.rule_based_parser import RuleBasedParser, RuleExtraction
+from agent.parser.composite_parser import CompositeParser
 from agent.parser.llm_parser import (
+    AsyncLlmParser,
     LlmParser,
+    LlmResponseError,
     parse_state_diff_with_llm,
     register_llm_parser,
 )
 
-register_llm_parser()
-
 __all__ = [
     "BaseParser",
+    "AsyncBaseParser",
     "EntityContext",
     "StateDiff",
     "LlmStateDiff",
@@ -26,6 +29,11 @@ __all__ = [
     "register_parser",
     "get_parser_for_entity",
     "LlmParser",
+    "AsyncLlmParser",
+    "LlmResponseError",
+    "RuleBasedParser",
+    "RuleExtraction",
+    "CompositeParser",
     "parse_state_diff_with_llm",
     "register_llm_parser",
 ]
@@ -1,5 +1,9 @@
+import asyncio
+import inspect
+import threading
 from abc import ABC, abstractmethod
-from typing import Any
+from collections.abc import Iterator
+from typing import Any, ClassVar
 
 from agent.interaction.interaction import Interaction
 
@@ -7,8 +11,41 @@ from agent.parser.entity_context import EntityContext
 from agent.parser.state_diff import StateDiff
 from agent.state.entity.state_entity import BaseStateEntity
 
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Event loop that blocking callers hand coroutines to.
+
+    It lives for the whole process, so async clients bound to it (and their
+    connection pools) are reused across calls instead of being rebuilt by a
+    fresh asyncio.run each time.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="parser-event-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
 
 class BaseParser(ABC):
+    # Whether parse_state_diff takes prior_messages; parsers written before it
+    # was added only take prior_interactions
+    accepts_prior_messages: ClassVar[bool] = True
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        parameters = inspect.signature(cls.parse_state_diff).parameters.values()
+        cls.accepts_prior_messages = any(
+            parameter.name == "prior_messages" or parameter.kind is inspect.Parameter.VAR_KEYWORD
+            for parameter in parameters
+        )
+
     def __init__(
         self,
         entity_classes: list[type[BaseStateEntity]],
@@ -25,6 +62,126 @@ class BaseParser(ABC):
         self,
         input_text: str,
         entity_contexts: list[EntityContext],
-        prior_interactions: list[Interaction] | None = None
+        prior_interactions: list[Interaction] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
     ) -> list[StateDiff]:
+        """
+        Extract state diffs from a single input.
+
+        Args:
+            input_text: Raw input value
+            entity_contexts: Entities the input may modify
+            prior_interactions: Conversation so far
+            prior_messages: prior_interactions already rendered as chat messages;
+                            parsers that build prompts should prefer it when given
+        """
         pass
+
+    def parse_with_history(
+        self,
+        input_text: str,
+        entity_contexts: list[EntityContext],
+        prior_interactions: list[Interaction] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
+    ) -> list[StateDiff]:
+        """Call parse_state_diff, leaving out prior_messages if the parser does not take it."""
+        if not self.accepts_prior_messages:
+            return self.parse_state_diff(input_text, entity_contexts, prior_interactions=prior_interactions)
+        return self.parse_state_diff(
+            input_text,
+            entity_contexts,
+            prior_interactions=prior_interactions,
+            prior_messages=prior_messages
+        )
+
+    def stream_state_diff(
+        self,
+        input_text: str,
+        entity_contexts: list[EntityContext],
+        prior_interactions: list[Interaction] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
+    ) -> Iterator[StateDiff]:
+        """
+        Yield state diffs as they become available.
+
+        Parsers that receive their result incrementally override this to hand
+        out each diff as soon as it is complete; by default the full result
+        of parse_state_diff is yielded at once.
+        """
+        yield from self.parse_with_history(
+            input_text,
+            entity_contexts,
+            prior_interactions=prior_interactions,
+            prior_messages=prior_messages
+        )
+
+    async def parse_state_diff_async(
+        self,
+        input_text: str,
+        entity_contexts: list[EntityContext],
+        prior_interactions: list[Interaction] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
+    ) -> list[StateDiff]:
+        """Awaitable parse; blocking parsers run in a worker thread."""
+        return await asyncio.to_thread(
+            self.parse_with_history,
+            input_text,
+            entity_contexts,
+            prior_interactions=prior_interactions,
+            prior_messages=prior_messages
+        )
+
+
+class AsyncBaseParser(BaseParser):
+    """
+    Parser whose extraction is natively awaitable.
+
+    The blocking parse_state_diff runs the coroutine on a shared background
+    event loop, so async parsers stay usable from synchronous controllers.
+    Code already running on that loop must await parse_state_diff_async.
+    """
+
+    @abstractmethod
+    async def parse_state_diff_async(
+        self,
+        input_text: str,
+        entity_contexts: list[EntityContext],
+        prior_interactions: list[Interaction] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
+    ) -> list[StateDiff]:
+        """Awaitable counterpart of BaseParser.parse_state_diff."""
+        pass
+
+    def parse_state_diff(
+        self,
+        input_text: str,
+        entity_contexts: list[EntityContext],
+        prior_interactions: list[Interaction] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
+    ) -> list[StateDiff]:
+        """
+        Run parse_state_diff_async on the background loop and wait for it.
+
+        Raises:
+            RuntimeError: Called from the background loop itself, which would
+                          wait forever on a coroutine it can no longer run
+        """
+        loop = _background_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError(
+                f"{type(self).__name__}.parse_state_diff was called from the parser event loop; "
+                "await parse_state_diff_async there instead"
+            )
+        return asyncio.run_coroutine_threadsafe(
+            self.parse_state_diff_async(
+                input_text,
+                entity_contexts,
+                prior_interactions=prior_interactions,
+                prior_messages=prior_messages
+            ),
+            loop,
+        ).result()
@@ -0,0 +1,140 @@
+from collections.abc import Iterator
+from typing import Any
+
+from agent.interaction.interaction import Interaction
+from agent.parser.base_parser import BaseParser
+from agent.parser.entity_context import EntityContext
+from agent.parser.rule_based_parser import RuleBasedParser, RuleExtraction
+from agent.parser.state_diff import StateDiff
+from agent.state.entity.state_entity import BaseStateEntity
+
+
+class CompositeParser(BaseParser):
+    """
+    Runs a RuleBasedParser first and hands only what it could not resolve to a fallback parser.
+
+    The fallback sees the whole input, so it keeps the words around the
+    resolved values, and entity contexts whose schemas leave out the resolved
+    fields and list their values under resolved_values. It is skipped entirely
+    when nothing meaningful is left once the resolved spans are removed. Rule
+    results win when both produce the same field.
+    """
+
+    def __init__(
+        self,
+        rule_parser: RuleBasedParser,
+        fallback_parser: BaseParser,
+        channel_domains: list[str | None] | None = None,
+    ):
+        super().__init__(
+            entity_classes=rule_parser.entity_classes,
+            channel_domains=channel_domains or rule_parser.channel_domains,
+        )
+        self.rule_parser = rule_parser
+        self.fallback_parser = fallback_parser
+
+    def parse_state_diff(
+        self,
+        input_text: str,
+        entity_contexts: list[EntityContext],
+        prior_interactions: list[Interaction] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
+    ) -> list[StateDiff]:
+        extraction = self.rule_parser.extract(input_text, entity_contexts)
+        if not extraction.needs_fallback:
+            return extraction.state_diffs
+
+        fallback_diffs = self.fallback_parser.parse_with_history(
+            input_text,
+            self._remaining_contexts(entity_contexts, extraction),
+            prior_interactions=prior_interactions,
+            prior_messages=prior_messages
+        )
+        return self._merge(extraction, fallback_diffs)
+
+    def stream_state_diff(
+        self,
+        input_text: str,
+        entity_contexts: list[EntityContext],
+        prior_interactions: list[Interaction] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
+    ) -> Iterator[StateDiff]:
+        """Rule results are yielded before the fallback is even called."""
+        extraction = self.rule_parser.extract(input_text, entity_contexts)
+        yield from extraction.state_diffs
+        if not extraction.needs_fallback:
+            return
+
+        for state_diff in self.fallback_parser.stream_state_diff(
+            input_text,
+            self._remaining_contexts(entity_contexts, extraction),
+            prior_interactions=prior_interactions,
+            prior_messages=prior_messages
+        ):
+            yield from self._without_resolved(extraction, state_diff)
+
+    async def parse_state_diff_async(
+        self,
+        input_text: str,
+        entity_contexts: list[EntityContext],
+        prior_interactions: list[Interaction] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
+    ) -> list[StateDiff]:
+        extraction = self.rule_parser.extract(input_text, entity_contexts)
+        if not extraction.needs_fallback:
+            return extraction.state_diffs
+
+        fallback_diffs = await self.fallback_parser.parse_state_diff_async(
+            input_text,
+            self._remaining_contexts(entity_contexts, extraction),
+            prior_interactions=prior_interactions,
+            prior_messages=prior_messages
+        )
+        return self._merge(extraction, fallback_diffs)
+
+    @staticmethod
+    def _remaining_contexts(
+        entity_contexts: list[EntityContext], extraction: RuleExtraction
+    ) -> list[EntityContext]:
+        resolved_values: dict[type[BaseStateEntity], dict[str, Any]] = {}
+        for state_diff in extraction.state_diffs:
+            resolved_values.setdefault(state_diff.entity_class, {}).update(
+                (diff.field_name, diff.new_value) for diff in state_diff.diffs
+            )
+
+        remaining: list[EntityContext] = []
+        for ctx in entity_contexts:
+            resolved = extraction.resolved_fields.get(ctx.entity_class)
+            if not resolved:
+                remaining.append(ctx)
+                continue
+            if resolved >= set(ctx.entity_class.get_domain_fields()):
+                continue
+
+            schema = ctx.entity_schema
+            if schema is not None and "properties" in schema:
+                schema = {
+                    **schema,
+                    "properties": {k: v for k, v in schema["properties"].items() if k not in resolved},
+                    "required": [f for f in schema.get("required", []) if f not in resolved],
+                }
+            remaining.append(EntityContext(
+                entity_class=ctx.entity_class,
+                entity_schema=schema,
+                entity_refs=ctx.entity_refs,
+                resolved_values={**(ctx.resolved_values or {}), **resolved_values[ctx.entity_class]},
+            ))
+        return remaining
+
+    @staticmethod
+    def _merge(extraction: RuleExtraction, fallback_diffs: list[StateDiff]) -> list[StateDiff]:
+        merged = list(extraction.state_diffs)
+        for state_diff in fallback_diffs:
+            merged.extend(CompositeParser._without_resolved(extraction, state_diff))
+        return merged
+
+    @staticmethod
+    def _without_resolved(extraction: RuleExtraction, state_diff: StateDiff) -> list[StateDiff]:
+        resolved: set[str] = extraction.resolved_fields.get(state_diff.entity_class, set())
+        diffs = [d for d in state_diff.diffs if d.field_name.split(".")[0] not in resolved]
+        return [state_diff.model_copy(update={"diffs": diffs})] if diffs else []
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from typing import Any
-from pydantic import BaseModel, field_serializer
+from pydantic import BaseModel, PrivateAttr, field_serializer
 
 from agent.state.entity.state_entity import BaseStateEntity
 
@@ -10,10 +10,22 @@ class EntityContext(BaseModel):
     """
     Data that represents user intent and that can be changed
     upon user's request.
+
+    resolved_values lists fields an earlier pass already read off the same
+    input, so that the parser does not extract them again.
     """
     entity_class: type[BaseStateEntity]
     entity_schema: dict[str, Any] | None = None
     entity_refs: list[str] | None = None
+    resolved_values: dict[str, Any] | None = None
+
+    _prompt_json: str | None = PrivateAttr(default=None)
+
+    def to_prompt_json(self) -> str:
+        """JSON sent to the LLM for this context, serialized once per instance."""
+        if self._prompt_json is None:
+            self._prompt_json = self.model_dump_json(exclude_none=True)
+        return self._prompt_json
 
     @field_serializer('entity_class')
     def serialize_entity_class(self, v: type[BaseStateEntity]) -> str:
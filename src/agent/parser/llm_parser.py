@@ -1,88 +1,436 @@
+from __future__ import annotations
+
 import json
-from typing import Any
-from openai import OpenAI
-from pydantic import BaseModel
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
 
 from agent.interaction.interaction import Interaction
-from agent.parser.base_parser import BaseParser
-from agent.state.entity.actor.default_actor import DefaultActor
+from agent.llm.client_provider import get_default_client_provider
+from agent.llm.json_stream import JsonArrayItemScanner
+from agent.llm.model_routing import (
+    LOW_AGREEMENT,
+    SCHEMA_PARSE_FAILURE,
+    UNKNOWN_ENTITY_CLASS,
+    VALIDATION_ERROR,
+    ModelRoutingPolicy,
+    ModelTier,
+)
+from agent.llm.request_executor import (
+    DeadlineExceeded,
+    RequestExecutor,
+    get_default_executor,
+    get_remaining_budget,
+    is_transient_error,
+)
+from agent.llm.single_flight import SingleFlight, get_default_single_flight
+from agent.llm.response_cache import BaseResponseCache, make_cache_key
+from agent.parser.base_parser import AsyncBaseParser, BaseParser
 from agent.state.entity.state_entity import BaseStateEntity
 from agent.parser.entity_context import EntityContext
-from agent.parser.state_diff import StateDiff, LlmStateDiffs
+from agent.parser.state_diff import StateDiff, LlmStateDiff, LlmStateDiffs
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+DEFAULT_PARSE_MODEL = "gpt-4o"
+
+STATE_DIFF_SYSTEM_PROMPT = "Below is the description of data entities that user can modify (set or unset a field value). User may also say something unrelated to these entities. If user intends to modify model entities, capture and return their intent according to provided response schema. If the intent is to unset a field - return default value for this field according to schema. Fields listed under resolved_values were already extracted from the user's message; do not return them again."
+
+
+class LlmResponseError(Exception):
+    """The last model tier refused to answer or returned output that does not parse."""
+
+
+def _build_parse_messages(
+    input_text: str,
+    entity_contexts: list[EntityContext],
+    prior_messages: list[dict[str, str]] | None = None,
+) -> list[dict[str, str]]:
+    combined_entity_ctx = "\n".join([mctx.to_prompt_json() for mctx in entity_contexts])
+    return (prior_messages or []) + [
+        {"role": "system", "content": STATE_DIFF_SYSTEM_PROMPT},
+        {"role": "system", "content": combined_entity_ctx},
+        {"role": "user", "content": input_text},
+    ]
+
+
+def _to_state_diffs(llm_response: LlmStateDiffs | None, entity_contexts: list[EntityContext]) -> list[StateDiff]:
+    if llm_response is None:
+        # Unlike an empty diff list, this is not the model finding nothing to extract
+        raise LlmResponseError("The model refused or returned an unparseable answer")
+    entity_class_map = {ctx.entity_class.__name__: ctx.entity_class for ctx in entity_contexts}
+
+    return [
+        StateDiff(
+            entity_class=entity_class_map[llm_diff.entity_class_name],
+            entity_ref=llm_diff.entity_ref,
+            diffs=llm_diff.diffs,
+        )
+        for llm_diff in llm_response.diffs
+        if llm_diff.entity_class_name in entity_class_map
+    ]
+
+
+def _field_errors(llm_diff: LlmStateDiff, entity_class: type[BaseStateEntity]) -> list[str]:
+    """Problems merging this diff would run into; nested paths are only checked for their root field."""
+    domain_fields = entity_class.get_domain_fields()
+    errors: list[str] = []
+    for diff in llm_diff.diffs:
+        root = diff.field_name.split(".")[0].split("[")[0]
+        if root not in domain_fields:
+            errors.append(f"{entity_class.__name__} has no field {root!r}")
+        elif root == diff.field_name:
+            try:
+                _field_adapter(entity_class, root).validate_python(diff.new_value)
+            except ValidationError as exc:
+                errors.append(f"{entity_class.__name__}.{root}: {exc.errors()[0]['msg']}")
+    return errors
+
+
+@lru_cache(maxsize=1024)
+def _field_adapter(entity_class: type[BaseStateEntity], field_name: str) -> TypeAdapter:
+    return TypeAdapter(entity_class.model_fields[field_name].annotation)
+
+
+def _canonical_answer(llm_response: LlmStateDiffs) -> str:
+    return json.dumps(
+        sorted(json.dumps(d.model_dump(mode="json"), sort_keys=True) for d in llm_response.diffs)
+    )
+
+
+def _evaluate_completion(
+    completion: Any, tier: ModelTier, entity_contexts: list[EntityContext]
+) -> tuple[LlmStateDiffs | None, str | None]:
+    """Pick the answer of a completion and the reason it should be escalated, if any."""
+    answers: list[LlmStateDiffs | None] = [choice.message.parsed for choice in completion.choices]
+    if not answers or any(answer is None for answer in answers):
+        return None, SCHEMA_PARSE_FAILURE
+
+    llm_response = answers[0]
+    if len(answers) > 1:
+        canonical = [_canonical_answer(answer) for answer in answers]
+        majority, votes = Counter(canonical).most_common(1)[0]
+        llm_response = answers[canonical.index(majority)]
+        if votes / len(answers) < tier.min_agreement:
+            return llm_response, LOW_AGREEMENT
+
+    entity_class_map = {ctx.entity_class.__name__: ctx.entity_class for ctx in entity_contexts}
+    if any(llm_diff.entity_class_name not in entity_class_map for llm_diff in llm_response.diffs):
+        return llm_response, UNKNOWN_ENTITY_CLASS
+    if any(_field_errors(llm_diff, entity_class_map[llm_diff.entity_class_name]) for llm_diff in llm_response.diffs):
+        return llm_response, VALIDATION_ERROR
+    return llm_response, None
+
+
+def _tier_request(client: Any, tier: ModelTier, messages: list[dict[str, str]]) -> Callable[[], Any]:
+    kwargs: dict[str, Any] = {"temperature": 0.0}
+    if tier.samples > 1:
+        kwargs = {"n": tier.samples, "temperature": tier.sampling_temperature}
+    return lambda: client.chat.completions.parse(
+        model=tier.model,
+        messages=messages,
+        response_format=LlmStateDiffs,
+        **kwargs,
+        **_budget_timeout()
+    )
+
+
+def _budget_timeout() -> dict[str, Any]:
+    # A blocking request cannot be cancelled once it runs, so the HTTP client
+    # itself gives up when the cycle's latency budget runs out
+    remaining = get_remaining_budget()
+    return {} if remaining is None else {"timeout": max(remaining, 0.001)}
+
+
+def _judge_tier(
+    policy: ModelRoutingPolicy,
+    tier: ModelTier,
+    entity_contexts: list[EntityContext],
+    started: float,
+    completion: Any = None,
+    error: Exception | None = None,
+) -> tuple[LlmStateDiffs | None, bool]:
+    """
+    Evaluate one tier's completion, or the error its request raised, and record the tier's stats.
+
+    Returns:
+        The tier's answer and whether to escalate to the next tier
+
+    Raises:
+        Exception: error, when it is transient or the tier is the last one
+    """
+    try:
+        if error is not None:
+            raise error
+        llm_response, reason = _evaluate_completion(completion, tier, entity_contexts)
+    except Exception as exc:
+        if policy.is_last(tier) or is_transient_error(exc):
+            raise
+        llm_response, reason = None, SCHEMA_PARSE_FAILURE
+    escalate = reason is not None and not policy.is_last(tier)
+    policy.record(tier, time.perf_counter() - started, reason if escalate else None)
+    return llm_response, escalate
+
+
+def _cached_response(cache: BaseResponseCache | None, request_key: str) -> LlmStateDiffs | None:
+    cached = cache.get(request_key) if cache is not None else None
+    return LlmStateDiffs.model_validate_json(cached) if cached is not None else None
+
+
+def _cache_response(cache: BaseResponseCache | None, request_key: str, llm_response: LlmStateDiffs | None) -> None:
+    if cache is not None and llm_response is not None:
+        cache.set(request_key, llm_response.model_dump_json())
+
+
+def _route_state_diffs(
+    client: OpenAI,
+    messages: list[dict[str, str]],
+    entity_contexts: list[EntityContext],
+    executor: RequestExecutor,
+    policy: ModelRoutingPolicy,
+) -> LlmStateDiffs | None:
+    llm_response: LlmStateDiffs | None = None
+    for tier in policy.tiers:
+        started = time.perf_counter()
+        completion, error = None, None
+        try:
+            completion = executor.call(_tier_request(client, tier, messages), key=f"parse:{tier.model}")
+        except Exception as exc:
+            error = exc
+        llm_response, escalate = _judge_tier(policy, tier, entity_contexts, started, completion, error)
+        if not escalate:
+            break
+    return llm_response
+
+
+def _flight_key(request_key: str, client: Any, executor: RequestExecutor, policy: ModelRoutingPolicy) -> str:
+    # Only callers sending through the same client (API key, base URL), executor
+    # and policy may share a result; in-flight callers keep all three alive, so
+    # their ids cannot be reused while the key is in use
+    return f"{request_key}:{id(client):x}:{id(executor):x}:{id(policy):x}"
+
+
+def _complete_state_diffs(
+    client: OpenAI,
+    messages: list[dict[str, str]],
+    entity_contexts: list[EntityContext],
+    cache: BaseResponseCache | None = None,
+    executor: RequestExecutor | None = None,
+    routing_policy: ModelRoutingPolicy | None = None,
+    single_flight: SingleFlight | None = None,
+) -> LlmStateDiffs | None:
+    policy = routing_policy or ModelRoutingPolicy([DEFAULT_PARSE_MODEL])
+    # The prompt hash keys the cache and, scoped to client/executor/policy, in-flight coalescing
+    request_key = make_cache_key(policy.cache_namespace, messages, LlmStateDiffs)
+    cached = _cached_response(cache, request_key)
+    if cached is not None:
+        return cached
+
+    executor = executor or get_default_executor()
+
+    def complete() -> LlmStateDiffs | None:
+        llm_response = _route_state_diffs(client, messages, entity_contexts, executor, policy)
+        _cache_response(cache, request_key, llm_response)
+        return llm_response
+
+    if single_flight is None:
+        return complete()
+    return single_flight.do(_flight_key(request_key, client, executor, policy), complete)
+
+
+def _open_stream(client: OpenAI, tier: ModelTier, messages: list[dict[str, str]]) -> Callable[[], Any]:
+    # Entering the stream manager sends the request and waits for the response headers
+    return lambda: client.chat.completions.stream(
+        model=tier.model,
+        messages=messages,
+        response_format=LlmStateDiffs,
+        temperature=0.0,
+        **_budget_timeout()
+    ).__enter__()
+
+
+def _stream_state_diffs(
+    client: OpenAI,
+    messages: list[dict[str, str]],
+    cache: BaseResponseCache | None = None,
+    routing_policy: ModelRoutingPolicy | None = None,
+    executor: RequestExecutor | None = None,
+) -> Iterator[LlmStateDiff]:
+    policy = routing_policy or ModelRoutingPolicy([DEFAULT_PARSE_MODEL])
+    request_key = make_cache_key(policy.cache_namespace, messages, LlmStateDiffs) if cache is not None else ""
+    cached = _cached_response(cache, request_key)
+    if cached is not None:
+        yield from cached.diffs
+        return
+
+    # Diffs are applied while they arrive and cannot be taken back, so streams
+    # skip escalation and go straight to the last (most capable) tier
+    tier = policy.tiers[-1]
+    started = time.perf_counter()
+    scanner = JsonArrayItemScanner("diffs")
+    streamed: list[LlmStateDiff] = []
+    # Opening the stream gets the executor's deadline, retries and hedging; once
+    # diffs have been handed out a failure can no longer be retried
+    stream = (executor or get_default_executor()).call(
+        _open_stream(client, tier, messages), key=f"stream:{tier.model}", discard=lambda s: s.close()
+    )
+    try:
+        for event in stream:
+            remaining = get_remaining_budget()
+            if remaining is not None and remaining <= 0:
+                raise DeadlineExceeded("LLM stream did not complete within the cycle's latency budget")
+            if event.type != "content.delta":
+                continue
+            for item_json in scanner.feed(event.delta):
+                llm_diff = LlmStateDiff.model_validate_json(item_json)
+                streamed.append(llm_diff)
+                yield llm_diff
+    finally:
+        stream.close()
+
+    policy.record(tier, time.perf_counter() - started)
+    # Only a stream consumed to the end is cached; an abandoned one may be partial
+    _cache_response(cache, request_key, LlmStateDiffs(diffs=streamed))
+
+
+async def _route_state_diffs_async(
+    client: AsyncOpenAI,
+    messages: list[dict[str, str]],
+    entity_contexts: list[EntityContext],
+    executor: RequestExecutor,
+    policy: ModelRoutingPolicy,
+) -> LlmStateDiffs | None:
+    llm_response: LlmStateDiffs | None = None
+    for tier in policy.tiers:
+        started = time.perf_counter()
+        completion, error = None, None
+        try:
+            completion = await executor.call_async(_tier_request(client, tier, messages), key=f"parse:{tier.model}")
+        except Exception as exc:
+            error = exc
+        llm_response, escalate = _judge_tier(policy, tier, entity_contexts, started, completion, error)
+        if not escalate:
+            break
+    return llm_response
+
+
+async def _complete_state_diffs_async(
+    client: AsyncOpenAI,
+    messages: list[dict[str, str]],
+    entity_contexts: list[EntityContext],
+    cache: BaseResponseCache | None = None,
+    executor: RequestExecutor | None = None,
+    routing_policy: ModelRoutingPolicy | None = None,
+    single_flight: SingleFlight | None = None,
+) -> LlmStateDiffs | None:
+    policy = routing_policy or ModelRoutingPolicy([DEFAULT_PARSE_MODEL])
+    request_key = make_cache_key(policy.cache_namespace, messages, LlmStateDiffs)
+    cached = _cached_response(cache, request_key)
+    if cached is not None:
+        return cached
+
+    executor = executor or get_default_executor()
+
+    async def complete() -> LlmStateDiffs | None:
+        llm_response = await _route_state_diffs_async(client, messages, entity_contexts, executor, policy)
+        _cache_response(cache, request_key, llm_response)
+        return llm_response
+
+    if single_flight is None:
+        return await complete()
+    return await single_flight.do_async(_flight_key(request_key, client, executor, policy), complete)
 
 
 class LlmParser(BaseParser):
+    """
+    Extracts state diffs with structured LLM output.
+
+    The model is chosen by routing_policy: each parse starts at the cheapest
+    tier and moves to the next one when the answer cannot be parsed, names an
+    unknown entity class, fails field validation, or its samples disagree.
+    A refusal or unparseable answer from the last tier raises LlmResponseError.
+    """
+
     def __init__(
         self,
         client: OpenAI | None = None,
         entity_classes: list[type[BaseStateEntity]] | None = None,
         channel_domains: list[str | None] | None = None,
+        cache: BaseResponseCache | None = None,
+        executor: RequestExecutor | None = None,
+        routing_policy: ModelRoutingPolicy | None = None,
+        single_flight: SingleFlight | None = None,
     ):
         super().__init__(
             entity_classes=entity_classes or [BaseStateEntity],
             channel_domains=channel_domains or [None],
         )
-        self.client: OpenAI = client or OpenAI()
+        self._client = client
+        self.cache = cache
+        self.executor = executor
+        self.routing_policy = routing_policy or ModelRoutingPolicy([DEFAULT_PARSE_MODEL])
+        # Identical prompts in flight at the same time share one request
+        self.single_flight = single_flight or get_default_single_flight()
+
+    @property
+    def client(self) -> OpenAI:
+        # Borrowed from the shared pooled provider unless one was passed in;
+        # nothing is built until the first parse
+        if self._client is None:
+            return get_default_client_provider().client()
+        return self._client
+
+    @client.setter
+    def client(self, client: OpenAI) -> None:
+        self._client = client
 
     def parse_state_diff(
         self,
         input_text: str,
         entity_contexts: list[EntityContext],
-        prior_interactions: list[Interaction | Any] | None = None
+        prior_interactions: list[Interaction | Any] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
     ) -> list[StateDiff]:
-        combined_entity_ctx = "\n".join([mctx.model_dump_json() for mctx in entity_contexts])
-        _prior_messages: list[dict[str, str]] = self._prepare_prior_messages(prior_interactions)
-
-        messages = _prior_messages + [
-            {"role": "system", "content": "Below is the description of data entities that user can modify (set or unset a field value). User may also say something unrelated to these entities. If user intends to modify model entities, capture and return their intent according to provided response schema. If the intent is to unset a field - return default value for this field according to schema."},
-            {"role": "system", "content": combined_entity_ctx},
-            {"role": "user", "content": input_text},
-        ]
-
-        completion = self.client.chat.completions.parse(
-            model="gpt-4o",
-            messages=messages,
-            response_format=LlmStateDiffs,
-            temperature=0.0
+        _prior_messages: list[dict[str, str]] = (
+            prior_messages if prior_messages is not None else self._prepare_prior_messages(prior_interactions)
+        )
+        messages = _build_parse_messages(input_text, entity_contexts, _prior_messages)
+
+        llm_response = _complete_state_diffs(
+            self.client, messages, entity_contexts, self.cache, self.executor, self.routing_policy,
+            self.single_flight
         )
+        return _to_state_diffs(llm_response, entity_contexts)
 
-        llm_response: LlmStateDiffs = completion.choices[0].message.parsed
-        entity_class_map = {ctx.entity_class.__name__: ctx.entity_class for ctx in entity_contexts}
+    def stream_state_diff(
+        self,
+        input_text: str,
+        entity_contexts: list[EntityContext],
+        prior_interactions: list[Interaction | Any] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
+    ) -> Iterator[StateDiff]:
+        """Streams the structured output and yields each diff once its JSON object has closed."""
+        _prior_messages: list[dict[str, str]] = (
+            prior_messages if prior_messages is not None else self._prepare_prior_messages(prior_interactions)
+        )
+        messages = _build_parse_messages(input_text, entity_contexts, _prior_messages)
 
-        return [
-            StateDiff(
-                entity_class=entity_class_map[llm_diff.entity_class_name],
-                entity_ref=llm_diff.entity_ref,
-                diffs=llm_diff.diffs,
-            )
-            for llm_diff in llm_response.diffs
-            if llm_diff.entity_class_name in entity_class_map
-        ]
+        for llm_diff in _stream_state_diffs(self.client, messages, self.cache, self.routing_policy, self.executor):
+            yield from _to_state_diffs(LlmStateDiffs(diffs=[llm_diff]), entity_contexts)
 
     @staticmethod
     def _prepare_prior_messages(intent_context: list[Interaction | Any] | None = None) -> list[dict[str, str]]:
         _intent_context: list[dict[str, str]] = []
         for entity_context in (intent_context or []):
             if isinstance(entity_context, Interaction):
-                to_message = getattr(entity_context, "to_llm_message", None)
-                if callable(to_message):
-                    _intent_context.append(to_message())
-                    continue
-
-                content = getattr(entity_context, "input_value", None)
-                if content is None:
-                    continue
-                if isinstance(content, BaseModel):
-                    content = content.model_dump_json()
-                elif isinstance(content, (list, dict)):
-                    try:
-                        content = json.dumps(content)
-                    except Exception:
-                        content = str(content)
-                else:
-                    content = str(content)
-                role = "assistant" if isinstance(entity_context.actor, DefaultActor) else "user"
-                _intent_context.append({"role": role, "content": content})
+                message = entity_context.to_llm_message()
+                if message is not None:
+                    _intent_context.append(message)
             elif isinstance(entity_context, BaseModel):
                 _intent_context.append({"role": "system", "content": entity_context.model_dump_json()})
             elif isinstance(entity_context, (list, dict)):
@@ -99,41 +447,73 @@ class LlmParser(BaseParser):
         return _intent_context
 
 
+class AsyncLlmParser(AsyncBaseParser):
+    """LlmParser counterpart built on the async OpenAI client."""
+
+    def __init__(
+        self,
+        client: AsyncOpenAI | None = None,
+        entity_classes: list[type[BaseStateEntity]] | None = None,
+        channel_domains: list[str | None] | None = None,
+        cache: BaseResponseCache | None = None,
+        executor: RequestExecutor | None = None,
+        routing_policy: ModelRoutingPolicy | None = None,
+        single_flight: SingleFlight | None = None,
+    ):
+        super().__init__(
+            entity_classes=entity_classes or [BaseStateEntity],
+            channel_domains=channel_domains or [None],
+        )
+        self._client = client
+        self.cache = cache
+        self.executor = executor
+        self.routing_policy = routing_policy or ModelRoutingPolicy([DEFAULT_PARSE_MODEL])
+        # Identical prompts in flight at the same time share one request
+        self.single_flight = single_flight or get_default_single_flight()
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            return get_default_client_provider().async_client()
+        return self._client
+
+    @client.setter
+    def client(self, client: AsyncOpenAI) -> None:
+        self._client = client
+
+    async def parse_state_diff_async(
+        self,
+        input_text: str,
+        entity_contexts: list[EntityContext],
+        prior_interactions: list[Interaction | Any] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
+    ) -> list[StateDiff]:
+        _prior_messages: list[dict[str, str]] = (
+            prior_messages if prior_messages is not None else LlmParser._prepare_prior_messages(prior_interactions)
+        )
+        messages = _build_parse_messages(input_text, entity_contexts, _prior_messages)
+
+        llm_response = await _complete_state_diffs_async(
+            self.client, messages, entity_contexts, self.cache, self.executor, self.routing_policy,
+            self.single_flight
+        )
+        return _to_state_diffs(llm_response, entity_contexts)
+
+
 def parse_state_diff_with_llm(input_text: str,
                               entity_contexts: list[EntityContext],
                               context: list[dict[str, str]] | None = None,
-                              client: OpenAI | None = None
+                              client: OpenAI | None = None,
+                              cache: BaseResponseCache | None = None
                               ) -> list[StateDiff]:
 
-    combined_entity_ctx = "\n".join([mctx.model_dump_json() for mctx in entity_contexts])
-
-    messages = (context or []) + [
-        {"role": "system", "content": "Below is the description of data entities that user can modify (set or unset a field value). User may also say something unrelated to these entities. If user intends to modify model entities, capture and return their intent according to provided response schema. If the intent is to unset a field - return default value for this field according to schema."},
-        {"role": "system", "content": combined_entity_ctx},
-        {"role": "user", "content": input_text},
-    ]
-
-    llm_client = client or OpenAI()
-
-    completion = llm_client.chat.completions.parse(
-        model="gpt-4o",
-        messages=messages,
-        response_format=LlmStateDiffs,
-        temperature=0.0
-    )
+    messages = _build_parse_messages(input_text, entity_contexts, context)
 
-    llm_response: LlmStateDiffs = completion.choices[0].message.parsed
-    entity_class_map = {ctx.entity_class.__name__: ctx.entity_class for ctx in entity_contexts}
+    if client is None:
+        client = get_default_client_provider().client()
 
-    return [
-        StateDiff(
-            entity_class=entity_class_map[llm_diff.entity_class_name],
-            entity_ref=llm_diff.entity_ref,
-            diffs=llm_diff.diffs,
-        )
-        for llm_diff in llm_response.diffs
-        if llm_diff.entity_class_name in entity_class_map
-    ]
+    llm_response = _complete_state_diffs(client, messages, entity_contexts, cache)
+    return _to_state_diffs(llm_response, entity_contexts)
 
 
 def register_llm_parser(channel_domain: str | None = None) -> None:
@@ -1,19 +1,54 @@
+from pydantic import BaseModel, ConfigDict
+
 from agent.parser.base_parser import BaseParser
+from agent.parser.entity_context import EntityContext
+from agent.parser.schema_renderer import compact_schema
 from agent.state.entity.state_entity import BaseStateEntity
 
 
+class ParserGroup(BaseModel):
+    """Entity classes of one input that are extracted by the same parser in a single call."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True, frozen=True)
+
+    parser: BaseParser
+    entity_classes: tuple[type[BaseStateEntity], ...]
+    # Prebuilt contexts without entity refs; refs depend on storage state and are added per turn
+    entity_contexts: tuple[EntityContext, ...]
+
+
+class ExtractionPlan(BaseModel):
+    """Precompiled parser grouping for an (input class, channel domain) pair."""
+
+    model_config = ConfigDict(frozen=True)
+
+    groups: tuple[ParserGroup, ...]
+
+
 class ParserRegistry:
     def __init__(self):
         self._parsers: dict[str | None, dict[type[BaseStateEntity], BaseParser]] = {}
+        self._resolved: dict[tuple[type[BaseStateEntity], str | None], BaseParser | None] = {}
+        self._plans: dict[tuple[type, str | None], ExtractionPlan] = {}
 
     def register(self, parser: BaseParser) -> None:
         for channel_domain in parser.channel_domains:
             domain_parsers = self._parsers.setdefault(channel_domain, {})
             for entity_class in parser.entity_classes:
                 domain_parsers[entity_class] = parser
+        self._resolved.clear()
+        self._plans.clear()
 
     def get_parser(
         self, entity_class: type[BaseStateEntity], channel_domain: str | None = None
+    ) -> BaseParser | None:
+        key = (entity_class, channel_domain)
+        if key not in self._resolved:
+            self._resolved[key] = self._resolve_parser(entity_class, channel_domain)
+        return self._resolved[key]
+
+    def _resolve_parser(
+        self, entity_class: type[BaseStateEntity], channel_domain: str | None
     ) -> BaseParser | None:
         for domain in (channel_domain, None):
             domain_parsers = self._parsers.get(domain, {})
@@ -26,6 +61,47 @@ class ParserRegistry:
 
         return None
 
+    def get_extraction_plan(self, input_class: type, channel_domain: str | None = None) -> ExtractionPlan:
+        """
+        Return the cached extraction plan for an input class, compiling it on first use.
+
+        Plans are dropped whenever a parser is registered.
+
+        Args:
+            input_class: BaseInput subclass whose extracts_to is planned
+            channel_domain: Domain of the channel the input arrives on
+
+        Returns:
+            Parser groups in a stable order
+        """
+        key = (input_class, channel_domain)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._plans[key] = self._compile_plan(input_class, channel_domain)
+        return plan
+
+    def _compile_plan(self, input_class: type, channel_domain: str | None) -> ExtractionPlan:
+        # extracts_to is a set; sort it so diffs come back in a stable order
+        entity_classes = sorted(input_class.extracts_to, key=lambda c: (c.__module__, c.__qualname__))
+        classes_by_parser: dict[BaseParser, list[type[BaseStateEntity]]] = {}
+        for cls in entity_classes:
+            parser = self.get_parser(cls, channel_domain)
+            if parser is None:
+                raise ValueError(f"No parser registered for entity class {cls.__name__}")
+            classes_by_parser.setdefault(parser, []).append(cls)
+
+        return ExtractionPlan(groups=tuple(
+            ParserGroup(
+                parser=parser,
+                entity_classes=tuple(classes),
+                entity_contexts=tuple(
+                    EntityContext(entity_class=cls, entity_schema=compact_schema(cls))
+                    for cls in classes
+                ),
+            )
+            for parser, classes in classes_by_parser.items()
+        ))
+
 
 _default_registry: ParserRegistry | None = None
 
@@ -34,6 +110,9 @@ def get_default_registry() -> ParserRegistry:
     global _default_registry
     if _default_registry is None:
         _default_registry = ParserRegistry()
+        # LLM fallback for every entity class; its client is only built on first parse
+        from agent.parser.llm_parser import LlmParser
+        _default_registry.register(LlmParser())
     return _default_registry
 
 
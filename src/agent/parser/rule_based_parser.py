@@ -0,0 +1,341 @@
+"""Deterministic extraction of trivially resolvable fields, without an LLM."""
+
+from __future__ import annotations
+
+import re
+from datetime import date, datetime
+from types import UnionType
+from typing import Any, Literal, Union, get_args, get_origin
+
+from pydantic import BaseModel, ConfigDict
+
+from agent.interaction.interaction import Interaction
+from agent.parser.base_parser import BaseParser
+from agent.parser.entity_context import EntityContext
+from agent.parser.state_diff import StateDiff
+from agent.state.entity.state_entity import BaseStateEntity
+from agent.state.entity.types import FieldDiff
+
+# Any of these means the user may be correcting or unsetting the values next to it; leave those to the LLM
+_CORRECTION_CUES = re.compile(
+    r"\b(no|not|don'?t|never|changed? my mind|instead|actually|rather|cancel|remove|unset|forget|without)\b",
+    re.IGNORECASE,
+)
+# Cues that dispute what comes before them ("a catamaran instead") rather than after
+_TRAILING_CUES = frozenset({"instead", "rather"})
+_CLAUSE_BREAKS = re.compile(r"[,.;!?]")
+
+_UNIT_ALIASES: dict[str, tuple[str, ...]] = {
+    "ft": ("ft", "feet", "foot"),
+    "m": ("m", "meters", "metres", "meter", "metre"),
+    "days": ("days", "day", "nights", "night"),
+}
+
+_NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+
+_MONTHS = {
+    name: number
+    for number, names in enumerate(
+        [("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"),
+         ("may",), ("june", "jun"), ("july", "jul"), ("august", "aug"),
+         ("september", "sep", "sept"), ("october", "oct"), ("november", "nov"), ("december", "dec")],
+        start=1,
+    )
+    for name in names
+}
+_MONTH_PATTERN = "|".join(sorted(_MONTHS, key=len, reverse=True))
+_DATE_PATTERNS = [
+    re.compile(r"\b(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\b"),
+    re.compile(
+        rf"\b(?P<month_name>{_MONTH_PATTERN})\.?\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?,?\s+(?P<year>\d{{4}})\b",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        rf"\b(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<month_name>{_MONTH_PATTERN})\.?,?\s+(?P<year>\d{{4}})\b",
+        re.IGNORECASE,
+    ),
+    # Without a year; tried last so that dates with one are matched whole
+    re.compile(rf"\b(?P<month_name>{_MONTH_PATTERN})\.?\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\b", re.IGNORECASE),
+    re.compile(rf"\b(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<month_name>{_MONTH_PATTERN})\b", re.IGNORECASE),
+]
+_END_DATE_CUES = re.compile(r"\b(until|till|through|thru|ending|end|return(?:ing)?|back)\s*(?:on\s+)?$", re.IGNORECASE)
+
+# Words that carry no extractable meaning once the resolved spans are removed
+_FILLER_WORDS = frozenset({
+    "a", "an", "the", "i", "i'd", "i'm", "we", "we'd", "me", "my", "us", "our", "it", "is", "be", "that", "this",
+    "to", "for", "of", "in", "on", "at", "and", "or", "with", "about", "around", "approximately", "maybe",
+    "just", "so", "also", "then", "want", "wanna", "need", "would", "like", "book", "booking", "get",
+    "please", "thanks", "thank", "you", "ok", "okay", "yes", "sure", "one", "let's", "lets", "boat",
+    "from", "until", "till", "through", "between", "starting", "trip",
+})
+
+
+class RuleExtraction(BaseModel):
+    """Outcome of a rule pass: confident diffs plus what is left for a fallback parser."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    state_diffs: list[StateDiff]
+    resolved_fields: dict[type[BaseStateEntity], set[str]]
+    leftover_text: str
+
+    @property
+    def needs_fallback(self) -> bool:
+        return any(
+            token.strip(".,!?;:'\"()").lower() not in _FILLER_WORDS
+            for token in self.leftover_text.split()
+            if token.strip(".,!?;:'\"()")
+        )
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    origin = get_origin(annotation)
+    if origin is Union or origin is UnionType:
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        return args[0] if len(args) == 1 else annotation
+    return annotation
+
+
+class _FieldRule:
+    """Compiled matcher for one entity field."""
+
+    def __init__(self, field_name: str, kind: str, pattern: re.Pattern | None = None,
+                 values: dict[str, Any] | None = None):
+        self.field_name = field_name
+        self.kind = kind
+        self.pattern = pattern
+        self.values = values or {}
+
+    def find(self, text: str) -> list[tuple[Any, tuple[int, int]]]:
+        matches = []
+        for match in self.pattern.finditer(text):
+            raw = match.group(1).lower()
+            if self.kind == "literal":
+                value = self.values[raw] if raw in self.values else self.values[raw[:-1]]
+            elif self.kind == "int":
+                value = _NUMBER_WORDS[raw] if raw in _NUMBER_WORDS else int(raw)
+            else:
+                value = _NUMBER_WORDS[raw] if raw in _NUMBER_WORDS else float(raw)
+            matches.append((value, match.span()))
+        return matches
+
+
+def _compile_rules(entity_class: type[BaseStateEntity]) -> tuple[list[_FieldRule], list[str]]:
+    """Derive matchers from field types and names; returns (value rules, datetime field names)."""
+    rules: list[_FieldRule] = []
+    date_fields: list[str] = []
+
+    for field_name, field_info in entity_class.get_domain_fields().items():
+        annotation = _unwrap_optional(field_info.annotation)
+
+        if get_origin(annotation) is Literal:
+            values = {
+                str(v).lower(): v for v in get_args(annotation)
+                if isinstance(v, str) and v != field_info.default
+            }
+            if values:
+                alternatives = "|".join(re.escape(v) for v in sorted(values, key=len, reverse=True))
+                rules.append(_FieldRule(
+                    field_name, "literal", re.compile(rf"\b({alternatives})s?\b", re.IGNORECASE), values
+                ))
+
+        elif annotation in (int, float):
+            unit = field_name.split("_")[-1].lower()
+            units = _UNIT_ALIASES.get(unit, (unit, unit.rstrip("s")))
+            unit_pattern = "|".join(re.escape(u) for u in sorted(set(units), key=len, reverse=True))
+            number = r"\d+" if annotation is int else r"\d+(?:\.\d+)?"
+            number_pattern = "|".join([number, *_NUMBER_WORDS])
+            rules.append(_FieldRule(
+                field_name,
+                "int" if annotation is int else "float",
+                re.compile(rf"\b({number_pattern})\s*-?\s*(?:{unit_pattern})\b", re.IGNORECASE),
+            ))
+
+        elif annotation in (datetime, date):
+            date_fields.append(field_name)
+
+    return rules, date_fields
+
+
+def _find_dates(text: str, reference_date: date) -> list[tuple[datetime, tuple[int, int]]]:
+    """
+    Explicit dates in text order.
+
+    A date without a year is taken to be its first occurrence on or after
+    the date before it in the text, or after reference_date for the first
+    one, so "Dec 28 until Jan 3" spans the new year.
+    """
+    matches: list[re.Match] = []
+    for pattern in _DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            if not any(m.start() < match.end() and match.start() < m.end() for m in matches):
+                matches.append(match)
+
+    found: list[tuple[datetime, tuple[int, int]]] = []
+    anchor = datetime(reference_date.year, reference_date.month, reference_date.day)
+    for match in sorted(matches, key=lambda m: m.start()):
+        parts = match.groupdict()
+        month = _MONTHS[parts["month_name"].lower()] if parts.get("month_name") else int(parts["month"])
+        try:
+            if parts.get("year"):
+                value = datetime(int(parts["year"]), month, int(parts["day"]))
+            else:
+                value = _next_occurrence(anchor, month, int(parts["day"]))
+        except ValueError:
+            continue
+        found.append((value, match.span()))
+        anchor = value
+    return found
+
+
+def _next_occurrence(anchor: datetime, month: int, day: int) -> datetime:
+    """First month/day on or after anchor; Feb 29 may be up to four years out."""
+    for year in range(anchor.year, anchor.year + 5):
+        try:
+            value = datetime(year, month, day)
+        except ValueError:
+            continue
+        if value >= anchor:
+            return value
+    raise ValueError(f"No date {month}/{day}")
+
+
+def _disputed_regions(text: str) -> list[tuple[int, int]]:
+    """
+    Stretches of text a correction cue may refer to.
+
+    A cue covers the rest of its clause, or the next clause when nothing
+    follows it in its own ("No, 45 ft"); trailing cues such as "instead"
+    cover their clause up to themselves.
+    """
+    breaks = [match.start() for match in _CLAUSE_BREAKS.finditer(text)]
+    regions: list[tuple[int, int]] = []
+    for cue in _CORRECTION_CUES.finditer(text):
+        if cue.group(1).lower() in _TRAILING_CUES:
+            start = max((b + 1 for b in breaks if b < cue.start()), default=0)
+            regions.append((start, cue.end()))
+            continue
+        following = [b for b in breaks if b >= cue.end()]
+        end = following[0] if following else len(text)
+        if not text[cue.end():end].strip():
+            end = following[1] if len(following) > 1 else len(text)
+        regions.append((cue.start(), end))
+    return regions
+
+
+def _overlaps(span: tuple[int, int], regions: list[tuple[int, int]]) -> bool:
+    return any(start < span[1] and span[0] < end for start, end in regions)
+
+
+class RuleBasedParser(BaseParser):
+    """
+    Resolves fields whose values can be read straight off the input.
+
+    Matchers are derived from each entity's pydantic fields: Literal values are
+    matched by name, int/float fields by a number followed by the unit in the
+    field name (boat_length_ft -> "40 ft", number_of_cabins -> "3 cabins"), and
+    datetime fields by explicit dates, with dates lacking a year placed after
+    the reference date. A field is only emitted when exactly one value matches
+    it. Fields matched next to a correction cue ("not a monohull", "No, 45 ft")
+    are left untouched so the LLM can interpret them.
+    """
+
+    def __init__(
+        self,
+        entity_classes: list[type[BaseStateEntity]],
+        channel_domains: list[str | None] | None = None,
+        reference_date: date | None = None,
+    ):
+        """
+        Args:
+            entity_classes: Entities to derive matchers for
+            channel_domains: Channel domains the parser serves
+            reference_date: Date that yearless dates fall on or after (defaults to today)
+        """
+        super().__init__(entity_classes=entity_classes, channel_domains=channel_domains or [None])
+        self.reference_date = reference_date
+        self._rules: dict[type[BaseStateEntity], tuple[list[_FieldRule], list[str]]] = {}
+
+    def parse_state_diff(
+        self,
+        input_text: str,
+        entity_contexts: list[EntityContext],
+        prior_interactions: list[Interaction] | None = None,
+        prior_messages: list[dict[str, str]] | None = None
+    ) -> list[StateDiff]:
+        return self.extract(input_text, entity_contexts).state_diffs
+
+    def extract(self, input_text: str, entity_contexts: list[EntityContext]) -> RuleExtraction:
+        state_diffs: list[StateDiff] = []
+        resolved_fields: dict[type[BaseStateEntity], set[str]] = {}
+        consumed: list[tuple[int, int]] = []
+        disputed = _disputed_regions(input_text)
+        dates = _find_dates(input_text, self.reference_date or date.today())
+        if any(_overlaps(span, disputed) for _, span in dates):
+            dates = []
+
+        for ctx in entity_contexts:
+            rules, date_fields = self._get_rules(ctx.entity_class)
+            field_diffs: list[FieldDiff] = []
+
+            for rule in rules:
+                matches = rule.find(input_text)
+                distinct_values = {value for value, _ in matches}
+                if len(distinct_values) != 1 or any(_overlaps(span, disputed) for _, span in matches):
+                    continue
+                field_diffs.append(FieldDiff(field_name=rule.field_name, new_value=matches[0][0]))
+                consumed.extend(span for _, span in matches)
+
+            for field_name, (value, span) in self._assign_dates(input_text, dates, date_fields).items():
+                field_diffs.append(FieldDiff(field_name=field_name, new_value=value.isoformat()))
+                consumed.append(span)
+
+            if field_diffs:
+                state_diffs.append(StateDiff(entity_class=ctx.entity_class, diffs=field_diffs))
+                resolved_fields[ctx.entity_class] = {d.field_name for d in field_diffs}
+
+        return RuleExtraction(
+            state_diffs=state_diffs,
+            resolved_fields=resolved_fields,
+            leftover_text=self._remove_spans(input_text, consumed),
+        )
+
+    def _get_rules(self, entity_class: type[BaseStateEntity]) -> tuple[list[_FieldRule], list[str]]:
+        rules = self._rules.get(entity_class)
+        if rules is None:
+            rules = self._rules[entity_class] = _compile_rules(entity_class)
+        return rules
+
+    @staticmethod
+    def _assign_dates(
+        text: str, dates: list[tuple[datetime, tuple[int, int]]], date_fields: list[str]
+    ) -> dict[str, tuple[datetime, tuple[int, int]]]:
+        if not dates or not date_fields:
+            return {}
+        if len(date_fields) == 1:
+            return {date_fields[0]: dates[0]} if len(dates) == 1 else {}
+        if len(dates) == 2:
+            # A range fills the first and last declared date fields (start/end)
+            return {date_fields[0]: dates[0], date_fields[-1]: dates[1]}
+        if len(dates) == 1:
+            _, (start, _) = dates[0]
+            target = date_fields[-1] if _END_DATE_CUES.search(text[:start]) else date_fields[0]
+            return {target: dates[0]}
+        return {}
+
+    @staticmethod
+    def _remove_spans(text: str, spans: list[tuple[int, int]]) -> str:
+        if not spans:
+            return text
+        pieces: list[str] = []
+        cursor = 0
+        for start, end in sorted(spans):
+            if start < cursor:
+                start = cursor
+            pieces.append(text[cursor:start])
+            cursor = max(cursor, end)
+        pieces.append(text[cursor:])
+        return re.sub(r"\s+", " ", " ".join(pieces)).strip()
@@ -0,0 +1,118 @@
+"""Token-efficient entity schemas for LLM prompts."""
+
+import json
+from collections.abc import Iterable
+from functools import lru_cache
+from typing import Any
+
+from agent.state.entity.state_entity import BaseStateEntity
+
+# Keywords that only repeat what the field name already says
+_DROPPED_KEYWORDS = frozenset({"title"})
+
+
+def _compact(node: Any) -> Any:
+    if isinstance(node, list):
+        return [_compact(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    compacted: dict[str, Any] = {}
+    for key, value in node.items():
+        if key in _DROPPED_KEYWORDS:
+            continue
+        if key in ("properties", "$defs"):
+            # Keys of these maps are names, not keywords
+            compacted[key] = {name: _compact(sub) for name, sub in value.items()}
+        else:
+            compacted[key] = _compact(value)
+
+    # {"anyOf": [{"type": "integer"}, {"type": "null"}]} -> {"type": ["integer", "null"]}
+    branches = compacted.get("anyOf")
+    if branches and all(isinstance(b, dict) and set(b) == {"type"} and isinstance(b["type"], str) for b in branches):
+        compacted.pop("anyOf")
+        compacted["type"] = [b["type"] for b in branches]
+    return compacted
+
+
+def _referenced_defs(node: Any, refs: set[str]) -> set[str]:
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref.startswith("#/$defs/"):
+            refs.add(ref[len("#/$defs/"):])
+        for key, value in node.items():
+            if key != "$defs":
+                _referenced_defs(value, refs)
+    elif isinstance(node, list):
+        for item in node:
+            _referenced_defs(item, refs)
+    return refs
+
+
+def _prune_defs(schema: dict[str, Any]) -> dict[str, Any]:
+    defs = schema.get("$defs")
+    if not defs:
+        return schema
+
+    used: set[str] = set()
+    pending = _referenced_defs(schema, set())
+    while pending:
+        name = pending.pop()
+        if name in used or name not in defs:
+            continue
+        used.add(name)
+        pending |= _referenced_defs(defs[name], set()) - used
+
+    pruned = {k: v for k, v in schema.items() if k != "$defs"}
+    if used:
+        pruned["$defs"] = {name: defs[name] for name in defs if name in used}
+    return pruned
+
+
+@lru_cache(maxsize=512)
+def _full_schema(entity_class: type[BaseStateEntity]) -> dict[str, Any]:
+    return _prune_defs(_compact(entity_class.domain_json_schema()))
+
+
+@lru_cache(maxsize=4096)
+def _schema_for_fields(entity_class: type[BaseStateEntity], fields: frozenset[str] | None) -> dict[str, Any]:
+    schema = _full_schema(entity_class)
+    if fields is None:
+        return schema
+    subset = {
+        **schema,
+        "properties": {k: v for k, v in schema.get("properties", {}).items() if k in fields},
+    }
+    if "required" in schema:
+        subset["required"] = [f for f in schema["required"] if f in fields]
+    return _prune_defs(subset)
+
+
+def compact_schema(
+    entity_class: type[BaseStateEntity], fields: Iterable[str] | None = None
+) -> dict[str, Any]:
+    """
+    Domain JSON schema of an entity class without titles, metadata fields or unused $defs.
+
+    Results are memoized per (class, fields) and shared between callers, so
+    they must not be mutated.
+
+    Args:
+        entity_class: Entity to describe
+        fields: Restrict the schema to these domain fields (e.g. the missing ones);
+                None keeps all of them
+
+    Returns:
+        JSON schema dict
+    """
+    return _schema_for_fields(entity_class, frozenset(fields) if fields is not None else None)
+
+
+@lru_cache(maxsize=4096)
+def _render(entity_class: type[BaseStateEntity], fields: frozenset[str] | None) -> str:
+    return json.dumps(_schema_for_fields(entity_class, fields), separators=(",", ":"))
+
+
+def render_schema(entity_class: type[BaseStateEntity], fields: Iterable[str] | None = None) -> str:
+    """compact_schema serialized without whitespace, memoized the same way."""
+    return _render(entity_class, frozenset(fields) if fields is not None else None)
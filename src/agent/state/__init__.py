@@ -1,17 +1,37 @@
 """State storage package for semantic search and chronological tracking of state entities."""
 
-from agent.misc.embedding_service import DefaultEmbeddingService, EmbeddingService
-from agent.misc.similarity_metrics import (
-    cosine_similarity,
-    dot_product_similarity,
-    euclidean_similarity,
-)
+from importlib import import_module
+from typing import TYPE_CHECKING
+
 from agent.state.storage.base_state_storage import BaseStateStorage
 
+if TYPE_CHECKING:
+    from agent.misc.embedding_service import DefaultEmbeddingService, EmbeddingService
+    from agent.misc.columnar_storage import ColumnarStateStorage
+    from agent.misc.in_memory_storage import InMemoryStateStorage
+    from agent.misc.similarity_metrics import (
+        cosine_similarity,
+        dot_product_similarity,
+        euclidean_similarity,
+    )
+
+# Resolved on first attribute access (PEP 562) so that importing agent.state
+# does not pull in numpy or the embedding backends.
+_LAZY_EXPORTS = {
+    "InMemoryStateStorage": "agent.misc.in_memory_storage",
+    "ColumnarStateStorage": "agent.misc.columnar_storage",
+    "EmbeddingService": "agent.misc.embedding_service",
+    "DefaultEmbeddingService": "agent.misc.embedding_service",
+    "cosine_similarity": "agent.misc.similarity_metrics",
+    "euclidean_similarity": "agent.misc.similarity_metrics",
+    "dot_product_similarity": "agent.misc.similarity_metrics",
+}
+
 __all__ = [
     # Storage classes
     "BaseStateStorage",
     "InMemoryStateStorage",
+    "ColumnarStateStorage",
     # Embedding services
     "EmbeddingService",
     "DefaultEmbeddingService",
@@ -20,3 +40,16 @@ __all__ = [
     "euclidean_similarity",
     "dot_product_similarity",
 ]
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
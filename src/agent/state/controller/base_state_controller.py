@@ -1,86 +1,171 @@
+import asyncio
+from collections.abc import Iterator
+
 from agent.interaction.input.base_input import BaseInput
 from agent.interaction.output.base_output import BaseOutput
 from agent.interaction.channel.channel import BaseChannel
 from agent.interaction.interaction import Interaction
-from agent.parser import BaseParser, get_parser_for_entity
+from agent.parser import BaseParser, ParserRegistry, get_default_registry
 from agent.parser.entity_context import EntityContext
 from agent.parser.state_diff import StateDiff
 from agent.state.entity.state_entity import BaseStateEntity
 from agent.state import BaseStateStorage
+from agent.state.controller.history_policy import HistoryPolicy, InteractionHistory
 from agent.state.entity.types import FieldDiff
+from agent.state.storage.write_ahead_log import WriteAheadLog
 
 
 class BaseStateController:
     def __init__(
         self,
         storage: BaseStateStorage | None = None,
+        max_parse_concurrency: int = 8,
+        history_policy: HistoryPolicy | None = None,
+        parser_registry: ParserRegistry | None = None,
+        write_ahead_log: WriteAheadLog | None = None,
     ):
         """
         Initialize the state controller.
 
         Args:
             storage: Storage backend to use
+            max_parse_concurrency: Upper bound on parser calls in flight at once
+                                   in parse_state_diffs_async
+            history_policy: Bounds the prior interactions handed to parsers;
+                            None passes the full history
+            parser_registry: Registry resolving parsers for inputs
+                             (defaults to the process-wide registry)
+            write_ahead_log: Log every batch of applied diffs is appended to;
+                             writes made on the storage directly bypass it
         """
+        if max_parse_concurrency < 1:
+            raise ValueError("max_parse_concurrency must be at least 1")
+
         self.storage = storage
+        self.max_parse_concurrency = max_parse_concurrency
+        self.parser_registry = parser_registry or get_default_registry()
+        self.write_ahead_log = write_ahead_log
         self.interactions: list[Interaction] = []
+        # Chat messages rendered once per recorded interaction; prompts slice this log
+        self.rendered_messages: list[dict[str, str]] = []
+        self.history: InteractionHistory | None = (
+            InteractionHistory(history_policy) if history_policy is not None else None
+        )
 
     def is_state_completable(self):
         entities = self.storage.get_all()
         return bool(entities) and all(entity.is_completable() for entity in entities)
 
     def is_state_completed(self):
-        entities = self.storage.get_all()
-        return bool(entities) and all(entity.is_completed() for entity in entities)
+        return self.storage.is_state_completed()
 
     def parse_state_diffs(self, inputs: list[BaseInput]) -> list[StateDiff]:
         all_diffs: list[StateDiff] = []
 
-        for _input in inputs:
-            if not _input.input_value:
-                continue
+        for _input, parser, entity_contexts in self._plan_parse_jobs(inputs):
+            diffs = parser.parse_with_history(
+                _input.input_value,
+                entity_contexts,
+                prior_interactions=self.get_interactions(),
+                prior_messages=self.get_prior_messages()
+            )
+            all_diffs.extend(self._attribute_diffs(diffs, _input))
+
+        return all_diffs
+
+    async def parse_state_diffs_async(self, inputs: list[BaseInput]) -> list[StateDiff]:
+        """
+        Fan out every (input, parser) group concurrently.
 
-            state_entity_classes = list(_input.extracts_to)
-            classes_by_parser: dict[BaseParser, list[type[BaseStateEntity]]] = {}
-            for cls in state_entity_classes:
-                parser = self._get_parser_for_entity_and_channel(cls, _input.channel)
-                if parser is None:
-                    raise ValueError(f"No parser registered for entity class {cls.__name__}")
-                if parser not in classes_by_parser:
-                    classes_by_parser[parser] = []
-                classes_by_parser[parser].append(cls)
-
-            for parser, classes in classes_by_parser.items():
-                entity_contexts = [
-                    EntityContext(
-                        entity_class=cls,
-                        entity_schema=cls.model_json_schema(),
-                        entity_refs=self.storage.get_entity_refs_for_class(cls)
-                    ) for cls in classes
-                ]
-                diffs = parser.parse_state_diff(
+        At most max_parse_concurrency groups are in flight at once; blocking
+        parsers run in worker threads (see BaseParser.parse_state_diff_async).
+        Diffs are merged in the same order parse_state_diffs would produce
+        them, regardless of completion order.
+        """
+        semaphore = asyncio.Semaphore(self.max_parse_concurrency)
+        prior_interactions = list(self.get_interactions())
+        prior_messages = list(self.get_prior_messages())
+
+        async def run_job(
+            _input: BaseInput, parser: BaseParser, entity_contexts: list[EntityContext]
+        ) -> list[StateDiff]:
+            async with semaphore:
+                diffs = await parser.parse_state_diff_async(
                     _input.input_value,
                     entity_contexts,
-                    prior_interactions=self.get_interactions()
+                    prior_interactions=prior_interactions,
+                    prior_messages=prior_messages
                 )
-                for diff in diffs:
-                    diff.actor = _input.actor
-                all_diffs.extend(diffs)
+            return self._attribute_diffs(diffs, _input)
 
-        return all_diffs
+        results = await asyncio.gather(
+            *(run_job(*job) for job in self._plan_parse_jobs(inputs))
+        )
+        return [diff for diffs in results for diff in diffs]
+
+    def _plan_parse_jobs(
+        self, inputs: list[BaseInput]
+    ) -> list[tuple[BaseInput, BaseParser, list[EntityContext]]]:
+        jobs: list[tuple[BaseInput, BaseParser, list[EntityContext]]] = []
+
+        for _input in inputs:
+            if not _input.input_value:
+                continue
+
+            plan = self.parser_registry.get_extraction_plan(type(_input), _input.channel.channel_domain)
+            for group in plan.groups:
+                entity_contexts = [self._with_entity_refs(ctx) for ctx in group.entity_contexts]
+                jobs.append((_input, group.parser, entity_contexts))
+
+        return jobs
+
+    def _with_entity_refs(self, entity_context: EntityContext) -> EntityContext:
+        entity_refs = self.storage.get_entity_refs_for_class(entity_context.entity_class)
+        if entity_refs is None:
+            return entity_context
+        return EntityContext(
+            entity_class=entity_context.entity_class,
+            entity_schema=entity_context.entity_schema,
+            entity_refs=entity_refs,
+        )
+
+    @staticmethod
+    def _attribute_diffs(diffs: list[StateDiff], _input: BaseInput) -> list[StateDiff]:
+        for diff in diffs:
+            diff.actor = _input.actor
+        return diffs
 
     def record_input(self, input_obj: BaseInput):
-        self.interactions.append(input_obj)
+        self._record_interaction(input_obj)
 
     def record_outputs(self, outputs: list[BaseOutput]):
-        self.interactions.extend(outputs)
+        for output in outputs:
+            self._record_interaction(output)
+
+    def _record_interaction(self, interaction: Interaction) -> None:
+        message = interaction.to_llm_message()
+        self.interactions.append(interaction)
+        if message is not None:
+            self.rendered_messages.append(message)
+        if self.history is not None:
+            self.history.append(interaction, message)
 
     def get_interactions(self) -> list[Interaction]:
+        """Interactions handed to parsers as context, trimmed by the history policy if set."""
+        if self.history is not None:
+            return self.history.interactions()
         return self.interactions
 
+    def get_prior_messages(self) -> list[dict[str, str]]:
+        """Rendered counterpart of get_interactions, built without re-serializing anything."""
+        if self.history is not None:
+            return self.history.messages()
+        return self.rendered_messages
+
     def _get_parser_for_entity_and_channel(
         self, entity_cls: type[BaseStateEntity], channel: BaseChannel
     ) -> BaseParser | None:
-        return get_parser_for_entity(entity_cls, channel.channel_domain)
+        return self.parser_registry.get_parser(entity_cls, channel.channel_domain)
 
     @staticmethod
     def _entities_to_diffs(entities: list[BaseStateEntity]) -> list[StateDiff]:
@@ -106,4 +191,55 @@ class BaseStateController:
             List of StateDiff objects representing changes made
         """
         all_diffs: list[StateDiff] = self.parse_state_diffs(inputs)
-        return self.storage.apply_state_diffs(all_diffs)
+        return self._apply_state_diffs(all_diffs)
+
+    def _apply_state_diffs(self, state_diffs: list[StateDiff]) -> list[StateDiff]:
+        version = self.storage.get_current_version()
+        applied = self.storage.apply_state_diffs(state_diffs)
+        # Applies that change nothing may still bump the version; they are logged
+        # too, so replay reproduces the storage's version numbering
+        if self.write_ahead_log is not None and (applied or self.storage.get_current_version() != version):
+            embeddings = {}
+            for state_diff in applied:
+                if state_diff.entity_ref is not None:
+                    embedding = self.storage.get_embedding(state_diff.entity_ref)
+                    if embedding is not None:
+                        embeddings[state_diff.entity_ref] = embedding.tolist()
+            self.write_ahead_log.append(applied, self.storage.get_current_version(), embeddings=embeddings)
+        return applied
+
+    def update_state_streaming(self, inputs: list[BaseInput]) -> Iterator[StateDiff]:
+        """
+        Apply each diff to storage as soon as its parser produces it.
+
+        Consumers can react to the first changes (logging, output generation)
+        while later diffs are still being generated. Parsers without
+        incremental output deliver their whole result at once.
+
+        Args:
+            inputs: inputs to process
+
+        Yields:
+            Applied StateDiff objects, in the order they were stored
+        """
+        for _input, parser, entity_contexts in self._plan_parse_jobs(inputs):
+            for diff in parser.stream_state_diff(
+                _input.input_value,
+                entity_contexts,
+                prior_interactions=self.get_interactions(),
+                prior_messages=self.get_prior_messages()
+            ):
+                yield from self._apply_state_diffs(self._attribute_diffs([diff], _input))
+
+    async def update_state_async(self, inputs: list[BaseInput]) -> list[StateDiff]:
+        """
+        Async counterpart of update_state: parses concurrently, applies once.
+
+        Args:
+            inputs: inputs to process
+
+        Returns:
+            List of StateDiff objects representing changes made
+        """
+        all_diffs: list[StateDiff] = await self.parse_state_diffs_async(inputs)
+        return self._apply_state_diffs(all_diffs)
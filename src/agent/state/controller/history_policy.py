@@ -0,0 +1,117 @@
+"""Bounded views over a controller's interaction history."""
+
+from collections import deque
+from collections.abc import Callable
+
+from agent.interaction.interaction import Interaction
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap tokenizer-free estimate (~4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+class HistoryPolicy:
+    """
+    Limits on how much interaction history is handed to parsers.
+
+    The first pin_first interactions are always kept (they usually carry the
+    opening request). After them, the newest interactions are kept while
+    max_turns and max_tokens allow it. The last pin_last interactions are
+    never dropped, even when they alone exceed the budget.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int | None = None,
+        max_turns: int | None = None,
+        pin_first: int = 0,
+        pin_last: int = 0,
+        token_counter: Callable[[str], int] | None = None,
+    ):
+        """
+        Args:
+            max_tokens: Token budget of the whole window, None for unbounded
+            max_turns: Interaction count of the whole window, None for unbounded
+            pin_first: Number of oldest interactions that are never evicted
+            pin_last: Number of newest interactions that are never evicted
+            token_counter: Maps message text to a token count
+                           (defaults to estimate_tokens)
+        """
+        if pin_first < 0 or pin_last < 0:
+            raise ValueError("pin_first and pin_last must be non-negative")
+        if max_tokens is not None and max_tokens < 0:
+            raise ValueError("max_tokens must be non-negative")
+        if max_turns is not None and max_turns < 0:
+            raise ValueError("max_turns must be non-negative")
+
+        self.max_tokens = max_tokens
+        self.max_turns = max_turns
+        self.pin_first = pin_first
+        self.pin_last = pin_last
+        self.token_counter = token_counter or estimate_tokens
+
+
+class InteractionHistory:
+    """
+    Sliding window over recorded interactions governed by a HistoryPolicy.
+
+    Each entry keeps the interaction together with its rendered chat message.
+    Every interaction is counted once when appended and evicted at most once,
+    so keeping the window within budget costs O(1) amortized per append.
+    """
+
+    def __init__(self, policy: HistoryPolicy):
+        self.policy = policy
+        self._pinned: list[tuple[Interaction, dict[str, str] | None]] = []
+        self._pinned_tokens = 0
+        self._window: deque[tuple[Interaction, dict[str, str] | None, int]] = deque()
+        self._window_tokens = 0
+
+    @property
+    def token_count(self) -> int:
+        return self._pinned_tokens + self._window_tokens
+
+    def __len__(self) -> int:
+        return len(self._pinned) + len(self._window)
+
+    def append(self, interaction: Interaction, message: dict[str, str] | None = None) -> None:
+        """
+        Args:
+            interaction: Recorded interaction
+            message: Pre-rendered chat message; rendered here when omitted
+        """
+        if message is None:
+            message = interaction.to_llm_message()
+        tokens = self.policy.token_counter(message["content"]) if message is not None else 0
+
+        if len(self._pinned) < self.policy.pin_first:
+            self._pinned.append((interaction, message))
+            self._pinned_tokens += tokens
+            return
+
+        self._window.append((interaction, message, tokens))
+        self._window_tokens += tokens
+        self._trim()
+
+    def interactions(self) -> list[Interaction]:
+        return [interaction for interaction, _ in self._pinned] + [
+            interaction for interaction, _, _ in self._window
+        ]
+
+    def messages(self) -> list[dict[str, str]]:
+        return [message for _, message in self._pinned if message is not None] + [
+            message for _, message, _ in self._window if message is not None
+        ]
+
+    def _trim(self) -> None:
+        while len(self._window) > self.policy.pin_last and self._over_budget():
+            _, _, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+
+    def _over_budget(self) -> bool:
+        if self.policy.max_turns is not None and len(self) > self.policy.max_turns:
+            return True
+        if self.policy.max_tokens is not None and self.token_count > self.policy.max_tokens:
+            return True
+        return False
@@ -4,8 +4,9 @@ import re
 from datetime import datetime, timezone
 from enum import Enum
 from types import UnionType
+from functools import lru_cache
 from typing import Any, ClassVar, get_origin, get_args, Union, TYPE_CHECKING
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, ValidationError
 from pydantic.fields import FieldInfo
 
 from agent.state.entity.actor.base_actor import BaseActor
@@ -25,58 +26,228 @@ class EntityMergeValidationError(Exception):
     pass
 
 
+_LIST_ACCESS = re.compile(r'(\w+)\[(\d+)\]')
+# Bounds the per-class path cache when diffs address many distinct list indices
+_MAX_CACHED_PATHS = 1024
+
+PathStep = tuple[str, int | None]
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    origin = get_origin(annotation)
+    if origin is Union or origin is UnionType:
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        return args[0] if args else annotation
+    return annotation
+
+
+def _is_entity_class(annotation: Any) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, BaseStateEntity)
+
+
+def _list_item_types(annotation: Any) -> list[Any]:
+    """Item types of a list annotation, with unions flattened and None dropped; empty if unparameterized."""
+    item_types: list[Any] = []
+    for arg in get_args(annotation):
+        origin = get_origin(arg)
+        members = get_args(arg) if origin is Union or origin is UnionType else (arg,)
+        item_types.extend(member for member in members if member is not type(None))
+    return item_types
+
+
+def _excludes_entities(annotation: Any) -> bool:
+    """True for a plain class whose instances can never be entities (str, a non-entity model, ...)."""
+    return (
+        isinstance(annotation, type) and annotation is not Any
+        and not _is_entity_class(annotation) and not issubclass(BaseStateEntity, annotation)
+    )
+
+
+@lru_cache(maxsize=None)
+def _field_base_type(model_class: type[BaseModel], field_name: str) -> type:
+    """Type instantiated when a nested path runs through a field that is still None."""
+    return _unwrap_optional(model_class.model_fields[field_name].annotation)
+
+
+@lru_cache(maxsize=4096)
+def _path_adapter(entity_class: type[BaseModel], path: str) -> TypeAdapter:
+    """Validator for the value a diff path assigns, built from the annotations along the path."""
+    model_class: Any = entity_class
+    annotation: Any = None
+    for field_name, idx in BaseStateEntity._parse_path(path):
+        if not (isinstance(model_class, type) and issubclass(model_class, BaseModel)) \
+                or field_name not in model_class.model_fields:
+            raise ValueError(f"{entity_class.__name__} has no field {path!r}")
+        annotation = model_class.model_fields[field_name].annotation
+        if idx is not None:
+            item_types = get_args(_unwrap_optional(annotation))
+            annotation = item_types[0] if item_types else Any
+        model_class = _unwrap_optional(annotation)
+    return TypeAdapter(annotation)
+
+
+class _FieldTable:
+    """Field introspection of one entity class, computed once when the class is created."""
+
+    __slots__ = ("domain_fields", "nullable", "domain_nullable", "entity_fields", "entity_list_fields",
+                 "dynamic_fields", "nested_fields")
+
+    def __init__(self, model_fields: dict[str, FieldInfo], metadata_fields: frozenset[str]):
+        self.domain_fields: dict[str, FieldInfo] = {
+            name: info for name, info in model_fields.items() if name not in metadata_fields
+        }
+        nullable: set[str] = set()
+        entity_fields: list[str] = []
+        entity_list_fields: list[str] = []
+        dynamic_fields: list[str] = []
+
+        for name, info in model_fields.items():
+            annotation = info.annotation
+            origin = get_origin(annotation)
+            if (origin is Union or origin is UnionType) and type(None) in get_args(annotation):
+                nullable.add(name)
+            if name in metadata_fields:
+                continue
+
+            base = _unwrap_optional(annotation)
+            base_origin = get_origin(base)
+            if _is_entity_class(base):
+                entity_fields.append(name)
+            elif base is list or base_origin is list:
+                item_types = _list_item_types(base)
+                if item_types and all(_is_entity_class(t) for t in item_types):
+                    entity_list_fields.append(name)
+                elif not item_types or not all(_excludes_entities(t) for t in item_types):
+                    # list, list[Any], list[A | int], ...: items may be entities, checked by value
+                    dynamic_fields.append(name)
+            elif base is Any or base is object or base_origin is Union or base_origin is UnionType:
+                # Could hold an entity at runtime; checked by value like before
+                dynamic_fields.append(name)
+
+        self.nullable: frozenset[str] = frozenset(nullable)
+        self.domain_nullable: tuple[str, ...] = tuple(n for n in self.domain_fields if n in nullable)
+        self.entity_fields: tuple[str, ...] = tuple(entity_fields)
+        self.entity_list_fields: tuple[str, ...] = tuple(entity_list_fields)
+        self.dynamic_fields: tuple[str, ...] = tuple(dynamic_fields)
+        self.nested_fields: frozenset[str] = frozenset(entity_fields + entity_list_fields + dynamic_fields)
+
+
+class _CompletionState:
+    """
+    Completion bookkeeping of one entity's own (non-nested) values.
+
+    empty holds the nullable domain fields currently None, the values still
+    to be collected; it is updated on every field assignment. Fields with a
+    non-None default count as collected even if they were never set.
+    """
+
+    __slots__ = ("empty",)
+
+    def __init__(self, empty: set[str]):
+        self.empty = empty
+
+
 class BaseStateEntity(BaseModel):
     _metadata_fields: ClassVar[frozenset[str]] = frozenset()
+    _field_table: ClassVar[_FieldTable]
+    _path_cache: ClassVar[dict[str, tuple[PathStep, ...]]]
 
     date_created_utc: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), exclude=True)
     embedding: list[float] | None = Field(default=None, exclude=True)
     actors: list[BaseActor] = Field(default_factory=list, exclude=True)
 
-    def __init_subclass__(cls, **kwargs: Any) -> None:
-        super().__init_subclass__(**kwargs)
+    # Built on the first completion query, then maintained by __setattr__
+    _completion: _CompletionState | None = PrivateAttr(default=None)
+
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs: Any) -> None:
+        # Unlike __init_subclass__, runs once model_fields include the class's own fields
+        super().__pydantic_init_subclass__(**kwargs)
         cls._metadata_fields = frozenset(
             name for name, info in cls.model_fields.items()
             if info.exclude
         )
+        cls._field_table = _FieldTable(cls.model_fields, cls._metadata_fields)
+        cls._path_cache = {}
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        state = self._completion
+        if state is not None and name in self._field_table.domain_fields:
+            if value is None and name in self._field_table.nullable:
+                state.empty.add(name)
+            else:
+                state.empty.discard(name)
+
+    def __copy__(self) -> 'BaseStateEntity':
+        copied = super().__copy__()
+        copied._completion = None
+        return copied
+
+    def model_copy(self, *, update: dict[str, Any] | None = None, deep: bool = False) -> 'BaseStateEntity':
+        copied = super().model_copy(update=update, deep=deep)
+        # update bypasses __setattr__, so the copy recomputes its bookkeeping
+        copied._completion = None
+        return copied
+
+    def _completion_state(self) -> _CompletionState:
+        state = self._completion
+        if state is None:
+            table = self._field_table
+            state = self._completion = _CompletionState({
+                field_name for field_name in table.domain_nullable if getattr(self, field_name) is None
+            })
+        return state
 
     def is_completable(self) -> bool:
         return True
 
     def is_completed(self) -> bool:
-        for field_name in self.model_fields:
-            if field_name in self._metadata_fields:
-                continue
-            value = getattr(self, field_name)
+        if self._completion_state().empty:
+            return False
 
-            if self._is_nullable_field(field_name) and value is None:
+        table = self._field_table
+        for field_name in table.entity_fields:
+            value = getattr(self, field_name)
+            if value is not None and not value.is_completed():
                 return False
 
-            if isinstance(value, BaseStateEntity):
-                if not value.is_completed():
+        for field_name in table.entity_list_fields:
+            for item in getattr(self, field_name) or ():
+                if isinstance(item, BaseStateEntity) and not item.is_completed():
                     return False
 
-            elif isinstance(value, list):
-                for item in value:
-                    if isinstance(item, BaseStateEntity) and not item.is_completed():
-                        return False
+        for field_name in table.dynamic_fields:
+            if not self._is_value_completed(getattr(self, field_name)):
+                return False
+
+        return True
 
+    @staticmethod
+    def _is_value_completed(value: Any) -> bool:
+        if isinstance(value, BaseStateEntity):
+            return value.is_completed()
+        if isinstance(value, list):
+            return all(item.is_completed() for item in value if isinstance(item, BaseStateEntity))
         return True
 
+    def get_missing_fields(self) -> list[str]:
+        """Domain fields is_completed waits for: nullable ones still None, or ones holding an incomplete entity."""
+        empty = self._completion_state().empty
+        nested_fields = self._field_table.nested_fields
+        return [
+            field_name for field_name in self._field_table.domain_fields
+            if field_name in empty
+            or (field_name in nested_fields and not self._is_value_completed(getattr(self, field_name)))
+        ]
+
     @classmethod
     def _is_nullable_field(cls, field_name: str) -> bool:
-        field_info = cls.model_fields[field_name]
-        annotation = field_info.annotation
-        origin = get_origin(annotation)
-        if origin is Union or origin is UnionType:
-            return type(None) in get_args(annotation)
-        return False
+        return field_name in cls._field_table.nullable
 
     @classmethod
     def get_domain_fields(cls) -> dict[str, FieldInfo]:
-        return {
-            name: info for name, info in cls.model_fields.items()
-            if name not in cls._metadata_fields
-        }
+        return dict(cls._field_table.domain_fields)
 
     def domain_dump(self, **kwargs: Any) -> dict[str, Any]:
         return self.model_dump(exclude=self._metadata_fields, **kwargs)
@@ -97,48 +268,83 @@ class BaseStateEntity(BaseModel):
         return schema
 
     def update_fields(self, diffs: list[FieldDiff]) -> 'BaseStateEntity':
+        """
+        Apply field diffs in order, coercing each value to its field type.
+
+        Raises:
+            ValueError: A path does not exist on this entity or a value does not validate
+        """
         for diff in diffs:
-            self._set_nested_field(diff.field_name, diff.new_value)
+            self._set_path(self._compile_path(diff.field_name), self._coerce(diff.field_name, diff.new_value))
         return self
 
+    @classmethod
+    def _coerce(cls, path: str, value: Any) -> Any:
+        return _path_adapter(cls, path).validate_python(value)
+
+    @classmethod
+    def _coerce_diffs(cls, diffs: list[FieldDiff]) -> tuple[list[tuple[FieldDiff, Any]], list[str]]:
+        """Validate every diff value against its field; returns the coerced diffs and the errors of the rest."""
+        coerced: list[tuple[FieldDiff, Any]] = []
+        errors: list[str] = []
+        for diff in diffs:
+            try:
+                coerced.append((diff, cls._coerce(diff.field_name, diff.new_value)))
+            except ValidationError as exc:
+                errors.append(f"{cls.__name__}.{diff.field_name}: {exc.errors()[0]['msg']}")
+            except ValueError as exc:
+                errors.append(str(exc))
+        return coerced, errors
+
     def _set_nested_field(self, path: str, value: Any) -> None:
-        parts = path.split('.')
+        self._set_path(self._compile_path(path), value)
+
+    def _set_path(self, steps: tuple[PathStep, ...], value: Any) -> None:
         obj = self
 
-        for part in parts[:-1]:
-            if '[' in part:
-                field_name, idx = self._parse_list_access(part)
+        for field_name, idx in steps[:-1]:
+            if idx is not None:
                 obj = getattr(obj, field_name)[idx]
             else:
-                nested = getattr(obj, part)
+                nested = getattr(obj, field_name)
                 if nested is None:
-                    field_info = obj.model_fields[part]
-                    nested_type = self._get_base_type(field_info.annotation)
-                    nested = nested_type()
-                    setattr(obj, part, nested)
+                    nested = _field_base_type(type(obj), field_name)()
+                    setattr(obj, field_name, nested)
                 obj = nested
 
-        final_field = parts[-1]
-        if '[' in final_field:
-            field_name, idx = self._parse_list_access(final_field)
+        field_name, idx = steps[-1]
+        if idx is not None:
             getattr(obj, field_name)[idx] = value
         else:
-            setattr(obj, final_field, value)
+            setattr(obj, field_name, value)
+
+    @classmethod
+    def _compile_path(cls, path: str) -> tuple[PathStep, ...]:
+        """Split a diff path like "crew[1].name" into (field, list index) steps, cached per class."""
+        steps = cls._path_cache.get(path)
+        if steps is None:
+            steps = cls._parse_path(path)
+            if len(cls._path_cache) < _MAX_CACHED_PATHS:
+                cls._path_cache[path] = steps
+        return steps
+
+    @classmethod
+    def _parse_path(cls, path: str) -> tuple[PathStep, ...]:
+        return tuple(
+            cls._parse_list_access(part) if '[' in part else (part, None)
+            for part in path.split('.')
+        )
 
     @staticmethod
     def _parse_list_access(part: str) -> tuple[str, int]:
-        match = re.match(r'(\w+)\[(\d+)\]', part)
+        match = _LIST_ACCESS.match(part)
         if not match:
             raise ValueError(f"Invalid list access syntax: {part}")
         return match.group(1), int(match.group(2))
 
     @classmethod
     def _get_base_type(cls, annotation: Any) -> type:
-        origin = get_origin(annotation)
-        if origin is Union or origin is UnionType:
-            args = [a for a in get_args(annotation) if a is not type(None)]
-            return args[0] if args else annotation
-        return annotation
+        return _unwrap_optional(annotation)
 
     def _add_actor(self, actor: BaseActor | None) -> None:
         if actor is None:
@@ -152,11 +358,32 @@ class BaseStateEntity(BaseModel):
         current: 'BaseStateEntity' | None,
         state_diff: StateDiff,
         on_validation_error: ValidationErrorHandlingMode = ValidationErrorHandlingMode.skip_merge
-    ) -> tuple['BaseStateEntity', StateDiff]:
+    ) -> tuple['BaseStateEntity' | None, StateDiff]:
+        """
+        Apply all field diffs of state_diff to current, or to a new entity, in one step.
+
+        Values are coerced to their field types; a new entity is validated in a
+        single pass. Values that do not validate are reported in
+        validation_errors alongside the errors of validate_before_merge and
+        handled according to on_validation_error (ignore applies the diffs that
+        did validate).
+
+        Returns:
+            The merged entity (current unchanged, or None when no entity could be
+            created, if the merge is skipped) and the diff that was actually applied
+        """
         validation_errors = current.validate_before_merge(state_diff) if current else []
+        if current is None:
+            entity, accepted, coercion_errors = cls._validate_new(state_diff.diffs)
+            coerced: list[tuple[FieldDiff, Any]] = []
+        else:
+            entity = current
+            coerced, coercion_errors = cls._coerce_diffs(state_diff.diffs)
+            accepted = [diff for diff, _ in coerced]
 
-        if validation_errors:
-            diff_with_errors = state_diff.model_copy(update={"validation_errors": validation_errors})
+        applied_diff = state_diff
+        if validation_errors or coercion_errors:
+            validation_errors = [*validation_errors, *coercion_errors]
             match on_validation_error:
                 case ValidationErrorHandlingMode.raise_exception:
                     raise EntityMergeValidationError(
@@ -164,17 +391,68 @@ class BaseStateEntity(BaseModel):
                         f"due to validation errors: {validation_errors}"
                     )
                 case ValidationErrorHandlingMode.skip_merge:
-                    return current, diff_with_errors.model_copy(update={"diffs": []})
+                    return current, state_diff.model_copy(
+                        update={"validation_errors": validation_errors, "diffs": []}
+                    )
+            applied_diff = state_diff.model_copy(
+                update={"validation_errors": validation_errors, "diffs": accepted}
+            )
+            if entity is None:
+                return None, applied_diff
 
-        if current:
-            current.update_fields(state_diff.diffs)
-            current._add_actor(state_diff.actor)
-            return current, state_diff
+        for diff, value in coerced:
+            entity._set_path(cls._compile_path(diff.field_name), value)
+        entity._add_actor(state_diff.actor)
+        return entity, applied_diff
 
-        new_entity = cls()
-        new_entity.update_fields(state_diff.diffs)
-        new_entity._add_actor(state_diff.actor)
-        return new_entity, state_diff
+    @classmethod
+    def _validate_new(
+        cls, diffs: list[FieldDiff]
+    ) -> tuple['BaseStateEntity' | None, list[FieldDiff], list[str]]:
+        """
+        Build a new entity from diffs, validating top-level values with one model_validate.
+
+        Returns:
+            The entity (None if even the valid values do not make one), the
+            diffs it reflects and the validation errors of the rest
+        """
+        top_level: dict[str, Any] = {}
+        top_level_diffs: dict[str, FieldDiff] = {}
+        nested: list[FieldDiff] = []
+        for diff in diffs:
+            # Paths into nested values, and anything after them, are applied in order afterwards
+            if not nested and diff.field_name in cls.model_fields:
+                top_level[diff.field_name] = diff.new_value
+                top_level_diffs[diff.field_name] = diff
+            else:
+                nested.append(diff)
+
+        coerced, errors = cls._coerce_diffs(nested)
+        try:
+            entity: BaseStateEntity | None = cls.model_validate(top_level)
+        except ValidationError as exc:
+            failed: set[str] = set()
+            for error in exc.errors():
+                field_name = str(error["loc"][0]) if error["loc"] else ""
+                failed.add(field_name)
+                errors.append(f"{cls.__name__}.{field_name}: {error['msg']}")
+            top_level_diffs = {k: v for k, v in top_level_diffs.items() if k not in failed}
+            try:
+                entity = cls.model_validate({k: v for k, v in top_level.items() if k not in failed})
+            except ValidationError:
+                entity = None
+
+        if entity is None:
+            return None, [], errors
+
+        for diff, value in coerced:
+            entity._set_path(cls._compile_path(diff.field_name), value)
+        applied = set(map(id, top_level_diffs.values())) | {id(diff) for diff, _ in coerced}
+        return entity, [diff for diff in diffs if id(diff) in applied], errors
 
     def validate_before_merge(self, state_diff: StateDiff) -> list[str]:
         return []
+
+
+# Pydantic only runs __pydantic_init_subclass__ for subclasses
+BaseStateEntity.__pydantic_init_subclass__()
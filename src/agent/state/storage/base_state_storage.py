@@ -1,12 +1,15 @@
 """Abstract base class for state storage implementations."""
 from __future__ import annotations
 
+import os
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING
 
 from agent.state.entity.state_entity import BaseStateEntity
 
 if TYPE_CHECKING:
+    import numpy as np
+
     from agent.parser.state_diff import StateDiff
 
 
@@ -32,6 +35,28 @@ class BaseStateStorage(ABC):
         """
         pass
 
+    def replay_state_diffs(
+        self, state_diffs: list[StateDiff], embeddings: dict[str, list[float]] | None = None
+    ) -> list[StateDiff]:
+        """
+        Apply diffs read back from a write-ahead log.
+
+        Storages that assign entity IDs or embed entities override this to
+        reuse the logged entity_ref and embedding instead of creating new ones.
+
+        Args:
+            state_diffs: Diffs as apply_state_diffs returned them when they were logged
+            embeddings: Logged embedding per entity_ref
+
+        Returns:
+            List of applied StateDiff objects
+        """
+        return self.apply_state_diffs(state_diffs)
+
+    def get_embedding(self, entity_ref: str) -> np.ndarray | None:
+        """Stored embedding of an entity, for storages that keep one."""
+        return None
+
     def get_current_version(self) -> int:
         return self.version
 
@@ -40,19 +65,70 @@ class BaseStateStorage(ABC):
         return self.version
 
     @abstractmethod
-    def get_all(self, chronological: bool = True) -> list[BaseStateEntity]:
+    def get_all(self, chronological: bool = True, as_of_version: int | None = None) -> list[BaseStateEntity]:
         """
         Get all stored entities.
 
         Args:
             chronological: If True, return entities in chronological order (oldest first)
                           If False, no specific order guaranteed
+            as_of_version: Return the entities as they were right after this
+                           version was applied; None for the current state
 
         Returns:
             List of all entities
         """
         pass
 
+    def snapshot(self) -> StateSnapshot:
+        """
+        Handle on the current state that stays readable as the storage changes.
+
+        Creating one is O(1): it only records the current version, history
+        is shared with the storage.
+        """
+        return StateSnapshot(self, self.get_current_version())
+
+    def diff_versions(self, from_version: int, to_version: int) -> list[StateDiff]:
+        """
+        State diffs that turn the state at from_version into the state at to_version.
+
+        Args:
+            from_version: Older version
+            to_version: Newer version
+
+        Returns:
+            One StateDiff per changed entity, with entity_ref identifying it
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not keep version history")
+
+    def save_snapshot(self, path: str | os.PathLike, row_format: str | None = None) -> None:
+        """
+        Write the storage as a binary snapshot (see agent.state.storage.snapshot).
+
+        Args:
+            path: Snapshot directory
+            row_format: "msgpack" or "jsonl"; defaults to msgpack when it is installed
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support snapshots")
+
+    def get_incomplete_entities(self) -> list[BaseStateEntity]:
+        """
+        Entities that are not completed yet, in get_all order.
+
+        This default scans every entity; storages that track completion as
+        diffs are applied override it with an index lookup.
+
+        Returns:
+            List of incomplete entities
+        """
+        return [entity for entity in self.get_all() if not entity.is_completed()]
+
+    def is_state_completed(self) -> bool:
+        """True once at least one entity is stored and none is incomplete."""
+        entities = self.get_all()
+        return bool(entities) and all(entity.is_completed() for entity in entities)
+
     @abstractmethod
     def to_json(self) -> str:
         """
@@ -78,3 +154,18 @@ class BaseStateStorage(ABC):
             Reconstructed StateStorage instance
         """
         pass
+
+
+class StateSnapshot:
+    """A storage as of one version."""
+
+    def __init__(self, storage: BaseStateStorage, version: int):
+        self.storage = storage
+        self.version = version
+
+    def get_all(self, chronological: bool = True) -> list[BaseStateEntity]:
+        return self.storage.get_all(chronological, as_of_version=self.version)
+
+    def diff(self, newer: StateSnapshot) -> list[StateDiff]:
+        """Changes between this snapshot and a newer one of the same storage."""
+        return self.storage.diff_versions(self.version, newer.version)
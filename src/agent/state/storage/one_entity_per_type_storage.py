@@ -1,13 +1,12 @@
-import importlib
 import json
+import os
 
 from agent.state.entity.state_entity import BaseStateEntity
 from agent.state import BaseStateStorage
 from agent.parser.state_diff import StateDiff
-
-
-def _get_qualified_name(cls: type) -> str:
-    return f"{cls.__module__}.{cls.__qualname__}"
+from agent.state.entity.types import FieldDiff
+from agent.state.storage.snapshot import SnapshotReader, SnapshotWriter, qualified_name, resolve_class
+from agent.state.storage.version_history import VersionHistory
 
 
 class OneEntityPerTypeStorage(BaseStateStorage):
@@ -16,11 +15,16 @@ class OneEntityPerTypeStorage(BaseStateStorage):
         super().__init__()
         self.store: dict[type[BaseStateEntity], BaseStateEntity | None] = {}
         self._entity_class_name_to_type: dict[str, type[BaseStateEntity]] = {}
+        # Classes whose stored entity is not completed; kept current by apply_state_diffs
+        self._incomplete_classes: set[type[BaseStateEntity]] = set()
+        # Fields changed by every version, keyed by entity class name
+        self.history = VersionHistory()
 
         for entity_class in entity_classes:
             if entity_class.__name__ in self._entity_class_name_to_type and self._entity_class_name_to_type[entity_class.__name__] != entity_class:
                 raise ValueError(f"{entity_class} collides with {self._entity_class_name_to_type[entity_class.__name__]}")
             self._entity_class_name_to_type[entity_class.__name__] = entity_class
+        self._class_order = {cls: i for i, cls in enumerate(self._entity_class_name_to_type.values())}
 
     def apply_state_diffs(self, state_diffs: list[StateDiff]) -> list[StateDiff]:
         applied_diffs: list[StateDiff] = []
@@ -30,32 +34,63 @@ class OneEntityPerTypeStorage(BaseStateStorage):
             entity_class: type[BaseStateEntity] = state_diff.entity_class
             if not entity_class:
                 continue
-            self.store[entity_class], applied_diff = entity_class.merge(
+            entity, applied_diff = entity_class.merge(
                 self.store.get(entity_class),
                 state_diff
             )
+            if entity is not None:
+                self.store[entity_class] = entity
+                self._track_completion(entity_class)
 
             if applied_diff and applied_diff.diffs:
                 applied_diffs.append(applied_diff)
-                self.increment_version()
+                self.history.record(
+                    entity_class.__name__, entity_class, self.increment_version(),
+                    applied_diff.diffs, applied_diff.actor, entity.date_created_utc if entity is not None else None
+                )
 
         return applied_diffs
 
-    def get_all(self, chronological: bool = True) -> list[BaseStateEntity]:
+    def _track_completion(self, entity_class: type[BaseStateEntity]) -> None:
+        entity = self.store.get(entity_class)
+        if entity is not None and not entity.is_completed():
+            self._incomplete_classes.add(entity_class)
+        else:
+            self._incomplete_classes.discard(entity_class)
+
+    def get_incomplete_entities(self) -> list[BaseStateEntity]:
+        return [
+            self.store[entity_class]
+            for entity_class in sorted(self._incomplete_classes, key=lambda c: self._class_order.get(c, len(self._class_order)))
+        ]
+
+    def is_state_completed(self) -> bool:
+        return bool(self.store) and not self._incomplete_classes
+
+    def get_all(self, chronological: bool = True, as_of_version: int | None = None) -> list[BaseStateEntity]:
+        if as_of_version is not None and as_of_version < self.version:
+            entities = self.history.entities_at(as_of_version)
+            return [
+                entities[name] for name in self._entity_class_name_to_type
+                if name in entities
+            ]
         return [
             self.store[entity_class] for entity_class in self._entity_class_name_to_type.values()
             if entity_class in self.store
         ]
 
+    def diff_versions(self, from_version: int, to_version: int) -> list[StateDiff]:
+        return self.history.diff(from_version, to_version)
+
     def to_json(self) -> str:
         data = {
             "version": self.version,
             "entity_classes": [
-                _get_qualified_name(entity_class)
+                qualified_name(entity_class)
                 for entity_class in self._entity_class_name_to_type.values()
             ],
             "entities": {
-                _get_qualified_name(entity_class): self.store.get(entity_class).model_dump(mode='json') if self.store.get(entity_class) else None
+                qualified_name(entity_class): self.store.get(entity_class).model_dump(mode='json') if self.store.get(entity_class) else None
                 for entity_class in self._entity_class_name_to_type.values()
             }
         }
@@ -65,22 +100,53 @@ class OneEntityPerTypeStorage(BaseStateStorage):
     def from_json(cls, data: str) -> 'OneEntityPerTypeStorage':
         parsed = json.loads(data)
 
-        entity_classes = []
-        for qualified_name in parsed.get("entity_classes", []):
-            module_path, class_name = qualified_name.rsplit(".", 1)
-            module = importlib.import_module(module_path)
-            entity_classes.append(getattr(module, class_name))
-
-        storage = cls(entity_classes)
+        storage = cls([resolve_class(name) for name in parsed.get("entity_classes", [])])
         storage.version = parsed.get("version", 0)
 
-        for qualified_name, entity_data in parsed.get("entities", {}).items():
+        for name, entity_data in parsed.get("entities", {}).items():
             if entity_data is None:
                 continue
-            module_path, class_name = qualified_name.rsplit(".", 1)
-            entity_class = storage._entity_class_name_to_type.get(class_name)
+            entity_class = storage._entity_class_name_to_type.get(name.rsplit(".", 1)[1])
             if entity_class:
-                storage.store[entity_class] = entity_class.model_validate(entity_data)
+                storage._restore(entity_class.model_validate(entity_data))
+
+        return storage
 
+    def _restore(self, entity: BaseStateEntity) -> None:
+        entity_class = type(entity)
+        self.store[entity_class] = entity
+        self._track_completion(entity_class)
+        # History starts at the restored version
+        self.history.record(entity_class.__name__, entity_class, self.version, [
+            FieldDiff(field_name=k, new_value=v)
+            for k, v in entity.domain_dump(mode='json', exclude_unset=True).items()
+        ], date_created_utc=entity.date_created_utc)
+
+    def save_snapshot(self, path: str | os.PathLike, row_format: str | None = None) -> None:
+        """
+        Write the storage as a binary snapshot (see SnapshotWriter).
+
+        Args:
+            path: Snapshot directory
+            row_format: "msgpack" or "jsonl"; defaults to msgpack when it is installed
+        """
+        metadata = {
+            "version": self.version,
+            "entity_classes": [qualified_name(c) for c in self._entity_class_name_to_type.values()],
+        }
+        with SnapshotWriter(path, row_format, metadata) as writer:
+            for entity_class in self._entity_class_name_to_type.values():
+                entity = self.store.get(entity_class)
+                if entity is not None:
+                    writer.write(entity, entity_class.__name__, self.version)
+
+    @classmethod
+    def load_snapshot(cls, path: str | os.PathLike) -> 'OneEntityPerTypeStorage':
+        """Rebuild a storage from save_snapshot output."""
+        reader = SnapshotReader(path)
+        storage = cls([resolve_class(name) for name in reader.metadata.get("entity_classes", [])])
+        storage.version = reader.metadata.get("version", 0)
+        for row in reader:
+            storage._restore(row.entity)
         return storage
 
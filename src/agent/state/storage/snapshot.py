@@ -0,0 +1,243 @@
+"""Binary, type-preserving snapshot format shared by the state storages."""
+
+import importlib
+import json
+import os
+import struct
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from agent.state.entity.state_entity import BaseStateEntity
+
+try:
+    import msgpack
+except ImportError:  # Rows fall back to JSON lines
+    msgpack = None
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+_ROW_FILES = {"msgpack": "entities.msgpack", "jsonl": "entities.jsonl"}
+
+# Fixed-size .npy header, rewritten with the final row count on close
+_NPY_HEADER_BYTES = 128
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+def qualified_name(cls: type) -> str:
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def resolve_class(name: str) -> type:
+    module_path, class_name = name.rsplit(".", 1)
+    return getattr(importlib.import_module(module_path), class_name)
+
+
+def _npy_header(rows: int, dimension: int) -> bytes:
+    header = repr({"descr": "<f4", "fortran_order": False, "shape": (rows, dimension)}).encode("latin1")
+    padding = _NPY_HEADER_BYTES - len(_NPY_MAGIC) - 2 - len(header) - 1
+    return _NPY_MAGIC + struct.pack("<H", len(header) + padding + 1) + header + b" " * padding + b"\n"
+
+
+class SnapshotRow(NamedTuple):
+    entity_id: str
+    entity: BaseStateEntity
+    version: int
+    # Row of the entity's vector in SnapshotReader.embeddings, if it has one
+    embedding_row: int | None
+
+
+class SnapshotWriter:
+    """
+    Streams entities into a snapshot directory.
+
+    Layout:
+        manifest.json     format version, row encoding, entity class table, storage metadata
+        entities.msgpack  one [id, class index, version, fields, embedding row] record per entity
+                          (entities.jsonl when msgpack is not installed)
+        embeddings.npy    float32 matrix of the embeddings, one row per entity that has one
+
+    Rows and vectors are written as they arrive, so memory use does not
+    grow with the number of entities. The manifest is written last by
+    close; a directory without one is an incomplete snapshot.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        row_format: str | None = None,
+        metadata: dict[str, Any] | None = None,
+    ):
+        """
+        Args:
+            path: Snapshot directory; created if missing, existing snapshot files are replaced
+            row_format: "msgpack" or "jsonl"; defaults to msgpack when it is installed
+            metadata: JSON-compatible storage state saved in the manifest
+
+        Raises:
+            ValueError: Unknown row format, or msgpack requested but not installed
+        """
+        row_format = row_format or ("msgpack" if msgpack is not None else "jsonl")
+        if row_format not in _ROW_FILES:
+            raise ValueError(f"Unknown row format: {row_format}")
+        if row_format == "msgpack" and msgpack is None:
+            raise ValueError("msgpack is not installed")
+
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        (self.path / MANIFEST_FILE).unlink(missing_ok=True)
+        (self.path / EMBEDDINGS_FILE).unlink(missing_ok=True)
+        self.row_format = row_format
+        self.metadata = metadata or {}
+        self._rows = open(self.path / _ROW_FILES[row_format], "wb")
+        self._packer = msgpack.Packer() if row_format == "msgpack" else None
+        self._embeddings = None
+        self._dimension: int | None = None
+        self._class_index: dict[type[BaseStateEntity], int] = {}
+        self.entity_count = 0
+        self.embedding_count = 0
+        self._closed = False
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # No manifest: the partial snapshot stays unreadable
+            self._close_files()
+
+    def write(
+        self,
+        entity: BaseStateEntity,
+        entity_id: str,
+        version: int = 0,
+        embedding: Any | None = None,
+    ) -> None:
+        """
+        Append one entity.
+
+        Args:
+            entity: Entity to store; its concrete class is recorded
+            entity_id: Identifier within the storage
+            version: Storage version the entity belongs to
+            embedding: Vector to store in the embedding block
+
+        Raises:
+            ValueError: The embedding dimension differs from earlier ones
+        """
+        class_index = self._class_index.setdefault(type(entity), len(self._class_index))
+        embedding_row = None
+        if embedding is not None:
+            embedding_row = self._write_embedding(embedding)
+
+        record = [entity_id, class_index, version, entity.model_dump(mode="json"), embedding_row]
+        if self._packer is not None:
+            self._rows.write(self._packer.pack(record))
+        else:
+            self._rows.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+        self.entity_count += 1
+
+    def _write_embedding(self, embedding: Any) -> int:
+        # numpy is only needed once a snapshot carries embeddings
+        import numpy as np
+
+        vector = np.asarray(embedding, dtype="<f4")
+        if self._embeddings is None:
+            self._dimension = len(vector)
+            self._embeddings = open(self.path / EMBEDDINGS_FILE, "wb")
+            self._embeddings.write(b"\0" * _NPY_HEADER_BYTES)
+        elif len(vector) != self._dimension:
+            raise ValueError(f"Embedding has {len(vector)} dimensions, snapshot holds {self._dimension}")
+        self._embeddings.write(vector.tobytes())
+        self.embedding_count += 1
+        return self.embedding_count - 1
+
+    def _close_files(self) -> None:
+        self._closed = True
+        self._rows.close()
+        if self._embeddings is not None:
+            self._embeddings.close()
+
+    def close(self) -> None:
+        """Finish the snapshot by completing the embedding header and writing the manifest."""
+        if self._closed:
+            return
+        if self._embeddings is not None:
+            self._embeddings.seek(0)
+            self._embeddings.write(_npy_header(self.embedding_count, self._dimension))
+        self._close_files()
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "row_format": self.row_format,
+            "entity_classes": [qualified_name(cls) for cls in self._class_index],
+            "entity_count": self.entity_count,
+            "embedding_count": self.embedding_count,
+            "metadata": self.metadata,
+        }
+        (self.path / MANIFEST_FILE).write_text(json.dumps(manifest))
+
+
+class SnapshotReader:
+    """
+    Reads a snapshot directory written by SnapshotWriter.
+
+    Entities are rebuilt as their recorded classes while iterating. The
+    embedding block is memory-mapped, not read: embeddings is a read-only
+    float32 array backed by the file.
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        """
+        Args:
+            path: Snapshot directory
+
+        Raises:
+            FileNotFoundError: No complete snapshot at path
+            ValueError: The snapshot has an unsupported format version or row encoding
+        """
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / MANIFEST_FILE).read_text())
+        if self.manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format: {self.manifest.get('format_version')}")
+        self.row_format = self.manifest["row_format"]
+        if self.row_format == "msgpack" and msgpack is None:
+            raise ValueError("Snapshot rows are msgpack encoded and msgpack is not installed")
+        self.entity_classes: list[type[BaseStateEntity]] = [
+            resolve_class(name) for name in self.manifest["entity_classes"]
+        ]
+        self._embeddings = None
+
+    @property
+    def metadata(self) -> dict[str, Any]:
+        return self.manifest.get("metadata", {})
+
+    def __len__(self) -> int:
+        return self.manifest["entity_count"]
+
+    @property
+    def embeddings(self):
+        """(embedding_count, dimension) float32 array mapped from the file, or None."""
+        if self._embeddings is None and self.manifest["embedding_count"]:
+            import numpy as np
+
+            self._embeddings = np.load(self.path / EMBEDDINGS_FILE, mmap_mode="r")
+        return self._embeddings
+
+    def __iter__(self) -> Iterator[SnapshotRow]:
+        with open(self.path / _ROW_FILES[self.row_format], "rb") as rows:
+            if self.row_format == "msgpack":
+                records = msgpack.Unpacker(rows, use_list=True)
+            else:
+                records = (json.loads(line) for line in rows)
+            for entity_id, class_index, version, fields, embedding_row in records:
+                yield SnapshotRow(
+                    entity_id,
+                    self.entity_classes[class_index].model_validate(fields),
+                    version,
+                    embedding_row,
+                )
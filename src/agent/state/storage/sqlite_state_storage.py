@@ -0,0 +1,353 @@
+"""State storage in a local SQLite file, shared by many sessions."""
+
+import json
+import os
+import sqlite3
+import uuid
+from datetime import datetime
+from typing import Any
+
+from agent.parser.state_diff import StateDiff
+from agent.state.entity.actor.base_actor import BaseActor
+from agent.state.entity.state_entity import BaseStateEntity
+from agent.state.entity.types import FieldDiff
+from agent.state.storage.base_state_storage import BaseStateStorage
+from agent.state.storage.snapshot import qualified_name, resolve_class
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entities (
+    session_id TEXT NOT NULL,
+    entity_class TEXT NOT NULL,
+    entity_ref TEXT NOT NULL,
+    ordinal INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    completed INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    actors TEXT NOT NULL,
+    PRIMARY KEY (session_id, entity_class, entity_ref)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entities_by_class ON entities (session_id, entity_class, ordinal);
+CREATE INDEX IF NOT EXISTS entities_by_version ON entities (session_id, version);
+CREATE INDEX IF NOT EXISTS entities_by_created ON entities (session_id, created_at);
+CREATE INDEX IF NOT EXISTS entities_by_completion ON entities (session_id, completed, ordinal);
+CREATE TABLE IF NOT EXISTS entity_history (
+    session_id TEXT NOT NULL,
+    entity_class TEXT NOT NULL,
+    entity_ref TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    ordinal INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL,
+    actors TEXT NOT NULL,
+    PRIMARY KEY (session_id, entity_class, entity_ref, version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entity_history_by_version ON entity_history (session_id, version);
+"""
+
+# Statements are constants so that sqlite3's per-connection statement cache
+# compiles each of them once
+_SELECT_SESSION_VERSION = "SELECT version FROM sessions WHERE session_id = ?"
+_UPSERT_SESSION_VERSION = (
+    "INSERT INTO sessions (session_id, version) VALUES (?, ?) "
+    "ON CONFLICT (session_id) DO UPDATE SET version = excluded.version"
+)
+_SELECT_ENTITY = (
+    "SELECT ordinal, created_at, data, actors FROM entities "
+    "WHERE session_id = ? AND entity_class = ? AND entity_ref = ?"
+)
+_NEXT_ORDINAL = "SELECT COALESCE(MAX(ordinal), -1) + 1 FROM entities WHERE session_id = ?"
+_UPSERT_ENTITY = (
+    "INSERT INTO entities (session_id, entity_class, entity_ref, ordinal, version, created_at, completed, data, actors) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (session_id, entity_class, entity_ref) DO UPDATE SET "
+    "version = excluded.version, completed = excluded.completed, data = excluded.data, actors = excluded.actors"
+)
+_INSERT_HISTORY = (
+    "INSERT OR REPLACE INTO entity_history "
+    "(session_id, entity_class, entity_ref, version, ordinal, created_at, data, actors) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_SELECT_ALL = (
+    "SELECT entity_class, entity_ref, created_at, data, actors FROM entities "
+    "WHERE session_id = ? ORDER BY ordinal"
+)
+_SELECT_ALL_AS_OF = (
+    "SELECT h.entity_class, h.entity_ref, h.created_at, h.data, h.actors FROM entity_history h "
+    "JOIN (SELECT entity_class, entity_ref, MAX(version) AS version FROM entity_history "
+    "      WHERE session_id = ? AND version <= ? GROUP BY entity_class, entity_ref) latest "
+    "USING (entity_class, entity_ref, version) "
+    "WHERE h.session_id = ? ORDER BY h.ordinal"
+)
+_SELECT_REFS = "SELECT entity_ref FROM entities WHERE session_id = ? AND entity_class = ? ORDER BY ordinal"
+_SELECT_INCOMPLETE = (
+    "SELECT entity_class, entity_ref, created_at, data, actors FROM entities "
+    "WHERE session_id = ? AND completed = 0 ORDER BY ordinal"
+)
+_HAS_ENTITIES = "SELECT EXISTS (SELECT 1 FROM entities WHERE session_id = ?)"
+_HAS_INCOMPLETE = "SELECT EXISTS (SELECT 1 FROM entities WHERE session_id = ? AND completed = 0)"
+_SELECT_CHANGED_REFS = (
+    "SELECT DISTINCT entity_class, entity_ref FROM entity_history "
+    "WHERE session_id = ? AND version > ? AND version <= ?"
+)
+_SELECT_VERSION_OF = (
+    "SELECT data FROM entity_history WHERE session_id = ? AND entity_class = ? AND entity_ref = ? "
+    "AND version <= ? ORDER BY version DESC LIMIT 1"
+)
+
+
+class SqliteStateStorage(BaseStateStorage):
+    """
+    Stores the entities of one session as rows of a SQLite database that
+    many sessions (and processes) can share.
+
+    Rows are keyed by (session, entity class, entity ref). A diff with the
+    ref of an existing entity is merged into it; a diff without a ref (or
+    with an unknown one) creates a new entity, under a generated ref when
+    none is given. Each apply_state_diffs call is one version and one
+    transaction, and every entity row it writes is also appended to a
+    history table, so get_all can read any earlier version.
+
+    The database runs in WAL journal mode, so readers never block the
+    writer. Nothing is cached in Python: memory stays flat however many
+    sessions a host serves.
+    """
+
+    def __init__(self, path: str | os.PathLike = ":memory:", session_id: str = "default", timeout: float = 30.0):
+        """
+        Args:
+            path: Database file; created with its tables if missing
+            session_id: Session whose entities this storage reads and writes
+            timeout: Seconds to wait for another connection's write lock
+        """
+        super().__init__()
+        self.path = path
+        self.session_id = session_id
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, cached_statements=64)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        # WAL keeps committed transactions durable across crashes without an fsync per commit
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._classes: dict[str, type] = {}
+
+        row = self._connection.execute(_SELECT_SESSION_VERSION, (session_id,)).fetchone()
+        self.version = row[0] if row else 0
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "SqliteStateStorage":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _resolve(self, name: str) -> type:
+        cls = self._classes.get(name)
+        if cls is None:
+            cls = self._classes[name] = resolve_class(name)
+        return cls
+
+    def _load(self, class_name: str, created_at: str, data: str, actors: str) -> BaseStateEntity:
+        entity = self._resolve(class_name).model_validate_json(data)
+        entity.date_created_utc = datetime.fromisoformat(created_at)
+        entity.actors = [
+            self._resolve(actor_class).model_validate(actor_data) for actor_class, actor_data in json.loads(actors)
+        ]
+        return entity
+
+    @staticmethod
+    def _dump_actors(actors: list[BaseActor]) -> str:
+        return json.dumps([[qualified_name(type(actor)), actor.model_dump(mode="json")] for actor in actors])
+
+    def apply_state_diffs(self, state_diffs: list[StateDiff]) -> list[StateDiff]:
+        """
+        Apply state diffs as one version, committed in a single transaction.
+
+        Args:
+            state_diffs: List of state diffs to apply
+
+        Returns:
+            List of applied StateDiff objects, with entity_ref set to the entity they changed
+        """
+        applied_diffs: list[StateDiff] = []
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Another connection may have written this session since it was opened
+            row = connection.execute(_SELECT_SESSION_VERSION, (self.session_id,)).fetchone()
+            version = (row[0] if row else 0) + 1
+            next_ordinal = connection.execute(_NEXT_ORDINAL, (self.session_id,)).fetchone()[0]
+            entity_rows: dict[tuple[str, str], tuple] = {}
+
+            for state_diff in state_diffs:
+                entity_class = state_diff.entity_class
+                if not entity_class:
+                    continue
+                class_name = qualified_name(entity_class)
+                entity_ref = state_diff.entity_ref or str(uuid.uuid4())
+
+                current = None
+                pending = entity_rows.get((class_name, entity_ref))
+                if pending is not None:
+                    ordinal, created_at, data, actors = pending[3], pending[5], pending[7], pending[8]
+                    current = self._load(class_name, created_at, data, actors)
+                else:
+                    stored = connection.execute(_SELECT_ENTITY, (self.session_id, class_name, entity_ref)).fetchone()
+                    if stored is not None:
+                        ordinal, created_at = stored[0], stored[1]
+                        current = self._load(class_name, *stored[1:])
+                    else:
+                        ordinal = next_ordinal
+
+                entity, applied_diff = entity_class.merge(current, state_diff)
+                if entity is None or not applied_diff.diffs:
+                    continue
+                if current is None:
+                    next_ordinal += 1
+                    created_at = entity.date_created_utc.isoformat()
+
+                entity_rows[(class_name, entity_ref)] = (
+                    self.session_id, class_name, entity_ref, ordinal, version, created_at,
+                    int(entity.is_completed()), entity.model_dump_json(), self._dump_actors(entity.actors),
+                )
+                applied_diffs.append(applied_diff.model_copy(update={"entity_ref": entity_ref}))
+
+            connection.executemany(_UPSERT_ENTITY, entity_rows.values())
+            connection.executemany(_INSERT_HISTORY, (
+                (session_id, class_name, entity_ref, row_version, ordinal, created_at, data, actors)
+                for session_id, class_name, entity_ref, ordinal, row_version, created_at, _, data, actors
+                in entity_rows.values()
+            ))
+            connection.execute(_UPSERT_SESSION_VERSION, (self.session_id, version))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+        self.version = version
+        return applied_diffs
+
+    def increment_version(self) -> int:
+        self._connection.execute(_UPSERT_SESSION_VERSION, (self.session_id, self.version + 1))
+        self.version += 1
+        return self.version
+
+    def get_entity_refs_for_class(self, entity_class: type[BaseStateEntity]) -> list[str] | None:
+        rows = self._connection.execute(_SELECT_REFS, (self.session_id, qualified_name(entity_class)))
+        return [entity_ref for entity_ref, in rows]
+
+    def get_all(self, chronological: bool = True, as_of_version: int | None = None) -> list[BaseStateEntity]:
+        if as_of_version is None:
+            rows = self._connection.execute(_SELECT_ALL, (self.session_id,))
+        else:
+            rows = self._connection.execute(_SELECT_ALL_AS_OF, (self.session_id, as_of_version, self.session_id))
+        return [self._load(class_name, created_at, data, actors) for class_name, _, created_at, data, actors in rows]
+
+    def get_by_ref(self, entity_class: type[BaseStateEntity], entity_ref: str) -> BaseStateEntity | None:
+        row = self._connection.execute(
+            _SELECT_ENTITY, (self.session_id, qualified_name(entity_class), entity_ref)
+        ).fetchone()
+        return self._load(qualified_name(entity_class), *row[1:]) if row else None
+
+    def get_incomplete_entities(self) -> list[BaseStateEntity]:
+        rows = self._connection.execute(_SELECT_INCOMPLETE, (self.session_id,))
+        return [self._load(class_name, created_at, data, actors) for class_name, _, created_at, data, actors in rows]
+
+    def is_state_completed(self) -> bool:
+        has_entities, = self._connection.execute(_HAS_ENTITIES, (self.session_id,)).fetchone()
+        has_incomplete, = self._connection.execute(_HAS_INCOMPLETE, (self.session_id,)).fetchone()
+        return bool(has_entities) and not has_incomplete
+
+    def diff_versions(self, from_version: int, to_version: int) -> list[StateDiff]:
+        """
+        Top-level field changes between two versions, one StateDiff per changed entity.
+
+        Raises:
+            ValueError: to_version is older than from_version
+        """
+        if to_version < from_version:
+            raise ValueError("to_version must not be older than from_version")
+
+        state_diffs: list[StateDiff] = []
+        changed = self._connection.execute(_SELECT_CHANGED_REFS, (self.session_id, from_version, to_version)).fetchall()
+        for class_name, entity_ref in changed:
+            before = self._fields_at(class_name, entity_ref, from_version)
+            after = self._fields_at(class_name, entity_ref, to_version)
+            diffs = [
+                FieldDiff(field_name=name, new_value=value)
+                for name, value in after.items()
+                if name not in before or before[name] != value
+            ]
+            if diffs:
+                state_diffs.append(StateDiff(entity_class=self._resolve(class_name), entity_ref=entity_ref, diffs=diffs))
+        return state_diffs
+
+    def _fields_at(self, class_name: str, entity_ref: str, version: int) -> dict[str, Any]:
+        row = self._connection.execute(
+            _SELECT_VERSION_OF, (self.session_id, class_name, entity_ref, version)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "session_id": self.session_id,
+            "version": self.version,
+            "entities": [
+                {
+                    "entity_class": class_name,
+                    "entity_ref": entity_ref,
+                    "created_at": created_at,
+                    "entity": json.loads(data),
+                    "actors": json.loads(actors),
+                }
+                for class_name, entity_ref, created_at, data, actors
+                in self._connection.execute(_SELECT_ALL, (self.session_id,))
+            ],
+        })
+
+    @classmethod
+    def from_json(
+        cls, data: str, path: str | os.PathLike = ":memory:", session_id: str | None = None
+    ) -> 'SqliteStateStorage':
+        """
+        Load a to_json dump into a database as one version.
+
+        Args:
+            data: Output of to_json
+            path: Database file to write into
+            session_id: Session to restore into (defaults to the dumped one)
+
+        Raises:
+            ValueError: The session already holds entities
+        """
+        parsed = json.loads(data)
+        storage = cls(path, session_id or parsed["session_id"])
+        if storage._connection.execute(_HAS_ENTITIES, (storage.session_id,)).fetchone()[0]:
+            raise ValueError(f"Session {storage.session_id!r} is not empty")
+
+        version = parsed.get("version", 0)
+        rows = []
+        for ordinal, item in enumerate(parsed.get("entities", [])):
+            entity = storage._load(item["entity_class"], item["created_at"], json.dumps(item["entity"]),
+                                   json.dumps(item["actors"]))
+            rows.append((
+                storage.session_id, item["entity_class"], item["entity_ref"], ordinal, version, item["created_at"],
+                int(entity.is_completed()), entity.model_dump_json(), json.dumps(item["actors"]),
+            ))
+
+        connection = storage._connection
+        connection.execute("BEGIN IMMEDIATE")
+        connection.executemany(_UPSERT_ENTITY, rows)
+        connection.executemany(_INSERT_HISTORY, (
+            (session_id, class_name, entity_ref, row_version, ordinal, created_at, entity_data, actors)
+            for session_id, class_name, entity_ref, ordinal, row_version, created_at, _, entity_data, actors in rows
+        ))
+        connection.execute(_UPSERT_SESSION_VERSION, (storage.session_id, version))
+        connection.execute("COMMIT")
+        storage.version = version
+        return storage
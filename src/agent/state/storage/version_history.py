@@ -0,0 +1,201 @@
+"""Per-entity delta chains for reading a mutable storage as of an earlier version."""
+
+from bisect import bisect_right, insort
+from datetime import datetime
+from typing import Any
+
+from agent.parser.state_diff import StateDiff
+from agent.state.entity.actor.base_actor import BaseActor
+from agent.state.entity.state_entity import BaseStateEntity, ValidationErrorHandlingMode
+from agent.state.entity.types import FieldDiff
+
+# Deltas folded between two checkpoints of a chain; bounds the work of one read
+_CHECKPOINT_INTERVAL = 32
+
+
+def _parent_paths(path: str) -> list[str]:
+    """Paths a write to path is nested below, e.g. "a" and "a[0]" for "a[0].b"."""
+    return [path[:i] for i, char in enumerate(path) if char in ".[" and i > 0]
+
+
+class _FoldedFields:
+    """Field path -> latest value, with an index of the paths written below each path."""
+
+    def __init__(self):
+        self.fields: dict[str, Any] = {}
+        # Parent path -> paths written below it; may still list paths cleared since
+        self.below: dict[str, set[str]] = {}
+
+    def copy(self) -> '_FoldedFields':
+        folded = _FoldedFields()
+        folded.fields = dict(self.fields)
+        folded.below = {parent: set(paths) for parent, paths in self.below.items()}
+        return folded
+
+    def write(self, path: str, value: Any) -> None:
+        # A write replaces whatever earlier versions wrote below it, and
+        # must come after the writes it keeps when the fields are merged
+        for nested in self.below.pop(path, ()):
+            self.fields.pop(nested, None)
+        self.fields.pop(path, None)
+        self.fields[path] = value
+        for parent in _parent_paths(path):
+            self.below.setdefault(parent, set()).add(path)
+
+
+class _DeltaChain:
+    def __init__(self, entity_class: type[BaseStateEntity]):
+        self.entity_class = entity_class
+        self.versions: list[int] = []
+        # Field path -> value written at the matching version
+        self.deltas: list[dict[str, Any]] = []
+        self.actors: list[BaseActor | None] = []
+        self.date_created_utc: datetime | None = None
+        # checkpoints[n] holds the first n * _CHECKPOINT_INTERVAL deltas folded
+        self.checkpoints: list[_FoldedFields] = [_FoldedFields()]
+
+    def append(self, version: int, delta: dict[str, Any], actor: BaseActor | None) -> None:
+        self.versions.append(version)
+        self.deltas.append(delta)
+        self.actors.append(actor)
+        if len(self.deltas) % _CHECKPOINT_INTERVAL == 0:
+            self.checkpoints.append(self._fold(len(self.deltas)))
+
+    def _fold(self, end: int) -> _FoldedFields:
+        # The checkpoint at end itself may not exist yet while it is being built
+        checkpoint = min(end // _CHECKPOINT_INTERVAL, len(self.checkpoints) - 1)
+        folded = self.checkpoints[checkpoint].copy()
+        for delta in self.deltas[checkpoint * _CHECKPOINT_INTERVAL:end]:
+            for path, value in delta.items():
+                folded.write(path, value)
+        return folded
+
+    def fields_at(self, version: int) -> dict[str, Any] | None:
+        end = bisect_right(self.versions, version)
+        if end == 0:
+            return None
+        return self._fold(end).fields
+
+    def actors_at(self, version: int) -> list[BaseActor]:
+        actors: list[BaseActor] = []
+        for actor in self.actors[:bisect_right(self.versions, version)]:
+            if actor is not None and not any(existing.id == actor.id for existing in actors):
+                actors.append(actor)
+        return actors
+
+
+class VersionHistory:
+    """
+    Append-only record of the fields each version changed, per entity key.
+
+    Versions share everything they did not change, so recording costs the
+    size of the applied diff and a snapshot is just a version number. Older
+    states are rebuilt on read by folding an entity's deltas up to the
+    requested version, starting from the chain's nearest checkpoint.
+    """
+
+    def __init__(self):
+        self._chains: dict[str, _DeltaChain] = {}
+        # Key -> position in first-recorded order
+        self._order: dict[str, int] = {}
+        self._keys_by_version: dict[int, list[str]] = {}
+        # Recorded versions in ascending order
+        self._versions: list[int] = []
+
+    def record(
+        self,
+        key: str,
+        entity_class: type[BaseStateEntity],
+        version: int,
+        diffs: list[FieldDiff],
+        actor: BaseActor | None = None,
+        date_created_utc: datetime | None = None,
+    ) -> None:
+        """
+        Record the field changes one version made to one entity.
+
+        Args:
+            key: Stable identifier of the entity within its storage
+            entity_class: Class of the entity
+            version: Storage version the changes belong to; must not decrease per key
+            diffs: Applied field changes
+            actor: Actor who made the changes
+            date_created_utc: Creation time of the entity, given to rebuilt copies
+        """
+        chain = self._chains.get(key)
+        if chain is None:
+            chain = self._chains[key] = _DeltaChain(entity_class)
+            self._order[key] = len(self._order)
+        if chain.versions and version < chain.versions[-1]:
+            raise ValueError(f"Version {version} of {key!r} is older than {chain.versions[-1]}")
+
+        chain.append(version, {diff.field_name: diff.new_value for diff in diffs}, actor)
+        if chain.date_created_utc is None:
+            chain.date_created_utc = date_created_utc
+        if version not in self._keys_by_version:
+            self._keys_by_version[version] = []
+            insort(self._versions, version)
+        self._keys_by_version[version].append(key)
+
+    def entities_at(self, version: int) -> dict[str, BaseStateEntity]:
+        """Entities as they were right after version, by key in first-recorded order."""
+        entities: dict[str, BaseStateEntity] = {}
+        for key, chain in self._chains.items():
+            entity = self._build(chain, version)
+            if entity is not None:
+                entities[key] = entity
+        return entities
+
+    def diff(self, from_version: int, to_version: int) -> list[StateDiff]:
+        """
+        Field changes that turn the state at from_version into the state at to_version.
+
+        Only entities touched by versions in between are examined. Each
+        StateDiff carries the entity key as entity_ref.
+
+        Raises:
+            ValueError: to_version is older than from_version
+        """
+        if to_version < from_version:
+            raise ValueError("to_version must not be older than from_version")
+
+        touched: set[str] = set()
+        start = bisect_right(self._versions, from_version)
+        for version in self._versions[start:bisect_right(self._versions, to_version)]:
+            touched.update(self._keys_by_version[version])
+
+        state_diffs: list[StateDiff] = []
+        for key in sorted(touched, key=self._order.__getitem__):
+            chain = self._chains[key]
+            before = chain.fields_at(from_version) or {}
+            after = chain.fields_at(to_version) or {}
+            changed = [
+                FieldDiff(field_name=path, new_value=value)
+                for path, value in after.items()
+                if path not in before or before[path] != value
+            ]
+            if changed:
+                state_diffs.append(StateDiff(entity_class=chain.entity_class, entity_ref=key, diffs=changed))
+        return state_diffs
+
+    @staticmethod
+    def _build(chain: _DeltaChain, version: int) -> BaseStateEntity | None:
+        fields = chain.fields_at(version)
+        if fields is None:
+            return None
+        # Whole fields go first so that the new entity validates with all of
+        # them; the nested writes left after folding all postdate their field
+        paths = sorted(fields, key=lambda path: path not in chain.entity_class.model_fields)
+        entity, _ = chain.entity_class.merge(
+            None,
+            StateDiff(
+                entity_class=chain.entity_class,
+                diffs=[FieldDiff(field_name=path, new_value=fields[path]) for path in paths],
+            ),
+            on_validation_error=ValidationErrorHandlingMode.ignore,
+        )
+        if entity is not None:
+            entity.actors = chain.actors_at(version)
+            if chain.date_created_utc is not None:
+                entity.date_created_utc = chain.date_created_utc
+        return entity
@@ -0,0 +1,361 @@
+"""Append-only log of applied StateDiffs, replayed on top of the last snapshot."""
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from agent.parser.state_diff import StateDiff
+from agent.state.entity.actor.base_actor import BaseActor
+from agent.state.entity.types import FieldDiff
+from agent.state.storage.base_state_storage import BaseStateStorage
+from agent.state.storage.snapshot import qualified_name, resolve_class
+
+_SEGMENT = re.compile(r"^wal-(\d{8})\.log$")
+_SNAPSHOT = re.compile(r"^snapshot-(\d{20})$")
+
+
+class WalRecord(NamedTuple):
+    # Storage version right after the diffs were applied
+    version: int
+    timestamp: datetime
+    state_diffs: list[StateDiff]
+    # Embedding of the entity each diff created, by entity_ref
+    embeddings: dict[str, list[float]]
+
+
+def _encode_diff(state_diff: StateDiff, embedding: list[float] | None) -> dict[str, Any]:
+    actor = state_diff.actor
+    return {
+        "entity_class": qualified_name(state_diff.entity_class),
+        "entity_ref": state_diff.entity_ref,
+        "diffs": [[diff.field_name, diff.new_value] for diff in state_diff.diffs],
+        "actor": [qualified_name(type(actor)), actor.model_dump(mode="json")] if actor is not None else None,
+        "embedding": embedding,
+    }
+
+
+class WriteAheadLog:
+    """
+    Durable record of every applied StateDiff, so persisting a turn costs
+    the size of its diffs rather than the size of the state.
+
+    Each append writes one JSON line (version, timestamp, diffs with their
+    actors, entity refs and embeddings) to the active segment file,
+    wal-<sequence>.log. Replay hands the logged entity refs and embeddings
+    to BaseStateStorage.replay_state_diffs, so recovered entities keep
+    their IDs and are not embedded again. fsync is batched:
+    the log syncs after sync_every records or once sync_interval seconds
+    have passed since the last sync, whichever comes first; call sync to
+    force it. A segment is sealed when it outgrows segment_bytes, and every
+    process writes to a fresh segment, so sealed segments never change.
+
+    Compaction folds sealed segments into a snapshot directory,
+    snapshot-<version>, written in the binary snapshot format. It rebuilds
+    a separate storage from the previous snapshot plus the sealed segments,
+    so it can run in a background thread while the live storage keeps
+    changing. recover loads the newest snapshot and replays the records
+    logged after it.
+
+    Only what is appended gets logged: BaseStateController appends every
+    batch its _apply_state_diffs applies, but writes made on the storage
+    directly (apply_state_diffs, add_entities, increment_version outside
+    the controller) bypass the log and are lost on recovery unless the
+    caller appends them too.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        storage_factory: Callable[[], BaseStateStorage],
+        snapshot_loader: Callable[[Path], BaseStateStorage] | None = None,
+        segment_bytes: int = 64 * 2**20,
+        sync_every: int = 1,
+        sync_interval: float | None = None,
+        compact_after_segments: int | None = 4,
+    ):
+        """
+        Args:
+            directory: Holds the segments and snapshots; created if missing
+            storage_factory: Builds an empty storage to replay into
+            snapshot_loader: Loads a snapshot directory (e.g. OneEntityPerTypeStorage.load_snapshot);
+                             without it the log is never compacted and recovery replays everything
+            segment_bytes: Size after which the active segment is sealed
+            sync_every: Records written between fsyncs
+            sync_interval: Longest time in seconds a record may stay unsynced
+                           (checked on append); None relies on sync_every alone
+            compact_after_segments: Start a background compaction once this many
+                                    segments are sealed; None only compacts on request
+        """
+        if sync_every < 1:
+            raise ValueError("sync_every must be at least 1")
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.storage_factory = storage_factory
+        self.snapshot_loader = snapshot_loader
+        self.segment_bytes = segment_bytes
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_after_segments = compact_after_segments
+
+        self._lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+        self._compaction: threading.Thread | None = None
+        self._segment = None
+        self._segment_sequence = max(self._segment_sequences(), default=0)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._classes: dict[str, type] = {}
+
+    def _segment_sequences(self) -> list[int]:
+        return sorted(
+            int(match.group(1))
+            for name in os.listdir(self.directory)
+            if (match := _SEGMENT.match(name))
+        )
+
+    def _segment_path(self, sequence: int) -> Path:
+        return self.directory / f"wal-{sequence:08d}.log"
+
+    def _snapshots(self) -> list[tuple[int, Path]]:
+        return sorted(
+            (int(match.group(1)), self.directory / name)
+            for name in os.listdir(self.directory)
+            if (match := _SNAPSHOT.match(name))
+        )
+
+    def latest_snapshot(self) -> tuple[int, Path] | None:
+        """(version, directory) of the newest complete snapshot, if any."""
+        snapshots = self._snapshots()
+        return snapshots[-1] if snapshots else None
+
+    def append(
+        self,
+        state_diffs: list[StateDiff],
+        version: int,
+        timestamp: datetime | None = None,
+        embeddings: dict[str, list[float]] | None = None,
+    ) -> None:
+        """
+        Log the diffs one apply_state_diffs call applied.
+
+        Applies that returned no diffs but bumped the version should be logged
+        as well, so that replay numbers versions like the live storage did.
+
+        Args:
+            state_diffs: Applied diffs, as returned by apply_state_diffs (may be empty)
+            version: Storage version after applying them; must increase between appends
+            timestamp: When they were applied (defaults to now)
+            embeddings: Stored embedding per entity_ref, for storages that keep one
+        """
+        embeddings = embeddings or {}
+        line = json.dumps({
+            "version": version,
+            "timestamp": (timestamp or datetime.now(timezone.utc)).isoformat(),
+            "diffs": [
+                _encode_diff(state_diff, embeddings.get(state_diff.entity_ref)) for state_diff in state_diffs
+            ],
+        }, separators=(",", ":")) + "\n"
+
+        with self._lock:
+            if self._segment is None:
+                self._segment_sequence += 1
+                # "x": a segment left by an earlier process is never appended to
+                self._segment = open(self._segment_path(self._segment_sequence), "x", encoding="utf-8")
+            self._segment.write(line)
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every or (
+                self.sync_interval is not None and time.monotonic() - self._last_sync >= self.sync_interval
+            ):
+                self._sync()
+            sealed = self._segment.tell() >= self.segment_bytes
+            if sealed:
+                self._seal()
+
+        if sealed and self.compact_after_segments is not None and self.snapshot_loader is not None:
+            # No segment is active right after sealing, so every segment on disk is sealed
+            if len(self._segment_sequences()) >= self.compact_after_segments:
+                self.compact_in_background()
+
+    def _sync(self) -> None:
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _seal(self) -> None:
+        self._sync()
+        self._segment.close()
+        self._segment = None
+
+    def sync(self) -> None:
+        """fsync the records appended so far."""
+        with self._lock:
+            if self._segment is not None and self._unsynced:
+                self._sync()
+
+    def close(self) -> None:
+        """Seal the active segment and wait for a running compaction."""
+        with self._lock:
+            if self._segment is not None:
+                self._seal()
+        if self._compaction is not None:
+            self._compaction.join()
+
+    def records(self, after_version: int = 0) -> Iterator[WalRecord]:
+        """
+        Logged records in append order.
+
+        A record cut short by a crash ends its segment and is skipped.
+
+        Args:
+            after_version: Skip records at or below this version
+        """
+        with self._lock:
+            sequences = self._segment_sequences()
+            if self._segment is not None and self._unsynced:
+                self._segment.flush()
+
+        for sequence in sequences:
+            for record in self._read_segment(self._segment_path(sequence)):
+                if record.version > after_version:
+                    yield record
+
+    def _read_segment(self, path: Path) -> Iterator[WalRecord]:
+        try:
+            segment = open(path, encoding="utf-8")
+        except FileNotFoundError:  # Removed by a concurrent compaction
+            return
+        with segment:
+            for line in segment:
+                if not line.endswith("\n"):
+                    return
+                yield self._decode(json.loads(line))
+
+    def _resolve(self, name: str) -> type:
+        cls = self._classes.get(name)
+        if cls is None:
+            cls = self._classes[name] = resolve_class(name)
+        return cls
+
+    def _decode(self, data: dict[str, Any]) -> WalRecord:
+        state_diffs = []
+        embeddings: dict[str, list[float]] = {}
+        for diff in data["diffs"]:
+            # Records logged before embeddings were logged have no "embedding"
+            if diff.get("embedding") is not None and diff["entity_ref"] is not None:
+                embeddings[diff["entity_ref"]] = diff["embedding"]
+            actor: BaseActor | None = None
+            if diff["actor"] is not None:
+                actor_class, actor_data = diff["actor"]
+                actor = self._resolve(actor_class).model_validate(actor_data)
+            state_diffs.append(StateDiff(
+                entity_class=self._resolve(diff["entity_class"]),
+                entity_ref=diff["entity_ref"],
+                diffs=[FieldDiff(field_name=path, new_value=value) for path, value in diff["diffs"]],
+                actor=actor,
+            ))
+        return WalRecord(data["version"], datetime.fromisoformat(data["timestamp"]), state_diffs, embeddings)
+
+    @staticmethod
+    def replay(storage: BaseStateStorage, records: Iterable[WalRecord]) -> int:
+        """
+        Apply logged records to a storage, one replay_state_diffs call per record.
+
+        After each record the storage is brought up to the record's version,
+        in case it was appended at a version the apply alone does not reach
+        (e.g. after version bumps that were never logged).
+
+        Returns:
+            Version of the last record replayed, or 0 if there was none
+
+        Raises:
+            ValueError: Replaying a record took the storage past the record's version
+        """
+        version = 0
+        for record in records:
+            storage.replay_state_diffs(record.state_diffs, record.embeddings)
+            while storage.get_current_version() < record.version:
+                storage.increment_version()
+            if storage.get_current_version() > record.version:
+                raise ValueError(
+                    f"Replaying the record of version {record.version} "
+                    f"brought the storage to version {storage.get_current_version()}"
+                )
+            version = record.version
+        return version
+
+    def _base(self) -> tuple[BaseStateStorage, int]:
+        latest = self.latest_snapshot() if self.snapshot_loader is not None else None
+        if latest is None:
+            return self.storage_factory(), 0
+        version, path = latest
+        return self.snapshot_loader(path), version
+
+    def recover(self) -> BaseStateStorage:
+        """Rebuild the storage from the newest snapshot and the records logged after it."""
+        # A compaction finishing midway could delete segments newer than the chosen snapshot
+        with self._compaction_lock:
+            storage, version = self._base()
+            self.replay(storage, self.records(after_version=version))
+        return storage
+
+    def compact(self) -> int | None:
+        """
+        Fold the sealed segments into a new snapshot and delete them.
+
+        Returns:
+            Version of the new snapshot, or None if there was nothing to fold
+
+        Raises:
+            ValueError: The log has no snapshot_loader to read snapshots back with
+        """
+        if self.snapshot_loader is None:
+            raise ValueError("Compaction needs a snapshot_loader")
+
+        with self._compaction_lock:
+            with self._lock:
+                sealed = self._segment_sequences()
+                if self._segment is not None:
+                    sealed.remove(self._segment_sequence)
+            if not sealed:
+                return None
+
+            storage, base_version = self._base()
+            version = self.replay(storage, (
+                record
+                for sequence in sealed
+                for record in self._read_segment(self._segment_path(sequence))
+                if record.version > base_version
+            ))
+            if version == 0:
+                version = base_version
+            else:
+                # Written under a temporary name so that a half-written snapshot is never picked up
+                target = self.directory / f"snapshot-{version:020d}"
+                staging = self.directory / f".{target.name}.tmp"
+                shutil.rmtree(staging, ignore_errors=True)
+                storage.save_snapshot(staging)
+                os.replace(staging, target)
+
+            for sequence in sealed:
+                self._segment_path(sequence).unlink(missing_ok=True)
+            for snapshot_version, path in self._snapshots():
+                if snapshot_version < version:
+                    shutil.rmtree(path, ignore_errors=True)
+            return version
+
+    def compact_in_background(self) -> threading.Thread:
+        """Run compact in a daemon thread, unless one is already running."""
+        with self._lock:
+            if self._compaction is None or not self._compaction.is_alive():
+                self._compaction = threading.Thread(target=self.compact, name="wal-compaction", daemon=True)
+                self._compaction.start()
+            return self._compaction
@@ -5,6 +5,7 @@ from pydantic import BaseModel
 
 from agent.base_agent import BaseAgent
 from agent.interaction.output.controller.llm_chat_outputs_controller import LlmChatOutputsController
+from agent.parser import CompositeParser, LlmParser, RuleBasedParser, register_parser
 from agent.state.controller.base_state_controller import BaseStateController
 from agent.state.storage.one_entity_per_type_storage import OneEntityPerTypeStorage
 from examples.boat_booking.actor import CustomerActor
@@ -28,8 +29,15 @@ if __name__ == '__main__':
     message = "I want to book a 40 ft catamaran in Split Croatia for July 10th, 2026"
     bb_input = BoatBookingInput(input_value=message, actor=customer)
 
+    entity_classes = [DesiredLocationEntity, BoatSpecEntity, DatesAndDurationEntity]
+    # answers like "40 ft" or "3 cabins" are resolved without an LLM round trip
+    register_parser(CompositeParser(
+        rule_parser=RuleBasedParser(entity_classes=entity_classes),
+        fallback_parser=LlmParser(entity_classes=entity_classes),
+    ))
+
     state_controller = BaseStateController(storage=OneEntityPerTypeStorage(
-        entity_classes=[DesiredLocationEntity, BoatSpecEntity, DatesAndDurationEntity]
+        entity_classes=entity_classes
     ))
     outputs_controller = LlmChatOutputsController(
         state_controller=state_controller,
@@ -112,7 +112,8 @@ class BoatBookingTUI(App):
 
         with redirect_stdout(captured_output):
             self.state_controller.record_input(bb_input)
-            changes = self.state_controller.update_state([bb_input])
+            # Each change is stored as soon as it is parsed; the turn's changes are logged together
+            changes: list[StateDiff] = list(self.state_controller.update_state_streaming([bb_input]))
 
         self.call_from_thread(self.log_state_changes, changes)
 
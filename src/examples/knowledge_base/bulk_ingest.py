@@ -0,0 +1,352 @@
+"""
+Bulk extraction of tasks and decisions from archived meeting transcripts.
+
+Transcripts are read lazily from a JSONL file, extracted with bounded
+concurrency, written to storage in batches and checkpointed after every
+batch, so an interrupted run picks up where it stopped. Delivery is
+at-least-once: records of a batch that was stored but not yet checkpointed
+are extracted again on resume.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+
+from agent.parser.base_parser import BaseParser
+from agent.parser.entity_context import EntityContext
+from agent.parser.schema_renderer import compact_schema
+from agent.parser.state_diff import LlmStateDiff, LlmStateDiffs, StateDiff
+from agent.state.entity.state_entity import BaseStateEntity
+from agent.state.entity.types import FieldDiff
+from agent.state.storage.base_state_storage import BaseStateStorage
+from examples.knowledge_base.input import KbInput
+
+
+class TranscriptRecord(BaseModel):
+    record_id: str
+    transcript: str
+
+
+def iter_transcripts(
+    path: str | Path,
+    id_field: str = "id",
+    text_field: str = "transcript",
+    metrics: "IngestMetrics | None" = None,
+) -> Iterator[TranscriptRecord]:
+    """
+    Lazily read transcripts from a JSONL file, one record per line.
+
+    Args:
+        path: JSONL file
+        id_field: Key holding the record id (falls back to the line number)
+        text_field: Key holding the transcript text
+        metrics: Counts malformed lines as failed records and skips them;
+                 without it a malformed line raises
+
+    Yields:
+        TranscriptRecord per non-empty, well-formed line
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+                record = TranscriptRecord(
+                    record_id=str(row.get(id_field, line_number)),
+                    transcript=row[text_field],
+                )
+            except (ValueError, KeyError, TypeError, AttributeError) as exc:
+                if metrics is None:
+                    raise
+                metrics.records_read += 1
+                metrics.record_error(exc)
+                continue
+            yield record
+
+
+class IngestCheckpoint:
+    """Append-only log of record ids whose results have been written to storage."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.completed: set[str] = set()
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                self.completed = {line.rstrip("\n") for line in f if line.strip()}
+
+    def is_completed(self, record_id: str) -> bool:
+        return record_id in self.completed
+
+    def mark_completed(self, record_ids: list[str]) -> None:
+        if not record_ids:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(f"{record_id}\n" for record_id in record_ids)
+        self.completed.update(record_ids)
+
+
+class IngestMetrics:
+    """Throughput and error counters of a single ingestion run."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.finished_at: float | None = None
+        self.records_read = 0
+        self.records_skipped = 0
+        self.records_succeeded = 0
+        self.records_failed = 0
+        self.diffs_extracted = 0
+        self.entities_written = 0
+        self.batches_written = 0
+        self.errors: Counter[str] = Counter()
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def records_per_second(self) -> float:
+        elapsed = self.elapsed_seconds
+        processed = self.records_succeeded + self.records_failed
+        return processed / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        processed = self.records_succeeded + self.records_failed
+        return self.records_failed / processed if processed else 0.0
+
+    def record_error(self, exc: BaseException) -> None:
+        self.records_failed += 1
+        self.errors[type(exc).__name__] += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "records_read": self.records_read,
+            "records_skipped": self.records_skipped,
+            "records_succeeded": self.records_succeeded,
+            "records_failed": self.records_failed,
+            "diffs_extracted": self.diffs_extracted,
+            "entities_written": self.entities_written,
+            "batches_written": self.batches_written,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "records_per_second": round(self.records_per_second, 2),
+            "error_rate": round(self.error_rate, 4),
+            "errors": dict(self.errors),
+        }
+
+
+class BulkIngestPipeline:
+    """Runs one parser over a stream of transcripts and persists the results."""
+
+    def __init__(
+        self,
+        parser: BaseParser,
+        storage: BaseStateStorage,
+        checkpoint: IngestCheckpoint | None = None,
+        entity_classes: Iterable[type[BaseStateEntity]] | None = None,
+        max_concurrency: int = 8,
+        batch_size: int = 50,
+        diffs_path: str | Path | None = None,
+    ):
+        """
+        Args:
+            parser: Parser used for extraction (async parsers are awaited natively)
+            storage: Storage the extracted diffs are applied to
+            checkpoint: Progress log; None disables resuming
+            entity_classes: Entities to extract (defaults to KbInput.extracts_to)
+            max_concurrency: Records being extracted at the same time
+            batch_size: Records per storage write and checkpoint
+            diffs_path: Optional JSONL file receiving every stored diff
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        self.parser = parser
+        self.storage = storage
+        self.checkpoint = checkpoint
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.diffs_path = Path(diffs_path) if diffs_path is not None else None
+
+        classes = sorted(entity_classes or KbInput.extracts_to, key=lambda c: c.__qualname__)
+        # Transcripts are independent, so schemas are built once and no refs are passed
+        self.entity_contexts = [
+            EntityContext(entity_class=cls, entity_schema=compact_schema(cls))
+            for cls in classes
+        ]
+
+    def run(self, records: Iterable[TranscriptRecord], metrics: IngestMetrics | None = None) -> IngestMetrics:
+        return asyncio.run(self.run_async(records, metrics))
+
+    async def run_async(
+        self, records: Iterable[TranscriptRecord], metrics: IngestMetrics | None = None
+    ) -> IngestMetrics:
+        """
+        Args:
+            records: Transcripts to ingest
+            metrics: Counters to update, e.g. the ones passed to iter_transcripts
+        """
+        metrics = metrics or IngestMetrics()
+        batch: list[tuple[str, list[StateDiff]]] = []
+
+        async for record_id, diffs in self._extract_all(records, metrics):
+            batch.append((record_id, diffs))
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch, metrics)
+                batch = []
+
+        if batch:
+            self._write_batch(batch, metrics)
+
+        metrics.finished_at = time.perf_counter()
+        return metrics
+
+    async def _extract_all(
+        self, records: Iterable[TranscriptRecord], metrics: IngestMetrics
+    ) -> AsyncIterator[tuple[str, list[StateDiff]]]:
+        # Pull from the (possibly huge) iterator only when a slot is free
+        pending: set[asyncio.Task] = set()
+        record_iter = iter(records)
+        exhausted = False
+
+        while True:
+            while not exhausted and len(pending) < self.max_concurrency:
+                record = next(record_iter, None)
+                if record is None:
+                    exhausted = True
+                    break
+                metrics.records_read += 1
+                if self.checkpoint is not None and self.checkpoint.is_completed(record.record_id):
+                    metrics.records_skipped += 1
+                    continue
+                pending.add(asyncio.create_task(self._extract(record)))
+
+            if not pending:
+                return
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                record_id, diffs, error = task.result()
+                if error is not None:
+                    metrics.record_error(error)
+                    continue
+                metrics.diffs_extracted += len(diffs)
+                yield record_id, diffs
+
+    async def _extract(self, record: TranscriptRecord) -> tuple[str, list[StateDiff], Exception | None]:
+        try:
+            diffs = await self.parser.parse_state_diff_async(record.transcript, self.entity_contexts)
+        except Exception as exc:
+            return record.record_id, [], exc
+        return record.record_id, diffs, None
+
+    def _write_batch(self, batch: list[tuple[str, list[StateDiff]]], metrics: IngestMetrics) -> None:
+        written: list[tuple[str, list[StateDiff]]] = []
+        # One apply per record: storages are not guaranteed to roll back a failed
+        # apply, so a shared apply could leave some records stored before failing
+        for record_id, diffs in batch:
+            try:
+                applied = self.storage.apply_state_diffs(diffs)
+            except Exception as exc:
+                metrics.record_error(exc)
+                continue
+            metrics.entities_written += len(applied)
+            written.append((record_id, diffs))
+
+        if self.diffs_path is not None and written:
+            with open(self.diffs_path, "a", encoding="utf-8") as f:
+                for record_id, diffs in written:
+                    for diff in diffs:
+                        f.write(json.dumps({
+                            "record_id": record_id,
+                            "diff": diff.model_dump(mode="json", exclude_none=True),
+                        }) + "\n")
+
+        metrics.records_succeeded += len(written)
+        metrics.batches_written += 1
+        if self.checkpoint is not None:
+            self.checkpoint.mark_completed([record_id for record_id, _ in written])
+
+
+_DECISION_CUES = re.compile(r"\b(decided|agreed|will go with|settled on)\b", re.IGNORECASE)
+_TASK_CUE = re.compile(r"\b([A-Z][a-z]+) (?:will|is going to|should)\b")
+
+
+def fake_kb_responder(messages: list[dict[str, Any]], response_format: type[BaseModel] | None) -> LlmStateDiffs:
+    """
+    Keyword-based stand-in for the LLM, for offline runs with FakeLlmClient.
+
+    Sentences with decision cues become Decisions; sentences naming someone who
+    "will" do something become Tasks assigned to that person.
+    """
+    transcript = messages[-1]["content"]
+    diffs: list[LlmStateDiff] = []
+
+    for sentence in re.split(r"(?<=[.!?])\s+", transcript):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if _DECISION_CUES.search(sentence):
+            diffs.append(LlmStateDiff(
+                entity_class_name="Decision",
+                diffs=[
+                    FieldDiff(field_name="decision_summary", new_value=sentence),
+                    FieldDiff(field_name="participants", new_value=[]),
+                ],
+            ))
+        task_match = _TASK_CUE.search(sentence)
+        if task_match:
+            diffs.append(LlmStateDiff(
+                entity_class_name="Task",
+                diffs=[
+                    FieldDiff(field_name="task_summary", new_value=sentence),
+                    FieldDiff(field_name="assignees", new_value=[task_match.group(1)]),
+                ],
+            ))
+
+    return LlmStateDiffs(diffs=diffs)
+
+
+def main() -> None:
+    from agent.llm.fake_client import FakeAsyncLlmClient
+    from agent.state import DefaultEmbeddingService
+    from agent.misc.in_memory_storage import InMemoryStateStorage
+    from agent.parser.llm_parser import AsyncLlmParser
+
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("transcripts", help="JSONL file with one transcript per line")
+    arg_parser.add_argument("--checkpoint", help="Progress file used to resume interrupted runs")
+    arg_parser.add_argument("--diffs-out", help="JSONL file receiving extracted diffs")
+    arg_parser.add_argument("--concurrency", type=int, default=8)
+    arg_parser.add_argument("--batch-size", type=int, default=50)
+    arg_parser.add_argument("--fake-llm", action="store_true", help="Extract with the offline keyword responder")
+    args = arg_parser.parse_args()
+
+    client = FakeAsyncLlmClient(responder=fake_kb_responder) if args.fake_llm else None
+    pipeline = BulkIngestPipeline(
+        parser=AsyncLlmParser(client=client),
+        storage=InMemoryStateStorage(embedding_service=DefaultEmbeddingService()),
+        checkpoint=IngestCheckpoint(args.checkpoint) if args.checkpoint else None,
+        max_concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        diffs_path=args.diffs_out,
+    )
+    metrics = IngestMetrics()
+    pipeline.run(iter_transcripts(args.transcripts, metrics=metrics), metrics)
+    print(json.dumps(metrics.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+from agent.parser.state_diff import StateDiff
+from agent.state.entity.actor.base_actor import BaseActor
+from agent.state.entity.types import FieldDiff
+
+
+def make_diff(entity_class, *, entity_ref: str | None = None, actor: BaseActor | None = None, **values) -> StateDiff:
+    """StateDiff setting each keyword field path to its value."""
+    return StateDiff(
+        entity_class=entity_class,
+        entity_ref=entity_ref,
+        diffs=[FieldDiff(field_name=k, new_value=v) for k, v in values.items()],
+        actor=actor,
+    )
@@ -0,0 +1,133 @@
+import asyncio
+import time
+import unittest
+from typing import ClassVar
+
+from agent.interaction.channel import BaseChannel
+from agent.interaction.input.base_input import BaseInput
+from agent.parser import AsyncBaseParser, BaseParser, StateDiff, register_parser
+from agent.parser.base_parser import _background_loop
+from agent.state.controller.base_state_controller import BaseStateController
+from agent.state.entity.state_entity import BaseStateEntity
+from agent.state.entity.types import FieldDiff
+from agent.state.storage.one_entity_per_type_storage import OneEntityPerTypeStorage
+
+
+class CityEntity(BaseStateEntity):
+    city: str | None = None
+
+
+class CountryEntity(BaseStateEntity):
+    country: str | None = None
+
+
+class HarbourEntity(BaseStateEntity):
+    harbour: str | None = None
+
+
+class SlowAsyncParser(AsyncBaseParser):
+    def __init__(self, entity_classes, channel_domains, delay: float):
+        super().__init__(entity_classes=entity_classes, channel_domains=channel_domains)
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def parse_state_diff_async(self, input_text, entity_contexts, prior_interactions=None, prior_messages=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return [
+            StateDiff(
+                entity_class=ctx.entity_class,
+                diffs=[FieldDiff(field_name=next(iter(ctx.entity_class.get_domain_fields())), new_value=input_text)],
+            )
+            for ctx in entity_contexts
+        ]
+
+
+class SlowSyncParser(BaseParser):
+    def parse_state_diff(self, input_text, entity_contexts, prior_interactions=None, prior_messages=None):
+        time.sleep(0.05)
+        return [
+            StateDiff(entity_class=ctx.entity_class, diffs=[FieldDiff(field_name="harbour", new_value=input_text)])
+            for ctx in entity_contexts
+        ]
+
+
+ASYNC_DOMAIN = "async-parse-test"
+CITY_PARSER = SlowAsyncParser([CityEntity], [ASYNC_DOMAIN], delay=0.1)
+COUNTRY_PARSER = SlowAsyncParser([CountryEntity], [ASYNC_DOMAIN], delay=0.01)
+register_parser(CITY_PARSER)
+register_parser(COUNTRY_PARSER)
+register_parser(SlowSyncParser([HarbourEntity], [ASYNC_DOMAIN]))
+
+
+class TravelInput(BaseInput):
+    channel: ClassVar[BaseChannel] = BaseChannel(channel_domain=ASYNC_DOMAIN, channel_id="async-test")
+    extracts_to: ClassVar[set] = {CityEntity, CountryEntity, HarbourEntity}
+    input_value: str
+
+
+class TestAsyncParse(unittest.TestCase):
+    def _controller(self, **kwargs) -> BaseStateController:
+        return BaseStateController(
+            storage=OneEntityPerTypeStorage(entity_classes=[CityEntity, CountryEntity, HarbourEntity]),
+            **kwargs,
+        )
+
+    def test_blocking_parse_on_the_parser_loop_raises(self):
+        async def parse_blocking():
+            return CITY_PARSER.parse_state_diff("Split", [])
+
+        future = asyncio.run_coroutine_threadsafe(parse_blocking(), _background_loop())
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=5)
+
+    def test_async_diffs_match_sync_order(self):
+        inputs = [TravelInput(input_value="first"), TravelInput(input_value="second")]
+
+        sync_diffs = self._controller().parse_state_diffs(inputs)
+        async_diffs = asyncio.run(self._controller().parse_state_diffs_async(inputs))
+
+        def summarize(diffs):
+            return [(d.entity_class, d.diffs[0].new_value) for d in diffs]
+
+        self.assertEqual(summarize(sync_diffs), summarize(async_diffs))
+        self.assertEqual(len(async_diffs), 6)
+
+    def test_groups_run_concurrently(self):
+        inputs = [TravelInput(input_value=f"input-{i}") for i in range(4)]
+        controller = self._controller(max_parse_concurrency=16)
+
+        started = time.perf_counter()
+        asyncio.run(controller.parse_state_diffs_async(inputs))
+        elapsed = time.perf_counter() - started
+
+        # 4 inputs x 3 parsers sequentially would take well over a second
+        self.assertLess(elapsed, 0.5)
+        self.assertGreater(CITY_PARSER.max_in_flight, 1)
+
+    def test_concurrency_is_bounded(self):
+        CITY_PARSER.max_in_flight = 0
+        COUNTRY_PARSER.max_in_flight = 0
+        inputs = [TravelInput(input_value=f"input-{i}") for i in range(6)]
+        controller = self._controller(max_parse_concurrency=1)
+
+        asyncio.run(controller.parse_state_diffs_async(inputs))
+
+        self.assertEqual(CITY_PARSER.max_in_flight, 1)
+        self.assertEqual(COUNTRY_PARSER.max_in_flight, 1)
+
+    def test_update_state_async_applies_diffs(self):
+        controller = self._controller()
+        applied = asyncio.run(controller.update_state_async([TravelInput(input_value="Split")]))
+
+        self.assertEqual(len(applied), 3)
+        entities = {type(e): e for e in controller.storage.get_all()}
+        self.assertEqual(entities[CityEntity].city, "Split")
+        self.assertEqual(entities[HarbourEntity].harbour, "Split")
+
+
+if __name__ == '__main__':
+    unittest.main()
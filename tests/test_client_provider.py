@@ -0,0 +1,121 @@
+import importlib.util
+import json
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agent.llm.client_provider import LlmClientProvider, PoolConfig
+
+HAS_HTTP_STACK = importlib.util.find_spec("openai") is not None
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections: set[int] = set()
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.lock:
+            self.connections.add(self.client_address[1])
+        time.sleep(0.1)
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "ok"}}],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@unittest.skipUnless(HAS_HTTP_STACK, "openai is required")
+class TestClientProvider(unittest.TestCase):
+    def setUp(self):
+        _StubHandler.connections = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.provider = LlmClientProvider(
+            pool=PoolConfig(max_connections=2, max_keepalive_connections=2),
+            api_key="sk-test",
+            base_url=f"http://127.0.0.1:{self.server.server_port}/v1",
+            max_retries=0,
+        )
+
+    def tearDown(self):
+        self.provider.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _complete(self, _):
+        return self.provider.client().chat.completions.create(
+            model="stub", messages=[{"role": "user", "content": "hi"}]
+        ).choices[0].message.content
+
+    def test_requests_share_a_bounded_keep_alive_pool(self):
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            results = list(pool.map(self._complete, range(12)))
+
+        metrics = self.provider.metrics
+        self.assertEqual(results, ["ok"] * 12)
+        self.assertIs(self.provider.client(), self.provider.client())
+        self.assertEqual(metrics.requests_completed, 12)
+        self.assertEqual(metrics.in_flight, 0)
+        self.assertGreater(metrics.saturated_requests, 0)
+        # Connections are reused instead of opened per request
+        self.assertLessEqual(len(_StubHandler.connections), 2)
+
+    def test_async_clients_are_reused_and_closed(self):
+        import asyncio
+
+        async def complete():
+            client = self.provider.async_client()
+            response = await client.chat.completions.create(
+                model="stub", messages=[{"role": "user", "content": "hi"}]
+            )
+            return client, response.choices[0].message.content
+
+        loop = asyncio.new_event_loop()
+        try:
+            first, content = loop.run_until_complete(complete())
+            second, _ = loop.run_until_complete(complete())
+            self.assertEqual(content, "ok")
+            self.assertIs(first, second)
+            unbound = self.provider.async_client()
+            self.assertIs(unbound, self.provider.async_client())
+
+            self.provider.close()
+            self.assertTrue(first.is_closed())
+            self.assertTrue(unbound.is_closed())
+        finally:
+            loop.close()
+
+    def test_sdk_retries_are_left_to_the_executor(self):
+        self.assertEqual(LlmClientProvider(api_key="sk-test").client().max_retries, 0)
+        self.assertEqual(LlmClientProvider(api_key="sk-test", max_retries=2).async_client().max_retries, 2)
+
+    def test_parsers_borrow_the_default_client(self):
+        from agent.llm import client_provider
+        from agent.parser import LlmParser
+
+        previous = client_provider.get_default_client_provider()
+        client_provider.set_default_client_provider(self.provider)
+        try:
+            self.assertIs(LlmParser().client, LlmParser().client)
+            self.assertIs(LlmParser().client, self.provider.client())
+        finally:
+            client_provider.set_default_client_provider(previous)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from datetime import datetime
+
+from agent.state import ColumnarStateStorage
+from agent.state.entity.actor.base_actor import BaseActor
+from examples.boat_booking.state_entity import BoatSpecEntity, DatesAndDurationEntity
+from examples.knowledge_base.state_entities import Decision, Task
+from tests.helpers import make_diff
+
+
+class TestColumnarStateStorage(unittest.TestCase):
+    def setUp(self):
+        self.storage = ColumnarStateStorage()
+        self.storage.apply_state_diffs([
+            make_diff(Task, task_summary="Migrate database from crdb to postgres", assignees=["Omar", "Lena"]),
+            make_diff(Decision, actor=BaseActor(id="u1"), decision_summary="Punt API migration", participants=["Lena"]),
+            make_diff(Task, task_summary="Send a release email", assignees=[]),
+            make_diff(BoatSpecEntity, boat_type="catamaran", boat_length_ft=40),
+            make_diff(DatesAndDurationEntity, trip_start_date="2026-06-01T10:00:00", number_of_days=7),
+        ])
+
+    def test_round_trips_entities_in_insertion_order(self):
+        entities = self.storage.get_all()
+
+        self.assertEqual([type(e) for e in entities], [Task, Decision, Task, BoatSpecEntity, DatesAndDurationEntity])
+        self.assertEqual(entities[0].assignees, ["Omar", "Lena"])
+        self.assertEqual(entities[1].actors, [BaseActor(id="u1")])
+        self.assertEqual(entities[3].boat_length_ft, 40)
+        self.assertEqual(entities[4].trip_start_date, datetime(2026, 6, 1, 10))
+        self.assertEqual(entities[3].get_missing_fields(), ["number_of_cabins"])
+
+        restored = ColumnarStateStorage.from_json(self.storage.to_json())
+        self.assertEqual(
+            [e.domain_dump() for e in restored.get_all()], [e.domain_dump() for e in entities]
+        )
+        self.assertEqual(restored.get_all()[1].actors, [BaseActor(id="u1")])
+
+    def test_json_keeps_embeddings(self):
+        self.storage.add_entities([Task(task_summary="Book the venue", assignees=[], embedding=[0.25, -1.0])])
+
+        restored = ColumnarStateStorage.from_json(self.storage.to_json())
+        self.assertEqual(restored.get_all()[-1].embedding, [0.25, -1.0])
+        self.assertIsNone(restored.get_all()[0].embedding)
+
+    def test_filter(self):
+        self.assertEqual(
+            [t.task_summary for t in self.storage.filter(Task, assignees="Lena")],
+            ["Migrate database from crdb to postgres"],
+        )
+        self.assertEqual(self.storage.count(Task), 2)
+        self.assertEqual(self.storage.count(BoatSpecEntity, boat_type="catamaran", number_of_cabins=None), 1)
+        self.assertEqual(self.storage.count(Decision, decision_summary="Punt API migration"), 1)
+        with self.assertRaises(ValueError):
+            self.storage.filter(Task, owner="Omar")
+
+    def test_completion(self):
+        incomplete = self.storage.get_incomplete_entities()
+
+        self.assertEqual([type(e) for e in incomplete], [BoatSpecEntity, DatesAndDurationEntity])
+        self.assertFalse(self.storage.is_state_completed())
+
+
+if __name__ == '__main__':
+    unittest.main()
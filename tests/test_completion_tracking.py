@@ -0,0 +1,64 @@
+import unittest
+
+from agent.misc.embedding_service import DefaultEmbeddingService
+from agent.misc.in_memory_storage import InMemoryStateStorage
+from agent.state.entity.types import FieldDiff
+from agent.state.storage.one_entity_per_type_storage import OneEntityPerTypeStorage
+from examples.boat_booking.state_entity import BoatSpecEntity, DatesAndDurationEntity, DesiredLocationEntity
+from tests.helpers import make_diff
+
+
+class TestCompletionTracking(unittest.TestCase):
+    def test_entity_missing_fields_follow_updates(self):
+        entity = DatesAndDurationEntity()
+        self.assertEqual(len(entity.get_missing_fields()), 3)
+
+        entity.update_fields([FieldDiff(field_name="number_of_days", new_value=7)])
+        self.assertEqual(entity.get_missing_fields(), ["trip_start_date", "trip_end_date"])
+
+        entity.trip_start_date = None
+        entity.number_of_days = None
+        self.assertIn("number_of_days", entity.get_missing_fields())
+        self.assertFalse(entity.is_completed())
+
+        copied = entity.model_copy(update={"number_of_days": 3})
+        self.assertNotIn("number_of_days", copied.get_missing_fields())
+        self.assertIn("number_of_days", entity.get_missing_fields())
+
+    def test_one_entity_per_type_index(self):
+        storage = OneEntityPerTypeStorage([DesiredLocationEntity, BoatSpecEntity])
+        self.assertFalse(storage.is_state_completed())
+
+        storage.apply_state_diffs([
+            make_diff(BoatSpecEntity, boat_type="catamaran"),
+            make_diff(DesiredLocationEntity, country="Croatia"),
+        ])
+        self.assertEqual(
+            [type(e) for e in storage.get_incomplete_entities()], [DesiredLocationEntity, BoatSpecEntity]
+        )
+
+        storage.apply_state_diffs([
+            make_diff(BoatSpecEntity, boat_length_ft=40, number_of_cabins=3),
+            make_diff(DesiredLocationEntity, region="Dalmatia", city="Split"),
+        ])
+        self.assertEqual(storage.get_incomplete_entities(), [])
+        self.assertTrue(storage.is_state_completed())
+
+        restored = OneEntityPerTypeStorage.from_json(storage.to_json())
+        self.assertTrue(restored.is_state_completed())
+
+    def test_in_memory_index(self):
+        storage = InMemoryStateStorage(embedding_service=DefaultEmbeddingService())
+        storage.add_entities([
+            DesiredLocationEntity(country="Greece", region="Attica", city="Athens"),
+            DesiredLocationEntity(country="Greece"),
+        ])
+
+        incomplete = storage.get_incomplete_entities()
+        self.assertEqual([e.country for e in incomplete], ["Greece"])
+        self.assertIsNone(incomplete[0].city)
+        self.assertFalse(storage.is_state_completed())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from agent.misc.embedding_service import DefaultEmbeddingService
+from agent.misc.in_memory_storage import InMemoryStateStorage
+from agent.misc.mmap_embedding_store import MmapEmbeddingStore
+from agent.misc.vector_index import ExactVectorIndex
+from examples.boat_booking.state_entity import DesiredLocationEntity
+
+
+class _CountingEmbeddingService(DefaultEmbeddingService):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def embed(self, entity):
+        self.calls += 1
+        return super().embed(entity)
+
+
+class TestMmapEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "vectors.f32"
+        self.vectors = np.random.default_rng(5).normal(size=(500, 24)).astype(np.float32)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_search_matches_exact_index(self):
+        store = MmapEmbeddingStore(self.path)
+        exact = ExactVectorIndex()
+        for i, vector in enumerate(self.vectors):
+            store.add(vector, key=f"e{i}")
+            exact.add(vector)
+
+        for query in self.vectors[:5] + 0.1:
+            rows, scores = store.search(query, k=7, threshold=0.1)
+            expected_rows, expected_scores = exact.search(query, k=7, threshold=0.1)
+            self.assertEqual(rows.tolist(), expected_rows.tolist())
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+        np.testing.assert_array_equal(store.vector(42), self.vectors[42])
+        self.assertEqual(self.path.stat().st_size, self.vectors.nbytes)
+
+    def test_reader_sees_appends_after_refresh(self):
+        writer = MmapEmbeddingStore(self.path)
+        for i, vector in enumerate(self.vectors[:100]):
+            writer.add(vector, key=f"e{i}")
+        writer.flush()
+
+        reader = MmapEmbeddingStore(self.path, read_only=True)
+        self.assertEqual(len(reader), 100)
+        self.assertEqual(reader.rows["e99"], 99)
+        with self.assertRaises(ValueError):
+            reader.add(self.vectors[0])
+
+        writer.add(self.vectors[100], key="e100")
+        writer.flush()
+        self.assertEqual(reader.refresh(), 101)
+        rows, _ = reader.search(self.vectors[100], k=1)
+        self.assertEqual(reader.keys[rows[0]], "e100")
+        writer.close()
+
+    def test_reopen_drops_torn_row(self):
+        writer = MmapEmbeddingStore(self.path)
+        writer.add(self.vectors[0], key="a")
+        writer.close()
+        with open(self.path, "ab") as data:
+            data.write(self.vectors[1].tobytes()[:10])
+
+        reopened = MmapEmbeddingStore(self.path)
+        self.assertEqual(len(reopened), 1)
+        self.assertEqual(reopened.add(self.vectors[1], key="b"), 1)
+        np.testing.assert_array_equal(reopened.vector(1), self.vectors[1])
+
+    def test_storage_keeps_vectors_out_of_entities(self):
+        service = _CountingEmbeddingService()
+        storage = InMemoryStateStorage(service, vector_index=MmapEmbeddingStore(self.path))
+        entities = [DesiredLocationEntity(city=f"c{i}", embedding=v.tolist()) for i, v in enumerate(self.vectors[:50])]
+        storage.add_entities(entities)
+
+        self.assertTrue(all(entity.embedding is None for entity in entities))
+        results = storage.get_similar(entities[3], threshold=0.99, limit=1)
+        self.assertIs(results[0][0], entities[3])
+        self.assertEqual(service.calls, 0)
+        entity_id = storage.chronological_ids[3]
+        np.testing.assert_array_equal(storage.get_embedding(entity_id), self.vectors[3])
+        self.assertEqual(storage.vector_index.rows[entity_id], 3)
+
+        # A persisted store's rows do not belong to a fresh storage
+        storage.vector_index.close()
+        with self.assertRaises(ValueError):
+            InMemoryStateStorage(service, vector_index=MmapEmbeddingStore(self.path))
+
+    def test_worker_attaches_read_only_store(self):
+        service = _CountingEmbeddingService()
+        writer = InMemoryStateStorage(service, vector_index=MmapEmbeddingStore(self.path))
+        writer.add_entities([DesiredLocationEntity(city=f"c{i}", embedding=v.tolist()) for i, v in enumerate(self.vectors[:20])])
+        writer.vector_index.flush()
+
+        store = MmapEmbeddingStore(self.path, read_only=True)
+        entities = {entity_id: writer.entities[entity_id].model_copy() for entity_id in writer.chronological_ids}
+        worker = InMemoryStateStorage.from_vector_index(store, entities, service)
+
+        self.assertIs(worker.vector_index, store)
+        self.assertEqual(worker.chronological_ids, writer.chronological_ids)
+        self.assertEqual(worker.embedding_rows, writer.embedding_rows)
+        query = worker.get_all()[7]
+        results = worker.get_similar(query, threshold=0.99, limit=1)
+        self.assertIs(results[0][0], query)
+        self.assertEqual(service.calls, 0)
+
+        del entities[writer.chronological_ids[0]]
+        with self.assertRaises(ValueError):
+            InMemoryStateStorage.from_vector_index(store, entities, service)
+
+    def test_load_snapshot_reuses_matching_store(self):
+        service = _CountingEmbeddingService()
+        storage = InMemoryStateStorage(service, vector_index=MmapEmbeddingStore(self.path))
+        storage.add_entities([DesiredLocationEntity(city=f"c{i}", embedding=v.tolist()) for i, v in enumerate(self.vectors[:20])])
+        snapshot = Path(self.tmp.name) / "snapshot"
+        storage.save_snapshot(snapshot)
+        storage.vector_index.close()
+
+        store = MmapEmbeddingStore(self.path, read_only=True)
+        loaded = InMemoryStateStorage.load_snapshot(snapshot, service, vector_index=store)
+
+        self.assertIs(loaded.vector_index, store)
+        self.assertEqual(len(store), 20)
+        np.testing.assert_array_equal(loaded.get_embedding(loaded.chronological_ids[4]), self.vectors[4])
+        self.assertEqual(loaded.get_similar(loaded.get_all()[4], threshold=0.99, limit=1)[0][0].city, "c4")
+
+
+if __name__ == '__main__':
+    unittest.main()
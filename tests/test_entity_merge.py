@@ -0,0 +1,59 @@
+import unittest
+from datetime import datetime
+
+from agent.misc.embedding_service import DefaultEmbeddingService
+from agent.misc.in_memory_storage import InMemoryStateStorage
+from agent.state.entity.state_entity import EntityMergeValidationError, ValidationErrorHandlingMode
+from examples.boat_booking.state_entity import DatesAndDurationEntity
+from examples.knowledge_base.state_entities import Task
+from tests.helpers import make_diff
+
+
+class TestEntityMerge(unittest.TestCase):
+    def test_values_are_coerced_to_field_types(self):
+        state_diff = make_diff(DatesAndDurationEntity, trip_start_date="2026-06-01T10:00:00", number_of_days="7")
+
+        entity, applied = DatesAndDurationEntity.merge(None, state_diff)
+
+        self.assertEqual(entity.trip_start_date, datetime(2026, 6, 1, 10))
+        self.assertEqual(entity.number_of_days, 7)
+        self.assertIs(applied, state_diff)
+        self.assertEqual(entity.get_missing_fields(), ["trip_end_date"])
+
+    def test_invalid_values_are_reported(self):
+        current = DatesAndDurationEntity(number_of_days=3)
+        state_diff = make_diff(DatesAndDurationEntity, trip_end_date="next week", number_of_days=5)
+
+        entity, applied = DatesAndDurationEntity.merge(current, state_diff)
+        self.assertEqual(entity.number_of_days, 3)
+        self.assertEqual(applied.diffs, [])
+        self.assertEqual(len(applied.validation_errors), 1)
+        self.assertTrue(applied.validation_errors[0].startswith("DatesAndDurationEntity.trip_end_date"))
+
+        entity, applied = DatesAndDurationEntity.merge(
+            current, state_diff, on_validation_error=ValidationErrorHandlingMode.ignore
+        )
+        self.assertEqual(entity.number_of_days, 5)
+        self.assertIsNone(entity.trip_end_date)
+        self.assertEqual([d.field_name for d in applied.diffs], ["number_of_days"])
+
+        with self.assertRaises(EntityMergeValidationError):
+            DatesAndDurationEntity.merge(
+                current, state_diff, on_validation_error=ValidationErrorHandlingMode.raise_exception
+            )
+
+    def test_unknown_and_required_fields(self):
+        entity, applied = Task.merge(None, make_diff(Task, assignees=["Omar"], owner="Omar"))
+
+        self.assertIsNone(entity)
+        self.assertEqual(len(applied.validation_errors), 2)
+
+        storage = InMemoryStateStorage(embedding_service=DefaultEmbeddingService())
+        with self.assertRaises(EntityMergeValidationError):
+            storage.apply_state_diffs([make_diff(Task, assignees=["Omar"])])
+        storage.apply_state_diffs([make_diff(Task, task_summary="Send a release email", assignees=["Omar"])])
+        self.assertEqual(len(storage.get_all()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
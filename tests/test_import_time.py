@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+HEAVY_MODULES = ("openai", "httpx", "numpy", "textual")
+
+
+def _loaded_after(statement: str) -> set[str]:
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    env["PYTHONPATH"] = str(SRC_DIR)
+    result = subprocess.run(
+        [sys.executable, "-c", f"{statement}\nimport sys\nprint(' '.join(m.split('.')[0] for m in sys.modules))"],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    return set(result.stdout.split()).intersection(HEAVY_MODULES)
+
+
+class TestImportTime(unittest.TestCase):
+    def test_package_imports_stay_light(self):
+        for module in ("agent.parser", "agent.state", "agent.base_agent",
+                       "agent.interaction.output.controller.llm_chat_outputs_controller"):
+            with self.subTest(module=module):
+                self.assertEqual(_loaded_after(f"import {module}"), set())
+
+    def test_default_registry_does_not_build_a_client(self):
+        # No OPENAI_API_KEY in the child: constructing OpenAI() would raise
+        loaded = _loaded_after(
+            "from agent.parser import get_parser_for_entity\n"
+            "from examples.boat_booking.state_entity import BoatSpecEntity\n"
+            "assert get_parser_for_entity(BoatSpecEntity) is not None"
+        )
+        self.assertEqual(loaded, set())
+
+    def test_lazy_exports_resolve(self):
+        self.assertEqual(_loaded_after("from agent.state import InMemoryStateStorage"), {"numpy"})
+
+
+if __name__ == '__main__':
+    unittest.main()
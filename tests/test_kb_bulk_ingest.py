@@ -0,0 +1,128 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from agent.llm.fake_client import FakeAsyncLlmClient
+from agent.state import DefaultEmbeddingService
+from agent.misc.in_memory_storage import InMemoryStateStorage
+from agent.parser.llm_parser import AsyncLlmParser
+from examples.knowledge_base.bulk_ingest import (
+    BulkIngestPipeline,
+    IngestCheckpoint,
+    IngestMetrics,
+    fake_kb_responder,
+    iter_transcripts,
+)
+from examples.knowledge_base.state_entities import Decision, Task
+
+TRANSCRIPTS = [
+    {"id": "call-1", "transcript": "We decided to use mysql. Jack will handle the install."},
+    {"id": "call-2", "transcript": "Maria will send the release email."},
+    {"id": "call-3", "transcript": "We agreed to punt the API migration."},
+    {"id": "call-4", "transcript": "Small talk about the weather."},
+    {"id": "call-5", "transcript": "Omar will draft the vendor training doc."},
+]
+
+
+class TestKbBulkIngest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self.transcripts_path = self.tmp / "transcripts.jsonl"
+        self.transcripts_path.write_text("\n".join(json.dumps(row) for row in TRANSCRIPTS) + "\n")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _pipeline(self, responder, checkpoint=None, **kwargs) -> BulkIngestPipeline:
+        return BulkIngestPipeline(
+            parser=AsyncLlmParser(client=FakeAsyncLlmClient(responder=responder, latency_seconds=0.01)),
+            storage=InMemoryStateStorage(embedding_service=DefaultEmbeddingService()),
+            checkpoint=checkpoint,
+            max_concurrency=2,
+            batch_size=2,
+            **kwargs,
+        )
+
+    def test_extracts_tasks_and_decisions(self):
+        diffs_path = self.tmp / "diffs.jsonl"
+        pipeline = self._pipeline(fake_kb_responder, diffs_path=diffs_path)
+
+        metrics = pipeline.run(iter_transcripts(self.transcripts_path))
+
+        entities = pipeline.storage.get_all()
+        self.assertEqual(metrics.records_succeeded, 5)
+        self.assertEqual(metrics.batches_written, 3)
+        self.assertEqual(sum(isinstance(e, Task) for e in entities), 3)
+        self.assertEqual(sum(isinstance(e, Decision) for e in entities), 2)
+        self.assertEqual(len(diffs_path.read_text().splitlines()), metrics.entities_written)
+
+    def test_resumes_after_failures(self):
+        checkpoint_path = self.tmp / "checkpoint.txt"
+
+        def flaky_responder(messages, response_format):
+            if "Maria" in messages[-1]["content"]:
+                raise ConnectionError("upstream went away")
+            return fake_kb_responder(messages, response_format)
+
+        first = self._pipeline(flaky_responder, checkpoint=IngestCheckpoint(checkpoint_path))
+        first_metrics = first.run(iter_transcripts(self.transcripts_path))
+        self.assertEqual(first_metrics.records_failed, 1)
+        self.assertEqual(first_metrics.errors["ConnectionError"], 1)
+
+        second = self._pipeline(fake_kb_responder, checkpoint=IngestCheckpoint(checkpoint_path))
+        second_metrics = second.run(iter_transcripts(self.transcripts_path))
+        self.assertEqual(second_metrics.records_skipped, 4)
+        self.assertEqual(second_metrics.records_succeeded, 1)
+        self.assertEqual(second.parser.client.calls, 1)
+
+    def test_invalid_diffs_only_fail_their_record(self):
+        def responder(messages, response_format):
+            response = fake_kb_responder(messages, response_format)
+            if "Omar" in messages[-1]["content"]:
+                # Task.task_summary is required, so the storage rejects this one
+                response.diffs[0].diffs = response.diffs[0].diffs[1:]
+            return response
+
+        metrics = self._pipeline(responder).run(iter_transcripts(self.transcripts_path))
+
+        self.assertEqual(metrics.records_failed, 1)
+        self.assertEqual(metrics.records_succeeded, 4)
+
+    def test_failed_record_does_not_store_its_batch_twice(self):
+        def responder(messages, response_format):
+            response = fake_kb_responder(messages, response_format)
+            if "mysql" in messages[-1]["content"]:
+                # The Task is stored before the Decision, which the storage
+                # rejects since decision_summary is required
+                decision, task = response.diffs
+                decision.diffs = decision.diffs[1:]
+                response.diffs = [task, decision]
+            return response
+
+        pipeline = self._pipeline(responder)
+        metrics = pipeline.run(iter_transcripts(self.transcripts_path))
+
+        tasks = [e.task_summary for e in pipeline.storage.get_all() if isinstance(e, Task)]
+        self.assertEqual(len(tasks), len(set(tasks)))
+        self.assertEqual(metrics.records_failed, 1)
+        self.assertEqual(metrics.entities_written, 3)
+
+    def test_malformed_lines_are_counted(self):
+        with open(self.transcripts_path, "a") as f:
+            f.write('{"id": "call-6", "transcr\n{"id": "call-7"}\n')
+
+        metrics = IngestMetrics()
+        self._pipeline(fake_kb_responder).run(iter_transcripts(self.transcripts_path, metrics=metrics), metrics)
+
+        self.assertEqual(metrics.records_read, 7)
+        self.assertEqual(metrics.records_succeeded, 5)
+        self.assertEqual(metrics.records_failed, 2)
+        self.assertEqual(metrics.errors, {"JSONDecodeError": 1, "KeyError": 1})
+        with self.assertRaises(ValueError):
+            list(iter_transcripts(self.transcripts_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import itertools
+import unittest
+
+from agent.llm import FakeLlmClient, ModelRoutingPolicy, ModelTier
+from agent.parser import EntityContext, LlmParser, LlmResponseError
+from agent.parser.state_diff import LlmStateDiff, LlmStateDiffs
+from agent.state.entity.types import FieldDiff
+from examples.boat_booking.state_entity import BoatSpecEntity, DesiredLocationEntity
+
+ENTITY_CLASSES = [BoatSpecEntity, DesiredLocationEntity]
+
+
+def _contexts() -> list[EntityContext]:
+    return [EntityContext(entity_class=cls, entity_schema=cls.model_json_schema()) for cls in ENTITY_CLASSES]
+
+
+def _answer(entity_class_name: str, field_name: str, value) -> LlmStateDiffs:
+    return LlmStateDiffs(diffs=[
+        LlmStateDiff(entity_class_name=entity_class_name, diffs=[FieldDiff(field_name=field_name, new_value=value)])
+    ])
+
+
+GOOD = _answer("BoatSpecEntity", "boat_length_ft", 40)
+
+
+def _sequence(*answers):
+    remaining = iter(answers)
+    return lambda messages, response_format: next(remaining)
+
+
+class TestModelRouting(unittest.TestCase):
+    def _parser(self, responder, tiers=("gpt-4o-mini", "gpt-4o")):
+        self.client = FakeLlmClient(responder=responder)
+        self.policy = ModelRoutingPolicy(list(tiers))
+        return LlmParser(client=self.client, entity_classes=ENTITY_CLASSES, routing_policy=self.policy)
+
+    def _models(self) -> list[str]:
+        return [request["model"] for request in self.client.requests]
+
+    def test_simple_turn_stays_on_the_first_tier(self):
+        diffs = self._parser(_sequence(GOOD)).parse_state_diff("40 ft", _contexts())
+
+        self.assertEqual(self._models(), ["gpt-4o-mini"])
+        self.assertEqual(diffs[0].diffs[0].new_value, 40)
+        self.assertEqual(self.policy.as_dict()["tiers"]["gpt-4o-mini"]["escalation_rate"], 0.0)
+
+    def test_escalation_triggers(self):
+        cases = {
+            "schema_parse_failure": "",
+            "unknown_entity_class": _answer("BoatEntity", "boat_length_ft", 40),
+            "validation_error": _answer("BoatSpecEntity", "boat_length_ft", "forty-ish"),
+        }
+        for reason, bad_answer in cases.items():
+            with self.subTest(reason=reason):
+                diffs = self._parser(_sequence(bad_answer, GOOD)).parse_state_diff("40 ft", _contexts())
+
+                self.assertEqual(self._models(), ["gpt-4o-mini", "gpt-4o"])
+                self.assertEqual(diffs[0].diffs[0].new_value, 40)
+                self.assertEqual(dict(self.policy.escalation_reasons), {reason: 1})
+                self.assertEqual(self.policy.stats["gpt-4o-mini"].escalation_rate, 1.0)
+
+    def test_low_agreement_escalates(self):
+        other = _answer("DesiredLocationEntity", "city", "Split")
+        answers = itertools.chain([GOOD, other, GOOD], itertools.repeat(GOOD))
+        parser = self._parser(
+            lambda messages, response_format: next(answers),
+            tiers=(ModelTier(model="gpt-4o-mini", samples=3, min_agreement=1.0), ModelTier(model="gpt-4o")),
+        )
+
+        parser.parse_state_diff("40 ft in Split", _contexts())
+
+        self.assertEqual(self._models(), ["gpt-4o-mini", "gpt-4o"])
+        self.assertEqual(dict(self.policy.escalation_reasons), {"low_agreement": 1})
+
+    def test_last_tier_answer_is_accepted(self):
+        bad = _answer("BoatSpecEntity", "boat_length_ft", "forty-ish")
+        diffs = self._parser(_sequence(bad, bad)).parse_state_diff("40 ft", _contexts())
+
+        self.assertEqual(len(diffs), 1)
+        self.assertEqual(self.policy.stats["gpt-4o"].escalations, 0)
+
+    def test_unparseable_last_tier_answer_raises(self):
+        parser = self._parser(_sequence("", "I can't help with that"))
+        with self.assertRaises(LlmResponseError):
+            parser.parse_state_diff("40 ft", _contexts())
+        self.assertEqual(self._models(), ["gpt-4o-mini", "gpt-4o"])
+
+        # Nothing to extract is still an empty result
+        self.assertEqual(self._parser(_sequence(LlmStateDiffs(diffs=[]))).parse_state_diff("hi", _contexts()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
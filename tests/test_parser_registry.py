@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+from typing import ClassVar
+
+from agent.interaction.channel import BaseChannel
+from agent.interaction.input.base_input import BaseInput
+from agent.parser import BaseParser, ParserRegistry, RuleBasedParser
+from agent.parser.state_diff import StateDiff
+from agent.state.controller.base_state_controller import BaseStateController
+from agent.state.entity.types import FieldDiff
+from agent.state.storage.one_entity_per_type_storage import OneEntityPerTypeStorage
+from examples.boat_booking.state_entity import BoatSpecEntity, DatesAndDurationEntity, DesiredLocationEntity
+
+
+class BookingInput(BaseInput):
+    channel: ClassVar[BaseChannel] = BaseChannel(channel_domain="chat", channel_id="registry-test")
+    extracts_to: ClassVar[set] = {BoatSpecEntity, DatesAndDurationEntity, DesiredLocationEntity}
+    input_value: str
+
+
+class LegacyParser(BaseParser):
+    """Written against the signature without prior_messages."""
+
+    def parse_state_diff(self, input_text, entity_contexts, prior_interactions=None):
+        return [StateDiff(entity_class=BoatSpecEntity, diffs=[FieldDiff(field_name="boat_length_ft", new_value=len(input_text))])]
+
+
+class TestParserRegistry(unittest.TestCase):
+    def test_plan_groups_classes_by_parser_and_is_cached(self):
+        registry = ParserRegistry()
+        fallback = RuleBasedParser(entity_classes=[BoatSpecEntity, DatesAndDurationEntity, DesiredLocationEntity])
+        dates = RuleBasedParser(entity_classes=[DatesAndDurationEntity], channel_domains=["chat"])
+        registry.register(fallback)
+        registry.register(dates)
+
+        plan = registry.get_extraction_plan(BookingInput, "chat")
+
+        self.assertIs(plan, registry.get_extraction_plan(BookingInput, "chat"))
+        groups = {group.parser: group.entity_classes for group in plan.groups}
+        self.assertEqual(groups[dates], (DatesAndDurationEntity,))
+        self.assertEqual(set(groups[fallback]), {BoatSpecEntity, DesiredLocationEntity})
+        self.assertIsNotNone(plan.groups[0].entity_contexts[0].entity_schema)
+
+    def test_register_invalidates_plans(self):
+        registry = ParserRegistry()
+        first = RuleBasedParser(entity_classes=[BoatSpecEntity, DatesAndDurationEntity, DesiredLocationEntity])
+        registry.register(first)
+        stale_plan = registry.get_extraction_plan(BookingInput, "chat")
+
+        second = RuleBasedParser(entity_classes=[BoatSpecEntity])
+        registry.register(second)
+        plan = registry.get_extraction_plan(BookingInput, "chat")
+
+        self.assertIsNot(plan, stale_plan)
+        self.assertIs(registry.get_parser(BoatSpecEntity, "chat"), second)
+
+    def test_missing_parser_raises(self):
+        with self.assertRaises(ValueError):
+            ParserRegistry().get_extraction_plan(BookingInput, "chat")
+
+    def test_parsers_without_prior_messages_still_run(self):
+        self.assertFalse(LegacyParser.accepts_prior_messages)
+        self.assertTrue(RuleBasedParser.accepts_prior_messages)
+
+        registry = ParserRegistry()
+        registry.register(LegacyParser(entity_classes=[BoatSpecEntity, DatesAndDurationEntity, DesiredLocationEntity],
+                                       channel_domains=[None]))
+        controller = BaseStateController(
+            storage=OneEntityPerTypeStorage([BoatSpecEntity]), parser_registry=registry
+        )
+
+        self.assertEqual(len(controller.parse_state_diffs([BookingInput(input_value="40ft")])), 1)
+        self.assertEqual(len(list(controller.update_state_streaming([BookingInput(input_value="45ft")]))), 1)
+        asyncio.run(controller.update_state_async([BookingInput(input_value="a 50ft")]))
+        self.assertEqual(controller.storage.get_all()[0].boat_length_ft, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from agent.llm.request_executor import DeadlineExceeded, RequestExecutor, deadline
+
+
+def _primed_executor(key: str = "parse", latency: float = 0.01, **kwargs) -> RequestExecutor:
+    executor = RequestExecutor(min_samples=5, base_backoff=0.001, **kwargs)
+    for _ in range(5):
+        executor.tracker(key).record(latency)
+    return executor
+
+
+class TestRequestExecutor(unittest.TestCase):
+    def test_slow_call_is_hedged(self):
+        executor = _primed_executor()
+        calls = []
+        lock = threading.Lock()
+
+        def request():
+            with lock:
+                calls.append(None)
+                slow = len(calls) == 1
+            time.sleep(1.0 if slow else 0.01)
+            return "slow" if slow else "hedge"
+
+        started = time.perf_counter()
+        result = executor.call(request, key="parse")
+
+        self.assertEqual(result, "hedge")
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(executor.stats.hedge_wins, 1)
+
+    def test_no_hedging_without_enough_samples(self):
+        executor = RequestExecutor(min_samples=5)
+        self.assertIsNone(executor.hedge_delay("parse"))
+        self.assertEqual(executor.call(lambda: 42, key="parse"), 42)
+        self.assertEqual(executor.stats.hedges, 0)
+
+    def test_transient_errors_are_retried(self):
+        executor = RequestExecutor(base_backoff=0.001)
+        attempts = []
+
+        def request():
+            attempts.append(None)
+            if len(attempts) < 3:
+                raise ConnectionError("reset by peer")
+            return "ok"
+
+        self.assertEqual(executor.call(request), "ok")
+        self.assertEqual(executor.stats.retries, 2)
+
+    def test_other_errors_are_not_retried(self):
+        executor = RequestExecutor(base_backoff=0.001)
+        attempts = []
+
+        def request():
+            attempts.append(None)
+            raise ValueError("bad request")
+
+        with self.assertRaises(ValueError):
+            executor.call(request)
+        self.assertEqual(len(attempts), 1)
+
+    def test_deadline_bounds_the_call(self):
+        executor = RequestExecutor()
+
+        started = time.perf_counter()
+        with self.assertRaises(DeadlineExceeded), deadline(0.1):
+            executor.call(lambda: time.sleep(1.0))
+
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(executor.stats.deadlines_exceeded, 1)
+
+    def test_blocking_losers_are_discarded(self):
+        executor = _primed_executor()
+        calls, discarded = [], []
+        lock = threading.Lock()
+
+        def request():
+            with lock:
+                calls.append(None)
+                slow = len(calls) == 1
+            time.sleep(0.3 if slow else 0.01)
+            return "slow" if slow else "hedge"
+
+        self.assertEqual(executor.call(request, key="parse", discard=discarded.append), "hedge")
+        with self.assertRaises(DeadlineExceeded), deadline(0.05):
+            executor.call(lambda: time.sleep(0.1) or "late", discard=discarded.append)
+
+        time.sleep(0.4)
+        self.assertEqual(sorted(discarded), ["late", "slow"])
+
+    def test_async_loser_is_cancelled(self):
+        executor = _primed_executor()
+        cancelled = []
+        calls = []
+
+        async def request():
+            calls.append(None)
+            delay = 1.0 if len(calls) == 1 else 0.01
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(delay)
+                raise
+            return delay
+
+        result = asyncio.run(executor.call_async(request, key="parse"))
+
+        self.assertEqual(result, 0.01)
+        self.assertEqual(cancelled, [1.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from agent.llm.response_cache import (
+    InMemoryResponseCache,
+    SqliteResponseCache,
+    create_tiered_cache,
+    make_cache_key,
+)
+from agent.parser.entity_context import EntityContext
+from agent.parser.llm_parser import LlmParser
+from agent.parser.state_diff import LlmStateDiff, LlmStateDiffs
+from agent.state.entity.types import FieldDiff
+from examples.boat_booking.state_entity import BoatSpecEntity
+
+
+class CountingClient:
+    def __init__(self, response: LlmStateDiffs):
+        self.calls = 0
+        self.response = response
+        self.chat = SimpleNamespace(completions=SimpleNamespace(parse=self._parse))
+
+    def _parse(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(parsed=self.response.model_copy(deep=True))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_key_is_stable_and_sensitive_to_messages(self):
+        messages = [{"role": "user", "content": "40ft catamaran"}]
+        key = make_cache_key("gpt-4o", messages, LlmStateDiffs)
+
+        self.assertEqual(key, make_cache_key("gpt-4o", [dict(messages[0])], LlmStateDiffs))
+        self.assertNotEqual(key, make_cache_key("gpt-4o-mini", messages, LlmStateDiffs))
+        self.assertNotEqual(key, make_cache_key("gpt-4o", [{"role": "user", "content": "monohull"}], LlmStateDiffs))
+
+    def test_lru_eviction(self):
+        cache = InMemoryResponseCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1")
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_ttl_expiry(self):
+        cache = InMemoryResponseCache(ttl_seconds=0.01)
+        cache.set("a", "1")
+        time.sleep(0.02)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats.expirations, 1)
+
+    def test_sqlite_tier_persists_and_evicts(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "cache.sqlite"
+            cache = SqliteResponseCache(path, max_entries=2)
+            cache.set("a", "1")
+            cache.set("b", "2")
+            cache.set("c", "3")
+            cache.close()
+
+            reopened = SqliteResponseCache(path, max_entries=2)
+            self.assertIsNone(reopened.get("a"))
+            self.assertEqual(reopened.get("c"), "3")
+            reopened.close()
+
+    def test_tiered_cache_backfills_memory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "cache.sqlite"
+            create_tiered_cache(path).set("a", "1")
+
+            cache = create_tiered_cache(path)
+            memory_tier = cache.tiers[0]
+            self.assertEqual(cache.get("a"), "1")
+            self.assertEqual(memory_tier.stats.misses, 1)
+            self.assertEqual(cache.get("a"), "1")
+            self.assertEqual(memory_tier.stats.hits, 1)
+            cache.tiers[1].close()
+
+    def test_parser_replays_from_cache(self):
+        response = LlmStateDiffs(diffs=[
+            LlmStateDiff(
+                entity_class_name="BoatSpecEntity",
+                diffs=[FieldDiff(field_name="boat_length_ft", new_value=40)],
+            )
+        ])
+        client = CountingClient(response)
+        parser = LlmParser(client=client, cache=InMemoryResponseCache())
+        contexts = [EntityContext(entity_class=BoatSpecEntity, entity_schema=BoatSpecEntity.model_json_schema())]
+
+        first = parser.parse_state_diff("I want a 40ft boat", contexts)
+        second = parser.parse_state_diff("I want a 40ft boat", contexts)
+
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(parser.cache.stats.hits, 1)
+        self.assertEqual(first[0].diffs, second[0].diffs)
+        self.assertIs(second[0].entity_class, BoatSpecEntity)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import json
+import unittest
+from datetime import date
+
+from agent.llm.fake_client import FakeLlmClient
+from agent.parser import CompositeParser, EntityContext, LlmParser, RuleBasedParser
+from agent.parser.state_diff import LlmStateDiff, LlmStateDiffs
+from agent.state.entity.types import FieldDiff
+from examples.boat_booking.state_entity import BoatSpecEntity, DatesAndDurationEntity, DesiredLocationEntity
+
+ENTITY_CLASSES = [BoatSpecEntity, DatesAndDurationEntity, DesiredLocationEntity]
+
+
+def _contexts() -> list[EntityContext]:
+    return [EntityContext(entity_class=cls, entity_schema=cls.model_json_schema()) for cls in ENTITY_CLASSES]
+
+
+def _fields(state_diffs) -> dict[str, object]:
+    return {d.field_name: d.new_value for state_diff in state_diffs for d in state_diff.diffs}
+
+
+def _location_responder(messages, response_format):
+    return LlmStateDiffs(diffs=[
+        LlmStateDiff(
+            entity_class_name="DesiredLocationEntity",
+            diffs=[FieldDiff(field_name="city", new_value="Split"), FieldDiff(field_name="country", new_value="Croatia")],
+        ),
+        LlmStateDiff(
+            entity_class_name="BoatSpecEntity",
+            diffs=[FieldDiff(field_name="boat_length_ft", new_value=45)],
+        ),
+    ])
+
+
+class TestRuleBasedParser(unittest.TestCase):
+    def setUp(self):
+        self.parser = RuleBasedParser(entity_classes=ENTITY_CLASSES)
+
+    def test_resolves_typed_fields(self):
+        fields = _fields(self.parser.parse_state_diff(
+            "40 ft catamaran with 3 cabins from 2026-07-10 until July 17th, 2026", _contexts()
+        ))
+
+        self.assertEqual(fields, {
+            "boat_type": "catamaran",
+            "boat_length_ft": 40,
+            "number_of_cabins": 3,
+            "trip_start_date": "2026-07-10T00:00:00",
+            "trip_end_date": "2026-07-17T00:00:00",
+        })
+
+    def test_ambiguous_values_are_skipped(self):
+        fields = _fields(self.parser.parse_state_diff("either a monohull or a catamaran", _contexts()))
+        self.assertNotIn("boat_type", fields)
+
+    def test_corrections_are_left_to_the_llm(self):
+        extraction = self.parser.extract("No actually I changed my mind about 40ft", _contexts())
+        self.assertEqual(extraction.state_diffs, [])
+        self.assertTrue(extraction.needs_fallback)
+
+    def test_correction_cues_only_hold_back_the_values_next_to_them(self):
+        fields = _fields(self.parser.parse_state_diff("no problem, a 40 ft catamaran please", _contexts()))
+        self.assertEqual(fields, {"boat_type": "catamaran", "boat_length_ft": 40})
+
+        extraction = self.parser.extract("2 cabins, not a monohull, a catamaran", _contexts())
+        self.assertEqual(_fields(extraction.state_diffs), {"number_of_cabins": 2})
+        self.assertTrue(extraction.needs_fallback)
+        self.assertEqual(_fields(self.parser.parse_state_diff("No, 45 ft", _contexts())), {})
+
+    def test_yearless_dates_follow_the_reference_date(self):
+        parser = RuleBasedParser(entity_classes=ENTITY_CLASSES, reference_date=date(2026, 10, 17))
+
+        self.assertEqual(_fields(parser.parse_state_diff("from July 10th until July 17th", _contexts())), {
+            "trip_start_date": "2027-07-10T00:00:00",
+            "trip_end_date": "2027-07-17T00:00:00",
+        })
+        self.assertEqual(_fields(parser.parse_state_diff("Dec 28 until Jan 3", _contexts())), {
+            "trip_start_date": "2026-12-28T00:00:00",
+            "trip_end_date": "2027-01-03T00:00:00",
+        })
+
+
+class TestCompositeParser(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeLlmClient(responder=_location_responder)
+        self.parser = CompositeParser(
+            rule_parser=RuleBasedParser(entity_classes=ENTITY_CLASSES),
+            fallback_parser=LlmParser(client=self.client, entity_classes=ENTITY_CLASSES),
+        )
+
+    def test_simple_turn_skips_llm(self):
+        fields = _fields(self.parser.parse_state_diff("3 cabins please", _contexts()))
+
+        self.assertEqual(fields, {"number_of_cabins": 3})
+        self.assertEqual(self.client.calls, 0)
+
+    def test_leftover_goes_to_llm_and_rules_win(self):
+        fields = _fields(self.parser.parse_state_diff("a 40 ft boat in Split, Croatia", _contexts()))
+
+        self.assertEqual(self.client.calls, 1)
+        request = self.client.requests[0]["messages"]
+        self.assertEqual(request[-1]["content"], "a 40 ft boat in Split, Croatia")
+        boat_context = json.loads(request[-2]["content"].splitlines()[0])
+        self.assertNotIn("boat_length_ft", boat_context["entity_schema"]["properties"])
+        self.assertEqual(boat_context["resolved_values"], {"boat_length_ft": 40})
+        self.assertEqual(fields, {"boat_length_ft": 40, "city": "Split", "country": "Croatia"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import json
+import unittest
+
+from agent.parser.schema_renderer import compact_schema, render_schema
+from examples.boat_booking.state_entity import BoatSpecEntity, DatesAndDurationEntity
+
+
+class TestSchemaRenderer(unittest.TestCase):
+    def test_drops_titles_metadata_and_whitespace(self):
+        rendered = render_schema(BoatSpecEntity)
+        schema = json.loads(rendered)
+
+        self.assertNotIn('"title"', rendered)
+        self.assertEqual(rendered, json.dumps(schema, separators=(",", ":")))
+        self.assertNotIn("$defs", schema)
+        self.assertEqual(list(schema["properties"]), ["boat_type", "boat_length_ft", "number_of_cabins"])
+        self.assertEqual(schema["properties"]["boat_length_ft"]["type"], ["integer", "null"])
+        self.assertLess(len(rendered), len(json.dumps(BoatSpecEntity.model_json_schema())) / 2)
+
+    def test_is_memoized(self):
+        self.assertIs(compact_schema(BoatSpecEntity), compact_schema(BoatSpecEntity))
+        self.assertIs(render_schema(BoatSpecEntity, ["boat_type"]), render_schema(BoatSpecEntity, {"boat_type"}))
+
+    def test_missing_fields_only(self):
+        entity = DatesAndDurationEntity(number_of_days=7)
+
+        schema = compact_schema(DatesAndDurationEntity, entity.get_missing_fields())
+
+        self.assertEqual(list(schema["properties"]), ["trip_start_date", "trip_end_date"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+
+from agent.misc.embedding_service import DefaultEmbeddingService
+from agent.misc.in_memory_storage import InMemoryStateStorage
+from agent.misc.similarity_metrics import cosine_similarity, euclidean_similarity
+from examples.boat_booking.state_entity import DesiredLocationEntity
+
+
+def _entity(vector) -> DesiredLocationEntity:
+    return DesiredLocationEntity(city=f"c{vector[0]:.3f}", embedding=list(vector))
+
+
+class TestSimilaritySearch(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.vectors = rng.normal(size=(300, 16))
+        self.query = _entity(self.vectors[0] + rng.normal(scale=0.5, size=16))
+
+    def _storage(self, metric):
+        # Growing past the initial capacity exercises the matrix resize
+        storage = InMemoryStateStorage(DefaultEmbeddingService(), similarity_metric=metric)
+        storage.add_entities([_entity(v) for v in self.vectors])
+        return storage
+
+    def _reference(self, metric, threshold):
+        scores = [(i, metric(np.array(self.query.embedding), v)) for i, v in enumerate(self.vectors)]
+        return [(i, s) for i, s in scores if s >= threshold]
+
+    def test_matches_scalar_metrics(self):
+        custom = lambda v1, v2: float(-np.abs(v1 - v2).sum())  # noqa: E731
+        for metric, threshold in ((cosine_similarity, 0.1), (euclidean_similarity, 1e-3), (custom, -40.0)):
+            with self.subTest(metric=getattr(metric, "__name__", "custom")):
+                storage = self._storage(metric)
+                expected = self._reference(metric, threshold)
+
+                by_similarity = storage.get_similar(self.query, threshold=threshold, limit=5)
+                best = sorted(expected, key=lambda x: x[1], reverse=True)[:5]
+                self.assertEqual([e.city for e, _ in by_similarity], [f"c{self.vectors[i][0]:.3f}" for i, _ in best])
+                np.testing.assert_allclose([s for _, s in by_similarity], [s for _, s in best], rtol=1e-4)
+
+                chronological = storage.get_similar(self.query, threshold=threshold, limit=5, order_by="chronological")
+                self.assertEqual([e.city for e, _ in chronological],
+                                 [f"c{self.vectors[i][0]:.3f}" for i, _ in expected[:5]])
+
+    def test_dimension_mismatch(self):
+        storage = self._storage(cosine_similarity)
+        with self.assertRaises(ValueError):
+            storage.add_entities([_entity([1.0, 2.0])])
+
+
+if __name__ == '__main__':
+    unittest.main()
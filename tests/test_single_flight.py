@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from agent.llm import FakeAsyncLlmClient, FakeLlmClient, RequestExecutor, SingleFlight
+from agent.parser import AsyncLlmParser, EntityContext, LlmParser
+from agent.parser.state_diff import LlmStateDiff, LlmStateDiffs
+from agent.state.entity.types import FieldDiff
+from examples.boat_booking.state_entity import BoatSpecEntity
+
+CONTEXTS = [EntityContext(entity_class=BoatSpecEntity, entity_schema=BoatSpecEntity.model_json_schema())]
+
+
+def _responder(messages, response_format):
+    return LlmStateDiffs(diffs=[LlmStateDiff(
+        entity_class_name="BoatSpecEntity",
+        diffs=[FieldDiff(field_name="boat_type", new_value="catamaran" if "cat" in messages[-1]["content"] else "monohull")],
+    )])
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_identical_thread_requests_share_one_call(self):
+        client = FakeLlmClient(responder=_responder, latency_seconds=0.2)
+        single_flight = SingleFlight()
+        # A fresh executor, so latencies recorded by other tests cannot trigger hedging
+        parser = LlmParser(client=client, entity_classes=[BoatSpecEntity], single_flight=single_flight,
+                           executor=RequestExecutor())
+
+        inputs = ["yes, a cat"] * 6 + ["no"] * 2
+        with ThreadPoolExecutor(max_workers=len(inputs)) as pool:
+            results = list(pool.map(lambda text: parser.parse_state_diff(text, CONTEXTS), inputs))
+
+        self.assertEqual(client.calls, 2)
+        self.assertEqual(single_flight.coalesced, 6)
+        self.assertEqual([r[0].diffs[0].new_value for r in results], ["catamaran"] * 6 + ["monohull"] * 2)
+        # Followers get their own copies
+        self.assertIsNot(results[0][0].diffs[0], results[1][0].diffs[0])
+
+    def test_identical_async_requests_share_one_call(self):
+        client = FakeAsyncLlmClient(responder=_responder, latency_seconds=0.1)
+        single_flight = SingleFlight()
+        parser = AsyncLlmParser(client=client, entity_classes=[BoatSpecEntity], single_flight=single_flight,
+                                executor=RequestExecutor())
+
+        async def run():
+            return await asyncio.gather(*(parser.parse_state_diff_async("yes", CONTEXTS) for _ in range(5)))
+
+        results = asyncio.run(run())
+
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(single_flight.as_dict(), {"calls": 5, "upstream_calls": 1, "coalesced": 4})
+        self.assertEqual(len(results), 5)
+
+    def test_parsers_with_different_clients_do_not_share_calls(self):
+        single_flight = SingleFlight()
+        executor = RequestExecutor()
+        clients = [FakeLlmClient(responder=_responder, latency_seconds=0.2) for _ in range(2)]
+        parsers = [
+            LlmParser(client=client, entity_classes=[BoatSpecEntity], single_flight=single_flight, executor=executor)
+            for client in clients
+        ]
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda parser: parser.parse_state_diff("a cat", CONTEXTS), parsers * 2))
+
+        self.assertEqual([client.calls for client in clients], [1, 1])
+        self.assertEqual(single_flight.coalesced, 2)
+
+    def test_errors_are_shared_and_not_remembered(self):
+        single_flight = SingleFlight()
+
+        def fail():
+            raise ValueError("upstream rejected the request")
+
+        with self.assertRaises(ValueError):
+            single_flight.do("key", fail)
+        self.assertEqual(single_flight.do("key", lambda: 42), 42)
+
+    def test_leader_mutations_do_not_reach_followers(self):
+        single_flight = SingleFlight()
+        release = threading.Event()
+
+        def request():
+            release.wait()
+            return {"diffs": ["catamaran"]}
+
+        def leader():
+            result = single_flight.do("key", request)
+            result["diffs"].append("leader only")
+            return result
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leading = pool.submit(leader)
+            while not single_flight.upstream_calls:
+                time.sleep(0.001)
+            following = pool.submit(single_flight.do, "key", request)
+            while not single_flight.coalesced:
+                time.sleep(0.001)
+            release.set()
+
+            self.assertEqual(leading.result()["diffs"], ["catamaran", "leader only"])
+            self.assertEqual(following.result()["diffs"], ["catamaran"])
+
+    def test_async_callers_get_their_own_copies(self):
+        single_flight = SingleFlight()
+
+        async def request():
+            await asyncio.sleep(0.01)
+            return {"diffs": ["catamaran"]}
+
+        async def leader():
+            result = await single_flight.do_async("key", request)
+            # Runs before the followers resume
+            result["diffs"].append("leader only")
+            return result
+
+        async def run():
+            return await asyncio.gather(leader(), *(single_flight.do_async("key", request) for _ in range(2)))
+
+        results = asyncio.run(run())
+        self.assertEqual([r["diffs"] for r in results], [["catamaran", "leader only"], ["catamaran"], ["catamaran"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
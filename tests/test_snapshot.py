@@ -0,0 +1,81 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from agent.misc.embedding_service import DefaultEmbeddingService
+from agent.misc.in_memory_storage import InMemoryStateStorage
+from agent.parser.state_diff import StateDiff
+from agent.state.entity.types import FieldDiff
+from agent.state.storage.one_entity_per_type_storage import OneEntityPerTypeStorage
+from agent.state.storage.snapshot import SnapshotReader, SnapshotWriter, msgpack
+from examples.boat_booking.state_entity import BoatSpecEntity, DesiredLocationEntity
+from examples.knowledge_base.state_entities import Task
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "snapshot"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _in_memory_storage(self) -> InMemoryStateStorage:
+        vectors = np.random.default_rng(1).normal(size=(40, 8))
+        storage = InMemoryStateStorage(DefaultEmbeddingService())
+        storage.add_entities([DesiredLocationEntity(city=f"c{i}", embedding=v.tolist()) for i, v in enumerate(vectors[:30])])
+        storage.add_entities([
+            Task(task_summary=f"t{i}", assignees=["Ada"], embedding=v.tolist()) for i, v in enumerate(vectors[30:])
+        ])
+        return storage
+
+    def test_in_memory_round_trip_keeps_classes_and_vectors(self):
+        for row_format in ("jsonl", "msgpack"):
+            with self.subTest(row_format=row_format):
+                if row_format == "msgpack" and msgpack is None:
+                    self.skipTest("msgpack is not installed")
+                storage = self._in_memory_storage()
+                storage.save_snapshot(self.path, row_format=row_format)
+                loaded = InMemoryStateStorage.load_snapshot(self.path, DefaultEmbeddingService())
+
+                self.assertEqual(loaded.chronological_ids, storage.chronological_ids)
+                self.assertEqual([type(e) for e in loaded.get_all()], [type(e) for e in storage.get_all()])
+                self.assertEqual(loaded.get_all()[-1].task_summary, "t9")
+                self.assertEqual(loaded.get_all(as_of_version=1)[-1].city, "c29")
+                # The index searches the read-only mapping of embeddings.npy
+                self.assertFalse(loaded.vector_index.matrix.flags.writeable)
+
+                expected = storage.get_similar(storage.get_all()[5], threshold=0.0)
+                found = loaded.get_similar(loaded.get_all()[5], threshold=0.0)
+                self.assertEqual([e.domain_dump() for e, _ in found], [e.domain_dump() for e, _ in expected])
+                np.testing.assert_allclose([s for _, s in found], [s for _, s in expected], rtol=1e-5)
+                # Adding after a load copies the mapped matrix instead of writing to the file
+                loaded.add_entities([DesiredLocationEntity(city="new", embedding=[1.0] * 8)])
+                self.assertEqual(len(loaded.vector_index), 41)
+
+    def test_one_entity_per_type_round_trip(self):
+        storage = OneEntityPerTypeStorage([DesiredLocationEntity, BoatSpecEntity])
+        storage.apply_state_diffs([StateDiff(
+            entity_class=BoatSpecEntity, diffs=[FieldDiff(field_name="boat_length_ft", new_value=40)]
+        )])
+        storage.save_snapshot(self.path)
+        loaded = OneEntityPerTypeStorage.load_snapshot(self.path)
+
+        self.assertEqual(loaded.version, storage.version)
+        self.assertEqual([e.model_dump() for e in loaded.get_all()], [e.model_dump() for e in storage.get_all()])
+        self.assertEqual([type(e) for e in loaded.get_incomplete_entities()], [BoatSpecEntity])
+        self.assertFalse((self.path / "embeddings.npy").exists())
+
+    def test_interrupted_write_leaves_no_manifest(self):
+        with self.assertRaises(RuntimeError):
+            with SnapshotWriter(self.path) as writer:
+                writer.write(DesiredLocationEntity(city="a"), "a", embedding=[1.0, 2.0])
+                raise RuntimeError
+        with self.assertRaises(FileNotFoundError):
+            SnapshotReader(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
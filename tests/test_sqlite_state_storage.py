@@ -0,0 +1,90 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from agent.state.entity.actor.base_actor import BaseActor
+from agent.state.storage.sqlite_state_storage import SqliteStateStorage
+from examples.boat_booking.state_entity import BoatSpecEntity, DesiredLocationEntity
+from examples.knowledge_base.state_entities import Task
+from tests.helpers import make_diff
+
+
+class TestSqliteStateStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "state.db"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_refs_merge_and_versions(self):
+        with SqliteStateStorage(self.path, session_id="s1") as storage:
+            applied = storage.apply_state_diffs([
+                make_diff(DesiredLocationEntity, actor=BaseActor(id="u1"), country="Greece"),
+                make_diff(Task, entity_ref="t1", task_summary="Book the boat", assignees=["Ada"]),
+            ])
+            self.assertEqual(storage.get_current_version(), 1)
+            location_ref = applied[0].entity_ref
+            self.assertEqual(storage.get_entity_refs_for_class(DesiredLocationEntity), [location_ref])
+            self.assertEqual(storage.get_entity_refs_for_class(Task), ["t1"])
+
+            storage.apply_state_diffs([
+                make_diff(DesiredLocationEntity, entity_ref=location_ref, city="Athens"),
+                make_diff(BoatSpecEntity, boat_length_ft=40),
+            ])
+            self.assertEqual(storage.get_current_version(), 2)
+
+            current = storage.get_all()
+            self.assertEqual([type(e) for e in current], [DesiredLocationEntity, Task, BoatSpecEntity])
+            self.assertEqual((current[0].country, current[0].city), ("Greece", "Athens"))
+            self.assertEqual(current[0].actors, [BaseActor(id="u1")])
+            self.assertEqual(storage.get_all(as_of_version=1)[0].city, None)
+            self.assertEqual(len(storage.get_all(as_of_version=1)), 2)
+
+            changes = storage.diff_versions(1, 2)
+            self.assertEqual(
+                sorted((d.entity_class.__name__, [f.field_name for f in d.diffs]) for d in changes),
+                [("BoatSpecEntity", ["boat_type", "boat_length_ft", "number_of_cabins"]),
+                 ("DesiredLocationEntity", ["city"])],
+            )
+
+    def test_sessions_share_one_file(self):
+        first = SqliteStateStorage(self.path, session_id="a")
+        second = SqliteStateStorage(self.path, session_id="b")
+        first.apply_state_diffs([make_diff(BoatSpecEntity, boat_length_ft=40)])
+        second.apply_state_diffs([make_diff(BoatSpecEntity, boat_length_ft=50)])
+        second.apply_state_diffs([make_diff(DesiredLocationEntity, city="Split")])
+        first.close()
+        second.close()
+
+        with SqliteStateStorage(self.path, session_id="a") as reopened:
+            self.assertEqual(reopened.get_current_version(), 1)
+            self.assertEqual([e.boat_length_ft for e in reopened.get_all()], [40])
+        with SqliteStateStorage(self.path, session_id="b") as reopened:
+            self.assertEqual(reopened.get_current_version(), 2)
+            self.assertEqual(len(reopened.get_all()), 2)
+
+    def test_completion_and_json_round_trip(self):
+        storage = SqliteStateStorage()
+        storage.apply_state_diffs([make_diff(DesiredLocationEntity, country="Greece", region="Attica", city="Athens")])
+        self.assertTrue(storage.is_state_completed())
+        storage.apply_state_diffs([make_diff(BoatSpecEntity, boat_length_ft=40)])
+        self.assertFalse(storage.is_state_completed())
+        self.assertEqual([type(e) for e in storage.get_incomplete_entities()], [BoatSpecEntity])
+
+        restored = SqliteStateStorage.from_json(storage.to_json(), session_id="copy")
+        self.assertEqual([e.model_dump() for e in restored.get_all()], [e.model_dump() for e in storage.get_all()])
+        self.assertEqual(restored.get_current_version(), 2)
+
+    def test_failed_cycle_rolls_back(self):
+        storage = SqliteStateStorage()
+        storage.apply_state_diffs([make_diff(BoatSpecEntity, boat_length_ft=40)])
+        # A malformed diff fails the cycle after the first diff was merged
+        with self.assertRaises(AttributeError):
+            storage.apply_state_diffs([make_diff(DesiredLocationEntity, city="Split"), object()])
+        self.assertEqual(storage.get_current_version(), 1)
+        self.assertEqual(len(storage.get_all()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
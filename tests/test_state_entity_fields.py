@@ -0,0 +1,98 @@
+import unittest
+from typing import Any, Union
+
+from pydantic import Field
+
+from agent.state.entity.state_entity import BaseStateEntity
+from agent.state.entity.types import FieldDiff
+
+
+class CabinEntity(BaseStateEntity):
+    berths: int | None = None
+
+
+class YachtEntity(BaseStateEntity):
+    name: str | None = None
+    cabins: list[CabinEntity] = Field(default_factory=list)
+    main_cabin: CabinEntity | None = None
+    notes: str = ""
+    source: str | None = Field(default=None, exclude=True)
+
+
+class GalleyEntity(BaseStateEntity):
+    stoves: int | None = None
+
+
+class FleetEntity(BaseStateEntity):
+    rooms: list[Union[CabinEntity, GalleyEntity]] = Field(default_factory=list)
+    extras: list[Any] = Field(default_factory=list)
+    misc: list = Field(default_factory=list)
+    mixed: list[CabinEntity | int] = Field(default_factory=list)
+    tags: list[str] = Field(default_factory=list)
+
+
+class TestStateEntityFields(unittest.TestCase):
+    def test_field_table_sees_subclass_fields(self):
+        table = YachtEntity._field_table
+
+        self.assertIn("source", YachtEntity._metadata_fields)
+        self.assertNotIn("source", YachtEntity.get_domain_fields())
+        self.assertEqual(table.domain_nullable, ("name", "main_cabin"))
+        self.assertEqual(table.entity_fields, ("main_cabin",))
+        self.assertEqual(table.entity_list_fields, ("cabins",))
+        self.assertEqual(BaseStateEntity.get_domain_fields(), {})
+
+    def test_nested_and_list_paths(self):
+        yacht = YachtEntity(cabins=[CabinEntity(), CabinEntity()])
+
+        yacht.update_fields([
+            FieldDiff(field_name="main_cabin.berths", new_value=2),
+            FieldDiff(field_name="cabins[1].berths", new_value=4),
+        ])
+
+        self.assertEqual(yacht.main_cabin.berths, 2)
+        self.assertEqual(yacht.cabins[1].berths, 4)
+        self.assertIs(YachtEntity._compile_path("cabins[1].berths"), YachtEntity._compile_path("cabins[1].berths"))
+        with self.assertRaises(ValueError):
+            yacht.update_fields([FieldDiff(field_name="cabins[x].berths", new_value=1)])
+
+    def test_completion(self):
+        yacht = YachtEntity(name="Aurora", main_cabin=CabinEntity(berths=2), cabins=[CabinEntity()])
+
+        self.assertFalse(yacht.is_completed())
+        self.assertEqual(yacht.get_missing_fields(), ["cabins"])
+
+        yacht.cabins[0].berths = 3
+        self.assertTrue(yacht.is_completed())
+        self.assertEqual(yacht.get_missing_fields(), [])
+
+    def test_missing_fields_agree_with_is_completed(self):
+        class BookingEntity(BaseStateEntity):
+            a: int | None = None
+            b: list[str] = []
+            c: int = 5
+
+        entity = BookingEntity()
+        self.assertEqual(entity.get_missing_fields(), ["a"])
+        self.assertFalse(entity.is_completed())
+
+        entity.a = 1
+        self.assertEqual(entity.get_missing_fields(), [])
+        self.assertTrue(entity.is_completed())
+
+    def test_lists_that_may_hold_entities_are_checked(self):
+        table = FleetEntity._field_table
+        self.assertEqual(table.entity_list_fields, ("rooms",))
+        self.assertEqual(table.dynamic_fields, ("extras", "misc", "mixed"))
+
+        for field_name in ("rooms", "extras", "misc", "mixed"):
+            with self.subTest(field_name=field_name):
+                fleet = FleetEntity(rooms=[], extras=[], misc=[], mixed=[], tags=["x"])
+                setattr(fleet, field_name, [CabinEntity()])
+                self.assertFalse(fleet.is_completed())
+                getattr(fleet, field_name)[0].berths = 1
+                self.assertTrue(fleet.is_completed())
+
+
+if __name__ == '__main__':
+    unittest.main()
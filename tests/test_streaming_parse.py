@@ -0,0 +1,133 @@
+import json
+import unittest
+from typing import ClassVar
+
+from agent.interaction.channel import BaseChannel
+from agent.interaction.input.base_input import BaseInput
+from agent.llm import InMemoryResponseCache, RequestExecutor
+from agent.llm.request_executor import DeadlineExceeded, deadline
+from agent.llm.fake_client import FakeLlmClient
+from agent.llm.json_stream import JsonArrayItemScanner
+from agent.parser import CompositeParser, LlmParser, ParserRegistry, RuleBasedParser
+from agent.parser.state_diff import LlmStateDiff, LlmStateDiffs
+from agent.state.controller.base_state_controller import BaseStateController
+from agent.state.entity.types import FieldDiff
+from agent.state.storage.one_entity_per_type_storage import OneEntityPerTypeStorage
+from examples.boat_booking.state_entity import BoatSpecEntity, DatesAndDurationEntity, DesiredLocationEntity
+
+ENTITY_CLASSES = [BoatSpecEntity, DatesAndDurationEntity, DesiredLocationEntity]
+
+
+class BookingInput(BaseInput):
+    channel: ClassVar[BaseChannel] = BaseChannel(channel_domain="chat", channel_id="streaming-test")
+    extracts_to: ClassVar[set] = set(ENTITY_CLASSES)
+    input_value: str
+
+
+def _responder(messages, response_format):
+    return LlmStateDiffs(diffs=[
+        LlmStateDiff(
+            entity_class_name="DesiredLocationEntity",
+            diffs=[FieldDiff(field_name="city", new_value="Split {\"quoted\"]")],
+        ),
+        LlmStateDiff(
+            entity_class_name="BoatSpecEntity",
+            diffs=[FieldDiff(field_name="boat_type", new_value="catamaran")],
+        ),
+    ])
+
+
+class TestJsonArrayItemScanner(unittest.TestCase):
+    def test_items_complete_regardless_of_chunking(self):
+        document = json.dumps({"note": "diffs: [{", "diffs": [{"a": "}]\\\"", "b": [1, {"c": 2}]}, {"d": None}]})
+
+        for chunk_size in (1, 5, len(document)):
+            scanner = JsonArrayItemScanner("diffs")
+            items = []
+            for start in range(0, len(document), chunk_size):
+                items.extend(scanner.feed(document[start:start + chunk_size]))
+            self.assertEqual([json.loads(item) for item in items], [{"a": "}]\\\"", "b": [1, {"c": 2}]}, {"d": None}])
+
+
+class TestStreamingParse(unittest.TestCase):
+    def _controller(self, parser) -> BaseStateController:
+        registry = ParserRegistry()
+        registry.register(parser)
+        return BaseStateController(storage=OneEntityPerTypeStorage(entity_classes=ENTITY_CLASSES),
+                                   parser_registry=registry)
+
+    def test_diffs_are_applied_before_the_response_ends(self):
+        client = FakeLlmClient(responder=_responder, stream_chunk_size=8)
+        controller = self._controller(LlmParser(client=client, entity_classes=ENTITY_CLASSES))
+
+        stream = controller.update_state_streaming([BookingInput(input_value="catamaran in Split")])
+        first = next(stream)
+
+        self.assertIs(first.entity_class, DesiredLocationEntity)
+        self.assertEqual([type(e) for e in controller.storage.get_all()], [DesiredLocationEntity])
+
+        rest = list(stream)
+        self.assertEqual([d.entity_class for d in rest], [BoatSpecEntity])
+        self.assertEqual(len(controller.storage.get_all()), 2)
+
+    def test_completed_stream_is_cached(self):
+        client = FakeLlmClient(responder=_responder)
+        parser = LlmParser(client=client, entity_classes=ENTITY_CLASSES, cache=InMemoryResponseCache())
+        registry = ParserRegistry()
+        registry.register(parser)
+        contexts = list(registry.get_extraction_plan(BookingInput, "chat").groups[0].entity_contexts)
+
+        streamed = list(parser.stream_state_diff("catamaran in Split", contexts))
+        parsed = parser.parse_state_diff("catamaran in Split", contexts)
+
+        self.assertEqual(client.calls, 1)
+        self.assertEqual([d.diffs for d in streamed], [d.diffs for d in parsed])
+
+    def test_composite_yields_rule_diffs_before_calling_the_llm(self):
+        client = FakeLlmClient(responder=_responder)
+        parser = CompositeParser(RuleBasedParser(ENTITY_CLASSES), LlmParser(client=client, entity_classes=ENTITY_CLASSES))
+        controller = self._controller(parser)
+
+        stream = controller.update_state_streaming([BookingInput(input_value="a monohull in Split")])
+        first = next(stream)
+
+        self.assertEqual(first.diffs[0].new_value, "monohull")
+        self.assertEqual(client.calls, 0)
+        # The LLM's boat_type is dropped, the rule result wins
+        self.assertEqual([d.entity_class for d in stream], [DesiredLocationEntity])
+        self.assertEqual(client.calls, 1)
+
+    def _contexts(self, parser):
+        registry = ParserRegistry()
+        registry.register(parser)
+        return list(registry.get_extraction_plan(BookingInput, "chat").groups[0].entity_contexts)
+
+    def test_slow_stream_stops_at_the_deadline(self):
+        client = FakeLlmClient(responder=_responder, latency_seconds=2.0, stream_chunk_size=8)
+        parser = LlmParser(client=client, entity_classes=ENTITY_CLASSES, executor=RequestExecutor())
+
+        with self.assertRaises(DeadlineExceeded), deadline(0.2):
+            list(parser.stream_state_diff("catamaran in Split", self._contexts(parser)))
+        self.assertTrue(client.streams[0].closed)
+
+    def test_transient_error_opening_the_stream_is_retried(self):
+        failures = [ConnectionError("reset by peer")]
+
+        def flaky(messages, response_format):
+            if failures:
+                raise failures.pop()
+            return _responder(messages, response_format)
+
+        client = FakeLlmClient(responder=flaky)
+        executor = RequestExecutor(base_backoff=0.001)
+        parser = LlmParser(client=client, entity_classes=ENTITY_CLASSES, executor=executor)
+
+        streamed = list(parser.stream_state_diff("catamaran in Split", self._contexts(parser)))
+
+        self.assertEqual([d.entity_class for d in streamed], [DesiredLocationEntity, BoatSpecEntity])
+        self.assertEqual(client.calls, 2)
+        self.assertEqual(executor.stats.retries, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
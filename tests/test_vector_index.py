@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+
+from agent.misc.embedding_service import DefaultEmbeddingService
+from agent.misc.in_memory_storage import InMemoryStateStorage
+from agent.misc.vector_index import ExactVectorIndex, IvfVectorIndex
+from examples.boat_booking.state_entity import DesiredLocationEntity
+
+
+def _clustered(rng, n, dim=32, clusters=20):
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(clusters, size=n)] + rng.normal(scale=0.3, size=(n, dim))).astype(np.float32)
+
+
+class TestVectorIndex(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(3)
+        self.vectors = _clustered(self.rng, 3000)
+        self.queries = self.vectors[self.rng.choice(len(self.vectors), 20)] + 0.05
+
+    def _fill(self, index):
+        for vector in self.vectors:
+            index.add(vector)
+        return index
+
+    def test_ivf_recall_against_exact(self):
+        exact = self._fill(ExactVectorIndex())
+        ivf = self._fill(IvfVectorIndex(n_lists=32, n_probe=4))
+        self.assertTrue(ivf.is_trained)
+
+        found = total = 0
+        for query in self.queries:
+            expected, _ = exact.search(query, k=10)
+            rows, scores = ivf.search(query, k=10)
+            self.assertTrue(np.all(np.diff(scores) <= 0))
+            found += len(set(rows.tolist()) & set(expected.tolist()))
+            total += len(expected)
+        self.assertGreaterEqual(found / total, 0.9)
+
+    def test_probing_every_list_is_exact(self):
+        exact = self._fill(ExactVectorIndex())
+        ivf = self._fill(IvfVectorIndex(n_lists=16, n_probe=16, train_size=500))
+
+        for query in self.queries[:5]:
+            np.testing.assert_array_equal(ivf.search(query, k=10)[0], exact.search(query, k=10)[0])
+
+    def test_inserts_after_training_are_searchable(self):
+        ivf = self._fill(IvfVectorIndex(n_lists=16, n_probe=2, train_size=500))
+        row = ivf.add(np.full(32, 5.0, dtype=np.float32))
+
+        rows, scores = ivf.search(np.full(32, 5.0, dtype=np.float32), k=1)
+        self.assertEqual(rows.tolist(), [row])
+        self.assertAlmostEqual(scores[0], 1.0, places=5)
+
+    def test_storage_uses_the_index(self):
+        storage = InMemoryStateStorage(
+            DefaultEmbeddingService(), vector_index=IvfVectorIndex(n_lists=8, n_probe=8, train_size=100)
+        )
+        storage.add_entities([
+            DesiredLocationEntity(city=str(i), embedding=v.tolist()) for i, v in enumerate(self.vectors[:300])
+        ])
+
+        similar = storage.get_similar(DesiredLocationEntity(embedding=self.vectors[42].tolist()), limit=1)
+        self.assertEqual(similar[0][0].city, "42")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+
+from agent.misc.columnar_storage import ColumnarStateStorage
+from agent.misc.embedding_service import DefaultEmbeddingService
+from agent.misc.in_memory_storage import InMemoryStateStorage
+from agent.parser.state_diff import StateDiff
+from agent.state.entity.types import FieldDiff
+from agent.state.storage.one_entity_per_type_storage import OneEntityPerTypeStorage
+from examples.boat_booking.state_entity import BoatSpecEntity, DesiredLocationEntity
+from examples.knowledge_base.state_entities import Task
+from tests.helpers import make_diff
+
+
+class TestVersionHistory(unittest.TestCase):
+    def test_one_entity_per_type_time_travel(self):
+        storage = OneEntityPerTypeStorage([DesiredLocationEntity, BoatSpecEntity])
+        storage.apply_state_diffs([make_diff(DesiredLocationEntity, country="Greece")])
+        first = storage.snapshot()
+        storage.apply_state_diffs([
+            make_diff(DesiredLocationEntity, country="Croatia", city="Split"),
+            make_diff(BoatSpecEntity, boat_length_ft=40),
+        ])
+        second = storage.snapshot()
+        storage.apply_state_diffs([make_diff(BoatSpecEntity, boat_length_ft=45)])
+
+        self.assertEqual([e.domain_dump() for e in first.get_all()],
+                         [{"country": "Greece", "region": None, "city": None}])
+        as_of_second = second.get_all()
+        self.assertEqual(as_of_second[0].city, "Split")
+        self.assertEqual(as_of_second[1].boat_length_ft, 40)
+        self.assertEqual(storage.get_all()[1].boat_length_ft, 45)
+        self.assertIsNot(as_of_second[0], storage.get_all()[0])
+
+        changes = first.diff(second)
+        self.assertEqual(
+            [(d.entity_class, [(f.field_name, f.new_value) for f in d.diffs]) for d in changes],
+            [(DesiredLocationEntity, [("country", "Croatia"), ("city", "Split")]),
+             (BoatSpecEntity, [("boat_length_ft", 40)])],
+        )
+        self.assertEqual(storage.diff_versions(second.version, storage.version)[0].diffs[0].new_value, 45)
+        with self.assertRaises(ValueError):
+            storage.diff_versions(2, 1)
+
+    def test_append_only_storages(self):
+        storages = [ColumnarStateStorage(), InMemoryStateStorage(embedding_service=DefaultEmbeddingService())]
+        for storage in storages:
+            with self.subTest(storage=type(storage).__name__):
+                storage.apply_state_diffs([make_diff(Task, task_summary="Draft the doc")])
+                snapshot = storage.snapshot()
+                storage.apply_state_diffs([make_diff(Task, task_summary="Send the email", assignees=["Mei"])])
+
+                self.assertEqual([t.task_summary for t in snapshot.get_all()], ["Draft the doc"])
+                self.assertEqual(len(storage.get_all()), 2)
+                added = snapshot.diff(storage.snapshot())
+                self.assertEqual(len(added), 1)
+                self.assertEqual(added[0].diffs[0].new_value, "Send the email")
+
+    def test_whole_field_write_replaces_nested_writes(self):
+        storage = OneEntityPerTypeStorage([Task])
+        storage.apply_state_diffs([make_diff(Task, task_summary="Crew the boat", assignees=["a", "b"])])
+        storage.apply_state_diffs([StateDiff(entity_class=Task, diffs=[FieldDiff(field_name="assignees[0]", new_value="z")])])
+        storage.apply_state_diffs([make_diff(Task, assignees=["q"])])
+        storage.apply_state_diffs([make_diff(Task, task_summary="Crew the yacht")])
+
+        self.assertEqual(storage.get_all()[0].assignees, ["q"])
+        self.assertEqual(storage.get_all(as_of_version=3)[0].assignees, ["q"])
+        self.assertEqual(storage.get_all(as_of_version=2)[0].assignees, ["z", "b"])
+        self.assertEqual(
+            storage.get_all(as_of_version=1)[0].date_created_utc, storage.get_all()[0].date_created_utc
+        )
+
+    def test_long_chain_reads_match_every_version(self):
+        storage = OneEntityPerTypeStorage([Task])
+        storage.apply_state_diffs([make_diff(Task, task_summary="t0", assignees=["a", "b"])])
+        expected = {1: ("t0", ["a", "b"])}
+        for version in range(2, 101):
+            if version % 7 == 0:
+                storage.apply_state_diffs([make_diff(Task, assignees=[f"p{version}", "b"])])
+            elif version % 3 == 0:
+                storage.apply_state_diffs([
+                    StateDiff(entity_class=Task, diffs=[FieldDiff(field_name="assignees[0]", new_value=f"n{version}")])
+                ])
+            else:
+                storage.apply_state_diffs([make_diff(Task, task_summary=f"t{version}")])
+            task = storage.get_all()[0]
+            expected[version] = (task.task_summary, list(task.assignees))
+
+        for version, (summary, assignees) in expected.items():
+            task = storage.get_all(as_of_version=version)[0]
+            self.assertEqual((task.task_summary, task.assignees), (summary, assignees), version)
+        changes = storage.diff_versions(40, 41)
+        self.assertEqual([(f.field_name, f.new_value) for f in changes[0].diffs], [("task_summary", "t41")])
+        self.assertEqual(storage.diff_versions(41, 41), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import tempfile
+import unittest
+from pathlib import Path
+from typing import ClassVar
+
+from agent.interaction.channel import BaseChannel
+from agent.interaction.input.base_input import BaseInput
+from agent.llm.fake_client import FakeLlmClient
+from agent.parser import LlmParser, ParserRegistry
+from agent.parser.state_diff import LlmStateDiff, LlmStateDiffs
+from agent.state.controller.base_state_controller import BaseStateController
+from agent.state.entity.actor.base_actor import BaseActor
+from agent.state.entity.types import FieldDiff
+from agent.state.storage.one_entity_per_type_storage import OneEntityPerTypeStorage
+from agent.state.storage.write_ahead_log import WriteAheadLog
+from examples.boat_booking.state_entity import BoatSpecEntity, DesiredLocationEntity
+from tests.helpers import make_diff
+
+ENTITY_CLASSES = [DesiredLocationEntity, BoatSpecEntity]
+
+
+class BookingInput(BaseInput):
+    channel: ClassVar[BaseChannel] = BaseChannel(channel_domain="chat", channel_id="wal-test")
+    extracts_to: ClassVar[set] = set(ENTITY_CLASSES)
+    input_value: str
+
+
+def _state(storage) -> list[dict]:
+    return [entity.domain_dump() for entity in storage.get_all()]
+
+
+class TestWriteAheadLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _log(self, **kwargs) -> WriteAheadLog:
+        return WriteAheadLog(
+            self.directory,
+            storage_factory=lambda: OneEntityPerTypeStorage(ENTITY_CLASSES),
+            snapshot_loader=OneEntityPerTypeStorage.load_snapshot,
+            **kwargs,
+        )
+
+    def _apply(self, storage, log, *diffs) -> None:
+        applied = storage.apply_state_diffs(list(diffs))
+        log.append(applied, storage.get_current_version())
+
+    def test_recover_replays_diffs_with_actors(self):
+        storage, log = OneEntityPerTypeStorage(ENTITY_CLASSES), self._log()
+        self._apply(storage, log, make_diff(DesiredLocationEntity, actor=BaseActor(id="u1"), country="Greece"))
+        self._apply(storage, log, make_diff(DesiredLocationEntity, city="Athens"), make_diff(BoatSpecEntity, boat_length_ft=40))
+        log.close()
+
+        reopened = self._log()
+        recovered = reopened.recover()
+        self.assertEqual(_state(recovered), _state(storage))
+        self.assertEqual(recovered.get_current_version(), storage.get_current_version())
+
+        records = list(reopened.records())
+        self.assertEqual([r.version for r in records], [1, 3])
+        self.assertEqual(records[0].state_diffs[0].actor, BaseActor(id="u1"))
+        self.assertEqual([r.version for r in reopened.records(after_version=1)], [3])
+
+    def test_compaction_folds_sealed_segments_into_a_snapshot(self):
+        storage = OneEntityPerTypeStorage(ENTITY_CLASSES)
+        log = self._log(segment_bytes=1, compact_after_segments=None)
+        for length in range(30, 36):
+            self._apply(storage, log, make_diff(BoatSpecEntity, boat_length_ft=length))
+        self.assertEqual(len(list(self.directory.glob("wal-*.log"))), 6)
+
+        self.assertEqual(log.compact(), 6)
+        self.assertEqual(list(self.directory.glob("wal-*.log")), [])
+        self.assertEqual(log.latest_snapshot()[0], 6)
+
+        log.segment_bytes = 2**20
+        self._apply(storage, log, make_diff(DesiredLocationEntity, city="Split"))
+        log.sync()
+        recovered = self._log().recover()
+        self.assertEqual(_state(recovered), _state(storage))
+
+    def test_background_compaction_and_torn_tail(self):
+        storage = OneEntityPerTypeStorage(ENTITY_CLASSES)
+        log = self._log(segment_bytes=1, compact_after_segments=3)
+        for length in range(30, 33):
+            self._apply(storage, log, make_diff(BoatSpecEntity, boat_length_ft=length))
+        log.close()
+        self.assertEqual(log.latest_snapshot()[0], 3)
+
+        log = self._log()
+        self._apply(storage, log, make_diff(DesiredLocationEntity, city="Split"))
+        log.close()
+        segment, = self.directory.glob("wal-*.log")
+        with open(segment, "a") as f:
+            f.write('{"version":5,"timest')
+
+        self.assertEqual(_state(self._log().recover()), _state(storage))
+
+    def test_controller_logs_applied_diffs(self):
+        def responder(messages, response_format):
+            return LlmStateDiffs(diffs=[LlmStateDiff(
+                entity_class_name="DesiredLocationEntity", diffs=[FieldDiff(field_name="city", new_value="Split")]
+            )])
+
+        registry = ParserRegistry()
+        registry.register(LlmParser(client=FakeLlmClient(responder=responder), entity_classes=ENTITY_CLASSES))
+        log = self._log()
+        controller = BaseStateController(
+            storage=OneEntityPerTypeStorage(ENTITY_CLASSES), parser_registry=registry, write_ahead_log=log
+        )
+        controller.update_state([BookingInput(input_value="Split please")])
+
+        record, = log.records()
+        self.assertEqual(record.state_diffs[0].diffs[0].new_value, "Split")
+        self.assertEqual(record.state_diffs[0].actor.id, "assistant")
+
+    def test_replay_keeps_versions_of_empty_applies(self):
+        from agent.misc.embedding_service import DefaultEmbeddingService
+        from agent.misc.in_memory_storage import InMemoryStateStorage
+
+        replies = iter([
+            [LlmStateDiff(entity_class_name="BoatSpecEntity", diffs=[FieldDiff(field_name="boat_length_ft", new_value=40)])],
+            [],
+            [LlmStateDiff(entity_class_name="DesiredLocationEntity", diffs=[FieldDiff(field_name="city", new_value="Split")])],
+        ])
+        registry = ParserRegistry()
+        registry.register(LlmParser(
+            client=FakeLlmClient(responder=lambda messages, response_format: LlmStateDiffs(diffs=next(replies))),
+            entity_classes=ENTITY_CLASSES,
+        ))
+        log = WriteAheadLog(
+            self.directory,
+            storage_factory=lambda: InMemoryStateStorage(DefaultEmbeddingService()),
+            snapshot_loader=lambda path: InMemoryStateStorage.load_snapshot(path, DefaultEmbeddingService()),
+            segment_bytes=1,
+            compact_after_segments=None,
+        )
+        storage = InMemoryStateStorage(DefaultEmbeddingService())
+        controller = BaseStateController(storage=storage, parser_registry=registry, write_ahead_log=log)
+        for text in ("A 40ft boat", "Hmm", "Split please"):
+            controller.update_state([BookingInput(input_value=text)])
+        self.assertEqual(storage.get_current_version(), 3)
+
+        recovered = log.recover()
+        self.assertEqual(recovered.get_current_version(), 3)
+        for version in (1, 2, 3):
+            self.assertEqual(len(recovered.get_all(as_of_version=version)), len(storage.get_all(as_of_version=version)))
+
+        self.assertEqual(log.compact(), 3)
+        self.assertEqual(log.latest_snapshot()[0], 3)
+        self.assertEqual(log.recover().get_current_version(), 3)
+
+    def test_replay_reuses_logged_ids_and_embeddings(self):
+        from agent.misc.embedding_service import DefaultEmbeddingService
+        from agent.misc.in_memory_storage import InMemoryStateStorage
+
+        class CountingEmbeddingService(DefaultEmbeddingService):
+            calls = 0
+
+            def embed(self, entity):
+                CountingEmbeddingService.calls += 1
+                return super().embed(entity)
+
+        registry = ParserRegistry()
+        registry.register(LlmParser(
+            client=FakeLlmClient(responder=lambda messages, response_format: LlmStateDiffs(diffs=[LlmStateDiff(
+                entity_class_name="DesiredLocationEntity", diffs=[FieldDiff(field_name="city", new_value="Split")]
+            )])),
+            entity_classes=ENTITY_CLASSES,
+        ))
+        log = WriteAheadLog(
+            self.directory, storage_factory=lambda: InMemoryStateStorage(CountingEmbeddingService())
+        )
+        storage = InMemoryStateStorage(CountingEmbeddingService())
+        controller = BaseStateController(storage=storage, parser_registry=registry, write_ahead_log=log)
+        applied = controller.update_state([BookingInput(input_value="Split please")])
+        self.assertEqual(applied[0].entity_ref, storage.chronological_ids[0])
+        embedded = CountingEmbeddingService.calls
+
+        recovered = log.recover()
+        self.assertEqual(CountingEmbeddingService.calls, embedded)
+        self.assertEqual(recovered.chronological_ids, storage.chronological_ids)
+        entity_id = storage.chronological_ids[0]
+        self.assertEqual(recovered.get_embedding(entity_id).tolist(), storage.get_embedding(entity_id).tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()